@@ -1,16 +1,26 @@
-from fastapi import FastAPI, HTTPException, BackgroundTasks, Security, Depends
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Security, Depends, Header, Query, Request
 from fastapi.security.api_key import APIKeyHeader
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List, Optional
 import os
 import asyncio
 import logging
-from generator.generator import AIGenerator
-from crawler.crawler import BeautyCrawler
-from utils.db import SupabaseManager
-from utils.line_notifier import LineNotifier
+from contextlib import asynccontextmanager
+from utils.tracing import span
+from utils.profiling import profile_if_slow
+from utils.jobs import JobRegistry, normalize_keyword
+from utils.admission import AdmissionController, AdmissionRejected
+from utils.http_cache import CompressionMiddleware, ResponseMemo, etag_json_response
+from utils.checkpoints import RunCheckpoint
+from utils.db import SOURCE_SCHEDULE_COLUMNS
+from crawler.scheduler import CrawlScheduler
+from crawler.templates import template_domain
+from generator.parsing import parse_generated_article
+from retrieval.context import format_learning_context
+from datetime import datetime, timedelta, timezone
 import json
 import re
+import hashlib
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -23,6 +33,11 @@ logger = logging.getLogger(__name__)
 API_KEY_NAME = "x-api-key"
 api_key_header = APIKeyHeader(name=API_KEY_NAME, auto_error=False)
 
+def configured_api_keys():
+    """AURA_API_KEY plus any comma-separated AURA_API_KEYS; each key is one client for admission fairness."""
+    keys = [os.getenv("AURA_API_KEY", "")] + os.getenv("AURA_API_KEYS", "").split(",")
+    return list(dict.fromkeys(k.strip() for k in keys if k.strip()))
+
 async def get_api_key(api_key: str = Security(api_key_header)):
     env_api_key = os.getenv("AURA_API_KEY")
     if not env_api_key:
@@ -30,12 +45,28 @@ async def get_api_key(api_key: str = Security(api_key_header)):
         logger.critical("AURA_API_KEY is not set in environment variables! API is locking down.")
         raise HTTPException(status_code=500, detail="Server Configuration Error: API Key not set")
     
-    if api_key == env_api_key:
+    if api_key and api_key in configured_api_keys():
         return api_key
     
     raise HTTPException(status_code=403, detail="Could not validate credentials")
 
-app = FastAPI(title="AURA Engine API", description="API for AURA Beauty Content Engine", dependencies=[Depends(get_api_key)])
+async def get_client_id(api_key: str = Depends(get_api_key)):
+    """Identifies the caller for admission fairness by its (validated, server-configured) API key."""
+    return hashlib.sha256(api_key.encode()).hexdigest()[:12]
+
+@asynccontextmanager
+async def lifespan(app):
+    """
+    Startup: with AURA_RECOMMENDATION_WARM=1 the recommendation pool starts filling,
+    so the first request is instant too.
+    """
+    if os.getenv("AURA_RECOMMENDATION_WARM", "0") == "1":
+        db = await get_db()
+        if db:
+            get_recommender(db).refill_later()
+    yield
+
+app = FastAPI(title="AURA Engine API", description="API for AURA Beauty Content Engine", dependencies=[Depends(get_api_key)], lifespan=lifespan)
 
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
@@ -47,25 +78,111 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(CompressionMiddleware)
+
+PROFILE_HEADER = "x-aura-profile"
+
+@app.middleware("http")
+async def trace_requests(request, call_next):
+    force_profile = request.headers.get(PROFILE_HEADER) == "1"
+    with span("http.request", **{"http.method": request.method, "http.route": request.url.path}) as s:
+        with profile_if_slow(f"http{request.url.path}", force=force_profile):
+            response = await call_next(request)
+        s.set_attribute("http.status_code", response.status_code)
+    return response
 
 # Mount generated images for external access (e.g. from Vercel)
 os.makedirs("generated", exist_ok=True)
 app.mount("/generated", StaticFiles(directory="generated"), name="generated")
 
-# Initialize components (Lazy loading or global init)
-# We initialize them here for simplicity, but in prod might want lifespan events
-try:
-    db = SupabaseManager()
-except:
-    logger.warning("DB connection failed, running in mock db mode internally")
-    db = None
-
-generator = AIGenerator(mock=False) # We want real AI for trends if possible
-crawler = BeautyCrawler()
+# Components are created on first use: importing the API (and serving endpoints
+# that need none of them) must not pay for Gemini, Playwright or Supabase clients.
+_db = None
+_db_initialized = False
+_db_lock = None
+_generator = None
+_crawler = None
+_retriever = None
+_recommender = None
+
+async def get_db():
+    """Shared AsyncSupabaseManager, or None when the DB is unavailable (mock db mode)."""
+    global _db, _db_initialized, _db_lock
+    if not _db_initialized:
+        if _db_lock is None:
+            _db_lock = asyncio.Lock()
+        async with _db_lock:
+            if not _db_initialized:
+                try:
+                    from utils.async_db import AsyncSupabaseManager
+                    _db = await AsyncSupabaseManager.create()
+                except Exception:
+                    logger.warning("DB connection failed, running in mock db mode internally")
+                    _db = None
+                _db_initialized = True
+    return _db
+
+def get_generator():
+    global _generator
+    if _generator is None:
+        from generator.generator import AIGenerator
+        _generator = AIGenerator(mock=False) # We want real AI for trends if possible
+    return _generator
+
+def get_crawler():
+    global _crawler
+    if _crawler is None:
+        from crawler.crawler import BeautyCrawler
+        _crawler = BeautyCrawler()
+    return _crawler
+
+def get_retriever():
+    """Local BM25 + embedding passage indexes (AURA_INDEX_DIR); built with `python -m retrieval.search --rebuild`."""
+    global _retriever
+    if _retriever is None:
+        from retrieval.search import Retriever
+        _retriever = Retriever()
+    return _retriever
+
+def get_recommender(db):
+    """Ready pool of verified media recommendations (crawler/recommendations.py), deduped against every source."""
+    global _recommender
+    if _recommender is None:
+        from crawler.recommendations import MediaRecommender
+
+        async def source_urls():
+            return [r['url'] async for r in db.iter_sources(active_only=False, columns="id, url")]
+
+        _recommender = MediaRecommender(get_generator().recommend_media_sources, source_urls)
+    return _recommender
+
+jobs = JobRegistry()
+
+# Admission control: bounded in-memory queues per job type (overridable via
+# AURA_GENERATE_MAX_QUEUE / _MAX_CONCURRENCY / _MAX_PER_CLIENT, same for CRAWL).
+# Clients are the configured API keys; with a single key (the web proxy) a
+# per-client cap would only shrink the queue, so it defaults to the full depth.
+generate_admission = AdmissionController.from_env(
+    "generate", max_queue_depth=20, max_concurrency=2,
+    max_per_client=10 if len(configured_api_keys()) > 1 else None,
+)
+crawl_admission = AdmissionController.from_env("crawl", max_queue_depth=1, max_concurrency=1)
+MAX_TARGET_COUNT = int(os.getenv("AURA_MAX_TARGET_COUNT", 5))
+# Which sources a crawl visits (next_crawl_at from each source's change history)
+crawl_scheduler = CrawlScheduler()
+
+def too_many_requests(rejection: AdmissionRejected):
+    logger.warning(f"Admission rejected: {rejection}")
+    return HTTPException(
+        status_code=429,
+        detail=f"Engine is busy ({rejection.reason}). Retry later.",
+        headers={"Retry-After": str(rejection.retry_after)},
+    )
 
 class KeywordRequest(BaseModel):
     keyword: str
-    target_count: int = 1
+    target_count: int = Field(1, ge=1, le=MAX_TARGET_COUNT)
+    force: bool = False  # Skip keyword dedupe and always run the pipeline
 
 class TrendResponse(BaseModel):
     keywords: List[str]
@@ -79,6 +196,7 @@ async def revise_article_endpoint(request: RevisionRequest):
     """
     Revises an article based on feedback.
     """
+    generator = get_generator()
     try:
         revised_content = await generator.revise_article(request.content, request.feedback)
         if not revised_content:
@@ -88,20 +206,32 @@ async def revise_article_endpoint(request: RevisionRequest):
         logger.error(f"Revision failed: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+# Trends are served from memory for as long as clients may cache them (max-age=300),
+# so dashboard polling neither re-runs Gemini nor changes the ETag.
+trends_memo = ResponseMemo(ttl=300)
+
 @app.get("/trends", response_model=TrendResponse)
-async def get_trends():
+async def get_trends(request: Request):
     """
     Generates trending beauty keywords using Gemini, 
     incorporating data from recently crawled articles (Learning Data).
     """
+    trends = trends_memo.get()
+    if trends is None:
+        trends = await compute_trends()
+    return etag_json_response(request, trends)
+
+async def compute_trends():
+    db = await get_db()
+    generator = get_generator()
     try:
         # 1. Fetch recent learning data (last 7 days, limit 20)
         learning_context = ""
         if db:
             try:
                 # Simple fetch of recent articles
-                res = db.client.from_("crawled_articles")\
-                    .select("title, content")\
+                res = await db.client.from_("crawled_articles")\
+                    .select("title")\
                     .order("crawled_at", desc=True)\
                     .limit(10)\
                     .execute()
@@ -140,7 +270,9 @@ async def get_trends():
         cleaned_str = trends_json_str.replace("```json", "").replace("```", "").strip()
         try:
             data = json.loads(cleaned_str)
-            return TrendResponse(keywords=data.get("keywords", []))
+            trends = TrendResponse(keywords=data.get("keywords", []))
+            trends_memo.set(trends)
+            return trends
         except:
              # Try simple regex if json load fails
              import re
@@ -148,7 +280,9 @@ async def get_trends():
              # filtered matches that look like keywords (not keys like "keywords")
              kws = [m for m in matches if m != "keywords"]
              if kws:
-                 return TrendResponse(keywords=kws[:10])
+                 trends = TrendResponse(keywords=kws[:10])
+                 trends_memo.set(trends)
+                 return trends
              raise ValueError("Failed to parse JSON")
 
     except Exception as e:
@@ -164,37 +298,90 @@ async def get_trends():
         # Fallback
         return TrendResponse(keywords=["韓国肌管理", "ポテンツァ", "水光注射", "レチノール", "医療ダイエット", "アートメイク"])
 
+async def find_recent_articles(keywords):
+    """Returns {keyword_normalized: article} for articles generated inside the dedupe window."""
+    db = await get_db()
+    if not db:
+        return {}
+    since = datetime.now(timezone.utc) - timedelta(seconds=jobs.window_seconds)
+    try:
+        return await db.find_recent_articles_by_keywords({normalize_keyword(k) for k in keywords}, since.isoformat())
+    except Exception as e:
+        logger.warning(f"Dedupe: Failed to look up existing articles: {e}")
+        return {}
+
 @app.post("/generate")
-async def generate_single_article(request: KeywordRequest, background_tasks: BackgroundTasks):
+async def generate_single_article(
+    request: KeywordRequest,
+    x_aura_profile: Optional[str] = Header(None),
+    idempotency_key: Optional[str] = Header(None),
+    client_id: str = Depends(get_client_id),
+):
     """
     Triggers generation for a single keyword.
+    Repeated requests (same Idempotency-Key header, or same normalized keyword
+    inside AURA_DEDUPE_WINDOW_HOURS) return the earlier job or article instead.
     """
     try:
         keyword = request.keyword
         target_count = request.target_count
         
-        if not keyword:
+        if not keyword or not normalize_keyword(keyword):
             raise HTTPException(status_code=400, detail="Keyword is required")
-            
-        logger.info(f"Manual Gen - Triggering task for: {keyword}")
+
+        # Reserved before any await, so a concurrent duplicate finds this job
+        job, existing_job = jobs.reserve(keyword, total=target_count, idempotency_key=idempotency_key, force=request.force)
+        if existing_job:
+            if idempotency_key and existing_job.idempotency_key == idempotency_key:
+                logger.info(f"Manual Gen - Idempotent replay for key {idempotency_key}")
+                return {"status": "duplicate", "message": f"Request already accepted for: {existing_job.keyword}", "job": existing_job.to_dict()}
+            logger.info(f"Manual Gen - Keyword already queued: {keyword} (job {existing_job.job_id})")
+            return {"status": "duplicate", "message": f"Generation already running for: {keyword}", "job": existing_job.to_dict()}
+
+        try:
+            if not request.force:
+                existing_article = (await find_recent_articles([keyword])).get(normalize_keyword(keyword))
+                if existing_article:
+                    logger.info(f"Manual Gen - Keyword already covered: {keyword} (article {existing_article['id']})")
+                    jobs.release(job)
+                    return {"status": "duplicate", "message": f"Article already exists for: {keyword}", "article": existing_article}
+
+            try:
+                tickets = generate_admission.admit(client_id, count=target_count)
+            except AdmissionRejected as rejection:
+                raise too_many_requests(rejection)
+        except BaseException:
+            jobs.release(job)
+            raise
+
+        logger.info(f"Manual Gen - Triggering task for: {keyword} (job {job.job_id})")
         
-        # Add to background tasks
-        for _ in range(target_count):
-             background_tasks.add_task(process_keyword_generation, keyword)
+        # Each ticket runs as its own task
+        for ticket in tickets:
+             generate_admission.spawn(ticket, process_keyword_generation, keyword, job_id=job.job_id, profile=x_aura_profile == "1")
              
-        return {"status": "accepted", "message": f"Generation started for: {keyword}"}
+        return {"status": "accepted", "message": f"Generation started for: {keyword}", "job": job.to_dict()}
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Manual generation failed: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/generate_bulk")
-async def generate_bulk_articles(background_tasks: BackgroundTasks):
+async def generate_bulk_articles(client_id: str = Depends(get_client_id)):
     """
     Triggers bulk generation of articles based on current trends.
     Selects top 3 trending keywords that haven't been covered yet.
     """
+    generator = get_generator()
     try:
+        # 0. Fail fast before spending a Gemini call if we could not queue anything
+        try:
+            generate_admission.ensure_capacity(client_id, count=1)
+        except AdmissionRejected as rejection:
+            raise too_many_requests(rejection)
+
         # 1. Fetch Trends (Re-using the logic from get_trends)
         
         prompt = """
@@ -230,118 +417,252 @@ async def generate_bulk_articles(background_tasks: BackgroundTasks):
              candidates = ["韓国水光肌", "ポテンツァ", "医療ダイエット", "エクソソーム"]
              logger.info("Bulk Gen - Using Fallback Candidates")
 
-        # 2. Filter out existing articles (Mocked for now)
-        target_keywords = candidates[:3]
+        # 2. Filter out keywords already covered or queued inside the dedupe window
+        existing_articles = await find_recent_articles(candidates)
+        target_keywords = []
+        seen = set()
+        for kw in candidates:
+            normalized = normalize_keyword(kw)
+            if not normalized or normalized in seen:
+                continue
+            seen.add(normalized)
+            if normalized in existing_articles or jobs.find_in_flight(kw):
+                logger.info(f"Bulk Gen - Skipping already covered keyword: {kw}")
+                continue
+            target_keywords.append(kw)
+            if len(target_keywords) >= 3:
+                break
         
-        # 3. Trigger Generation
-        for kw in target_keywords:
-            logger.info(f"Bulk Gen - Triggering task for: {kw}")
-            background_tasks.add_task(process_keyword_generation, kw)
+        # 3. Trigger Generation (as many as admission allows right now)
+        queued = []
+        for kw in list(target_keywords):
+            # Re-checked atomically: another request may have queued it during the await above
+            job, existing_job = jobs.reserve(kw)
+            if existing_job:
+                logger.info(f"Bulk Gen - Skipping keyword queued meanwhile: {kw}")
+                target_keywords.remove(kw)
+                continue
+            try:
+                ticket, = generate_admission.admit(client_id)
+            except AdmissionRejected as rejection:
+                jobs.release(job)
+                logger.warning(f"Bulk Gen - Queue saturated, dropping remaining keywords: {rejection}")
+                target_keywords = target_keywords[:len(queued)]
+                if not queued:
+                    raise too_many_requests(rejection)
+                break
+            logger.info(f"Bulk Gen - Triggering task for: {kw} (job {job.job_id})")
+            generate_admission.spawn(ticket, process_keyword_generation, kw, job_id=job.job_id)
+            queued.append(job.to_dict())
             
-        return {"status": "accepted", "message": f"Bulk generation started for: {', '.join(target_keywords)}", "keywords": target_keywords}
+        return {"status": "accepted", "message": f"Bulk generation started for: {', '.join(target_keywords)}", "keywords": target_keywords, "jobs": queued}
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Bulk generation CRITICAL FAILURE: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/media/crawl")
-async def crawl_media_sources(background_tasks: BackgroundTasks):
+async def crawl_media_sources(resume: bool = False, force: bool = False, client_id: str = Depends(get_client_id)):
     """
-    Triggers crawling for all active media sources.
+    Triggers crawling for the active media sources that are due (CrawlScheduler),
+    most overdue first and at most AURA_CRAWL_BUDGET per run. `force=true` crawls
+    every active source. `resume=true` continues the last unfinished crawl run,
+    skipping sources it already saved.
     """
+    db = await get_db()
     try:
         if not db:
             raise HTTPException(status_code=503, detail="Database not available")
             
         # 1. Fetch active sources
-        response = db.client.from_("sources").select("*").eq("is_active", True).execute()
+        response = await db.get_sources(columns=SOURCE_SCHEDULE_COLUMNS)
         sources = response.data
         
         if not sources:
             return {"message": "No active sources found to crawl."}
+        if not force:
+            sources = crawl_scheduler.select(sources)
+            if not sources:
+                return {"message": "No sources are due for crawling."}
             
         # 2. Trigger crawling for each source (in background to avoid timeout)
-        background_tasks.add_task(process_media_crawl, sources)
+        try:
+            ticket, = crawl_admission.admit(client_id)
+        except AdmissionRejected as rejection:
+            raise too_many_requests(rejection)
+        crawl_admission.spawn(ticket, process_media_crawl, sources, resume=resume)
         
-        return {"status": "accepted", "message": f"Started crawling for {len(sources)} sources."}
+        return {"status": "accepted", "message": f"Started crawling for {len(sources)} sources.", "resume": resume}
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Media crawl initiation failed: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-async def process_media_crawl(sources):
-    """Background task to crawl sources and save data."""
+async def process_media_crawl(sources, profile=False, resume=False):
+    """Background task to crawl sources and save data, checkpointed per source."""
     logger.info("Starting media crawl...")
-    await crawler.start_browser()
+    with span("process_media_crawl", **{"aura.sources": len(sources), "aura.resume": resume}), profile_if_slow("process_media_crawl", force=profile):
+        checkpoint = RunCheckpoint("media_crawl", resume=resume)
+        try:
+            if await _process_media_crawl(sources, checkpoint):
+                checkpoint.finish()
+        finally:
+            checkpoint.close()
+
+CRAWL_WRITE_BATCH = int(os.getenv("AURA_CRAWL_WRITE_BATCH", 50))
+
+async def _save_crawled_batch(db, pending, result, checkpoint, crawls):
+    """After a bulk upsert: store chunks, record the source crawls and index the saved pages."""
+    saved = {row['url']: row['id'] for row in result.succeeded}
+    for error in result.errors:
+        logger.error(f"Failed to save crawled data for {error['row']['url']}: {error['error']}")
+    if not saved:
+        return
+
+    chunks_by_article = {saved[url]: pending[url][0].get('chunks') or [] for url in saved if url in pending}
+    try:
+        with span("db.save_crawled_chunks", **{"aura.articles": len(chunks_by_article)}):
+            await db.replace_crawled_chunks(chunks_by_article)
+    except Exception as e:
+        logger.error(f"Failed to save crawled chunks: {e}")
+
+    for url in saved:
+        if url not in pending:
+            continue
+        data, source, crawl = pending.pop(url)
+        await crawls.add(crawl)
+        checkpoint.mark(source['url'], "saved")
+        logger.info(f"Successfully crawled and saved: {url}")
+        try:
+            with span("retrieval.index_article"):
+                get_retriever().add_article(url, data.get('title', 'No Title'), data.get('chunks') or [], source.get('name'))
+        except Exception as e:
+            logger.error(f"Failed to index crawled data for {url}: {e}")
+
+def _log_source_crawl_errors(result):
+    for error in result.errors:
+        logger.error(f"Failed to record crawl for source {error['row']['id']}: {error['error']}")
+
+async def _process_media_crawl(sources, checkpoint):
+    """Returns True when every source was attempted and the writes were flushed."""
+    db = await get_db()
+    crawler = get_crawler()
+    # The browser starts on the first page that needs rendering (BeautyCrawler.fetch_rendered)
+    try:
+        with span("db.get_extraction_templates"):
+            crawler.templates.load((await db.get_extraction_templates(template_domain(s['url']) for s in sources)).data)
+    except Exception as e:
+        logger.error(f"Failed to load extraction templates: {e}")
+
+    # Crawled pages are upserted in batches (by size or age), not one request per source
+    pending = {}  # url -> (crawled data, source, crawl observation)
+    crawls = db.write_buffer(db.bulk_record_source_crawls, batch_size=CRAWL_WRITE_BATCH, on_flush=_log_source_crawl_errors)
+    writes = db.write_buffer(
+        db.bulk_upsert_crawled,
+        batch_size=CRAWL_WRITE_BATCH,
+        on_flush=lambda result: _save_crawled_batch(db, pending, result, checkpoint, crawls),
+    )
+    completed = False
     
     try:
-        from datetime import datetime, timezone
-        
         for source in sources:
             url = source['url']
             source_id = source['id']
+            if checkpoint.done(url, "saved"):
+                logger.info(f"Already saved in this run, skipping: {url}")
+                continue
             logger.info(f"Crawling source: {source['name']} ({url})")
             
-            # Fetch content
-            data = await crawler.fetch_page_content(url)
-            
-            if data and data.get('content'):
-                # Save to crawled_articles
-                article_data = {
-                    "source_id": source_id,
-                    "title": data.get('title', 'No Title'),
-                    "content": data.get('content'),
-                    "url": data.get('source_url', url),
-                    # "crawled_at": is auto-generated or we can set it
-                }
+            with span("crawl.source", **{"aura.source_id": source_id, "url.full": url}) as source_span:
+                # Fetch content (or reuse the page crawled before the previous run died)
+                data = checkpoint.payload(url, "crawl")
+                if data is None:
+                    with span("crawler.fetch_page_content"):
+                        try:
+                            data = await crawler.fetch_page_content(url, selector=source.get('content_selector'))
+                        except Exception as e:
+                            logger.error(f"Fetching {url} failed: {e}")
+                    if data and data.get('content'):
+                        checkpoint.mark(url, "crawl", data)
                 
-                # Upsert based on URL to avoid duplicates (requires unique constraint on url)
-                try:
-                    db.client.from_("crawled_articles").upsert(article_data, on_conflict="url").execute()
-                    
-                    # Update source last_crawled_at
-                    db.client.from_("sources").update({
-                        "last_crawled_at": datetime.now(timezone.utc).isoformat()
-                    }).eq("id", source_id).execute()
+                if data and data.get('content'):
+                    source_span.set_attribute("aura.content_chars", len(data['content']))
+                    crawl, changed = crawl_scheduler.observe(source, data['content'])
+                    # Selector the content came from, tried first on the next crawl
+                    crawl["content_selector"] = data.get('content_selector')
+                    source_span.set_attribute("aura.changed", changed)
+                    if not changed:
+                        # Same text as last time: only the schedule needs updating
+                        logger.info(f"Unchanged since last crawl: {url} (next in {crawl['revisit_interval_seconds']}s)")
+                        await crawls.add(crawl)
+                        checkpoint.mark(url, "saved")
+                        continue
+                    # Save to crawled_articles
+                    article_data = {
+                        "source_id": source_id,
+                        "title": data.get('title', 'No Title'),
+                        "content": data.get('content'),
+                        "url": data.get('source_url', url),
+                        # "crawled_at": is auto-generated or we can set it
+                    }
                     
-                    logger.info(f"Successfully crawled and saved: {url}")
-                except Exception as e:
-                    logger.error(f"Failed to save crawled data for {url}: {e}")
-            else:
-                 logger.warning(f"No content found for {url}")
+                    # Upsert based on URL to avoid duplicates (requires unique constraint on url)
+                    pending[article_data['url']] = (data, source, crawl)
+                    with span("db.save_crawled_articles"):
+                        await writes.add(article_data)
+                else:
+                     logger.warning(f"No content found for {url}")
+                     # Backs the source off instead of leaving it due for the next run
+                     await crawls.add(crawl_scheduler.observe_failure(source))
+        completed = True
                  
     except Exception as e:
         logger.error(f"Media crawl process failed: {e}")
     finally:
         await crawler.close_browser()
+        logger.info(f"Crawler page memory: {crawler.stats()}")
+        try:
+            with span("db.save_crawled_articles"):
+                await writes.close()
+            logger.info(f"Media crawl writes: {writes.result}")
+        except Exception as e:
+            logger.error(f"Failed to save crawled data: {e}")
+            completed = False
+        try:
+            with span("db.record_source_crawls"):
+                await crawls.close()
+        except Exception as e:
+            logger.error(f"Failed to record source crawls: {e}")
+        try:
+            with span("db.save_extraction_templates"):
+                result = await db.bulk_upsert_extraction_templates(crawler.templates.pop_changes())
+            for error in result.errors:
+                logger.error(f"Failed to save extraction template for {error['row']['domain']}: {error['error']}")
+        except Exception as e:
+            logger.error(f"Failed to save extraction templates: {e}")
+        try:
+            with span("retrieval.flush"):
+                # Embedding new passages is a blocking remote call for the Gemini embedder
+                await asyncio.to_thread(get_retriever().flush)
+        except Exception as e:
+            logger.error(f"Failed to persist retrieval index: {e}")
+    return completed
 
 
 @app.get("/debug/rag")
-async def debug_rag(keyword: str):
+async def debug_rag(keyword: str, request: Request):
     """Debug endpoint to check RAG retrieval."""
-    if not db:
-        return {"error": "DB not available"}
-    
     try:
-        # Cross-Language Search
-        kr_keyword = await generator.translate_to_korean(keyword)
-        
-        # Search for keyword (JP) OR translated keyword (KR)
-        query = f"title.ilike.%{keyword}%,content.ilike.%{keyword}%"
-        if kr_keyword and kr_keyword != keyword:
-             query += f",title.ilike.%{kr_keyword}%,content.ilike.%{kr_keyword}%"
-             
-        res = db.client.from_("crawled_articles")\
-            .select("title, content, url, source:sources(name)")\
-            .or_(query)\
-            .limit(5)\
-            .execute()
-        return {
-            "keyword_jp": keyword,
-            "keyword_kr": kr_keyword,
-            "count": len(res.data) if res.data else 0, 
-            "results": res.data
-        }
+        results = await search_learning_passages(keyword, limit=5)
+        return etag_json_response(request, {
+            "keyword": keyword,
+            "count": len(results), 
+            "results": results
+        })
     except Exception as e:
         return {"error": str(e)}
 
@@ -354,11 +675,57 @@ async def generate_article_from_keyword(request: KeywordRequest, background_task
     background_tasks.add_task(process_keyword_generation, request.keyword)
     return {"status": "accepted", "message": f"Generation started for keyword: {request.keyword}"}
 
-async def process_keyword_generation(keyword: str):
+@app.get("/admission/stats")
+async def get_admission_stats():
+    """Queue depth, rejections and queue-wait percentiles per job type."""
+    return {"generate": generate_admission.stats(), "crawl": crawl_admission.stats()}
+
+@app.get("/jobs/{job_id}")
+async def get_generation_job(job_id: str, request: Request):
+    """Returns the progress of a generation job created by /generate or /generate_bulk."""
+    job = jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return etag_json_response(request, job.to_dict())
+
+async def search_learning_passages(keyword, limit=3):
+    """
+    Top passages for the keyword from the local indexes, topped up from the DB search:
+    the local indexes only hold what this process crawled since it was deployed.
+    """
+    passages = []
+    try:
+        passages = await asyncio.to_thread(get_retriever().search, keyword, limit)
+        if len(passages) >= limit:
+            return passages
+    except Exception as e:
+        logging.getLogger("uvicorn").error(f"Local retrieval failed, using DB search: {e}")
+    db = await get_db()
+    if not db:
+        return passages
+    seen = {(p["url"], p["excerpt"]) for p in passages}
+    for hit in await db.search_crawled_chunks([keyword], limit=limit):
+        if len(passages) < limit and (hit.get("url"), hit.get("excerpt")) not in seen:
+            passages.append(hit)
+    return passages
+
+async def process_keyword_generation(keyword: str, job_id=None, profile=False):
+    article_id = None
+    try:
+        with span("process_keyword_generation", **{"aura.keyword": keyword}), profile_if_slow(f"generate-{keyword}", force=profile):
+            article_id = await _process_keyword_generation(keyword)
+    finally:
+        if job_id:
+            jobs.record_result(job_id, article_id=article_id, success=article_id is not None)
+
+async def _process_keyword_generation(keyword: str):
     # Use uvicorn logger for visibility
     logger = logging.getLogger("uvicorn")
     logger.info(f"Processing keyword: {keyword}")
     found_urls = [] # Initialize for compatibility
+    db = await get_db()
+    generator = get_generator()
+    crawler = get_crawler()
     
     # MIGRATED: User requested to use "googleSearch" tool natively.
     # We skip manual `search()` and `crawler` access.
@@ -370,39 +737,20 @@ async def process_keyword_generation(keyword: str):
     # 1. Fetch Learning Context (RAG)
     learning_context = ""
     try:
-        if db:
-            logger.info(f"Searching for learning data for keyword: {keyword}...")
-            # Cross-Language Search
-            kr_keyword = await generator.translate_to_korean(keyword)
-            logger.info(f"RAG: Translated '{keyword}' to '{kr_keyword}' for search.")
-            
-            # Construct OR query for JP and KR
-            query = f"title.ilike.%{keyword}%,content.ilike.%{keyword}%"
-            if kr_keyword and kr_keyword != keyword:
-                 query += f",title.ilike.%{kr_keyword}%,content.ilike.%{kr_keyword}%"
-
-            res = db.client.from_("crawled_articles")\
-                .select("title, content, url, source:sources(name)")\
-                .or_(query)\
-                .limit(3)\
-                .execute()
-            
-            if res.data:
-                articles = res.data
-                context_parts = []
-                for art in articles:
-                    source_name = art.get('source', {}).get('name') if art.get('source') else 'Unknown Source'
-                    # Truncate content to avoid token overflow (though Gemini Flash has large window, let's differ to 2000 chars per article)
-                    content_preview = art['content'][:2000].replace('\n', ' ')
-                    context_parts.append(f"## 参考記事: {art['title']}\n- 出典: {source_name}\n- URL: {art['url']}\n- 内容抜粋: {content_preview}...")
-                
-                learning_context = "\n\n".join(context_parts)
-                logger.info(f"RAG: Retrieved {len(articles)} articles for learning context.")
-            else:
-                logger.info("RAG: No relevant learning data found (count=0).")
+        logger.info(f"Searching for learning data for keyword: {keyword}...")
+        # Hybrid BM25 + multilingual embedding search over the local passage
+        # indexes; Korean sources match a Japanese keyword without translating it.
+        # The ranked DB passage search covers indexes that have not been built yet.
+        with span("rag.query") as rag_span:
+            articles = await search_learning_passages(keyword, limit=3)
+            rag_span.set_attribute("aura.rag_hits", len(articles))
+
+        if articles:
+            learning_context = format_learning_context(articles)
+            logger.info(f"RAG: Retrieved {len(articles)} articles for learning context.")
         else:
-             logger.warning("RAG: DB not available working in mock mode.")
-             
+            logger.info("RAG: No relevant learning data found (count=0).")
+
     except Exception as e:
         logger.error(f"RAG Search failed: {e}")
         # Proceed without context
@@ -414,71 +762,24 @@ async def process_keyword_generation(keyword: str):
     existing_categories = []
     if db:
         try:
-            cat_res = db.get_categories()
-            if cat_res.data:
-                existing_categories = [c['name'] for c in cat_res.data]
+            with span("db.get_categories"):
+                existing_categories = [c['name'] for c in await db.get_categories()]
         except Exception as e:
             logger.error(f"Failed to fetch categories: {e}")
 
     # Generate content (expecting JSON)
-    generated_json = await generator.generate_article_with_grounding(
-        keyword=keyword,
-        learning_context=learning_context,
-        existing_categories=existing_categories
-    )
+    with span("llm.grounding"):
+        generated_json = await generator.generate_article_with_grounding(
+            keyword=keyword,
+            learning_context=learning_context,
+            existing_categories=existing_categories
+        )
     
     if generated_json:
         # Parse JSON
         title = f"【徹底解説】{keyword}の最新事情" # Default fallback
-        article_content = ""
-        category_name = None
-        
-        # 1. Clean wrappers
-        cleaned_json = generated_json.replace("```json", "").replace("```", "").strip()
-        if "{" in cleaned_json:
-            start_idx = cleaned_json.find("{")
-            end_idx = cleaned_json.rfind("}") + 1
-            cleaned_json = cleaned_json[start_idx:end_idx]
-
-        try:
-            # 2. Try strict JSON parse
-            data = json.loads(cleaned_json)
-            title = data.get("title", title)
-            article_content = data.get("content", "")
-            category_name = data.get("category")
-            
-        except json.JSONDecodeError as e:
-            logger.warning(f"JSON Parse Failed: {e}. Attempting regex extraction.")
-            # 3. Regex Fallback
-            # Extract Title
-            t_match = re.search(r'"title":\s*"([^"]+)"', cleaned_json)
-            if t_match: title = t_match.group(1)
-            
-            # Extract Category
-            c_match = re.search(r'"category":\s*"([^"]+)"', cleaned_json)
-            if c_match: category_name = c_match.group(1)
-            
-            # Extract Content (Tricky because of quotes and newlines)
-            # We assume content comes last or is distinct.
-            # Look for "content": " ... "
-            # Using dotall to match newlines
-            con_match = re.search(r'"content":\s*"(.*)"\s*(\}|,)', cleaned_json, re.DOTALL)
-            if con_match: 
-                article_content = con_match.group(1)
-                # Unescape standard JSON escapes that might be in there
-                article_content = article_content.replace('\\n', '\n').replace('\\"', '"')
-            else:
-                # 4. If all else fails, checking if it's just raw markdown without JSON wrappers
-                # If the string starts with { "title":, it's definitely broken JSON. 
-                # If we fail to extract content, we should NOT return the JSON string.
-                # Instead, search for the first H1 or H2
-                logger.error("Could not extract content from broken JSON.")
-                # Last resort: Try to find start of markdown
-                m_start = cleaned_json.find("# ")
-                if m_start != -1:
-                    article_content = cleaned_json[m_start:]
-                else:
-                     article_content = "（記事生成に失敗しました。JSON形式のエラーです。）\n\nOriginal Output:\n" + cleaned_json[:200]
+        # Strict JSON, then regex recovery for broken JSON (generator/parsing.py)
+        title, article_content, category_name = parse_generated_article(generated_json, title)
         
         # Validate content not empty
         if not article_content:
@@ -488,23 +789,17 @@ async def process_keyword_generation(keyword: str):
         category_id = None
         if db and category_name:
             try:
-                category_id = db.get_or_create_category(category_name)
-                logger.info(f"Assigned category: {category_name} (ID: {category_id})")
-            except Exception as e:
-                logger.error(f"Failed to process category {category_name}: {e}")
-        category_id = None
-        if db and category_name:
-            try:
-                category_id = db.get_or_create_category(category_name)
+                with span("db.get_or_create_category"):
+                    category_id = await db.get_or_create_category(category_name)
                 logger.info(f"Assigned category: {category_name} (ID: {category_id})")
             except Exception as e:
                 logger.error(f"Failed to process category {category_name}: {e}")
 
         # Generate Thumbnail (AI)
         logger.info("Generating thumbnail with AI...")
-        thumb = await generator.generate_image(keyword, title=title)
-        if not thumb:
-            thumb = "https://placehold.co/1200x630/ffe4e6/be123c?text=AURA+Beauty"
+        with span("thumbnail.generate"):
+            thumbnail = await generator.generate_thumbnail(keyword, title=title, db=db) or {}
+        thumb = thumbnail.get("url") or "https://placehold.co/1200x630/ffe4e6/be123c?text=AURA+Beauty"
 
         # Save Draft
         article_data = {
@@ -513,14 +808,20 @@ async def process_keyword_generation(keyword: str):
             "status": "draft",
             "source_url": "google_search_grounding",
             "thumbnail_url": thumb, 
+            "thumbnail_variants": thumbnail.get("variants"),
             "generated_by": "gemini-2.0-flash-grounding",
-            "category_id": category_id
+            "category_id": category_id,
+            "keyword": keyword,
+            "keyword_normalized": normalize_keyword(keyword),
         }
         
         if db:
-            db.insert_article(article_data)
+            with span("db.insert_article"):
+                res = await db.insert_article(article_data)
             logger.info(f"Saved grounded draft for {keyword} in category {category_name}")
-        return
+            if res and res.data:
+                return res.data[0].get('id')
+        return None
 
     # Fallback to old logic if grounding returns empty (rare)
     logger.warning("Grounding failed, falling back to manual crawl...")
@@ -562,7 +863,8 @@ async def process_keyword_generation(keyword: str):
                 # 1. Start with AI Generation (Priority as requested)
                 logger.info("Generating thumbnail with AI...")
                 # Pass extracted title to potentially improve relevance
-                thumb = await generator.generate_image(keyword, title=title)
+                thumbnail = await generator.generate_thumbnail(keyword, title=title, db=db) or {}
+                thumb = thumbnail.get("url")
                 
                 # 2. If AI fails, fallback to crawled image
                 if not thumb:
@@ -582,10 +884,13 @@ async def process_keyword_generation(keyword: str):
                     "status": "draft",
                     "source_url": url,
                     "thumbnail_url": thumb, 
-                    "generated_by": "ai_misaki_keyword"
+                    "thumbnail_variants": thumbnail.get("variants"),
+                    "generated_by": "ai_misaki_keyword",
+                    "keyword": keyword,
+                    "keyword_normalized": normalize_keyword(keyword),
                 }
                 if db:
-                        db.insert_article(article_data)
+                        res = await db.insert_article(article_data)
                         logger.info(f"Saved draft for {keyword}")
                 else:
                     logger.info(f"Mock Save Draft: {article_data['title']}")
@@ -596,108 +901,40 @@ async def process_keyword_generation(keyword: str):
     finally:
         await crawler.close_browser()
 
-import random
-from urllib.parse import urlparse
-
-RECOMMENDATION_QUERIES = [
-    "美容整形 ブログ おすすめ",
-    "美容クリニック 評判 ブログ",
-    "美容皮膚科 体験記",
-    "医療ダイエット 経過 ブログ",
-    "AGA治療 体験 ブログ",
-    "低用量ピル 服用日記",
-    "韓国美容整形 レポ ブログ",
-    "美容ナース ブログ",
-    "美容情報サイト ランキング",
-    # Specific / Maniac / NightWork contexts as requested
-    "キャバ嬢 美容整形 ダウンタイム ブログ",
-    "夜職 美容代 内訳 ブログ",
-    "美容整形 失敗 修正 ブログ",
-    "鼻整形 経過 レポ",
-    "骨切り ダウンタイム 経過ブログ",
-    "美容オタク スキンケア 成分解析 ブログ",
-    "カンナムオンニ レポ 翻訳",
-    "美容医療 課金 リアル ブログ"
-]
+class DismissRecommendationRequest(BaseModel):
+    url: str
 
 @app.get("/media/recommendations")
-async def get_media_recommendations():
+async def get_media_recommendations(request: Request, advance: bool = Query(False, alias="next")):
     """
-    Returns 3 recommended beauty sources that are not yet in the database.
-    Process:
-    1. Pick a random query.
-    2. Search Google.
-    3. Filter out existing URLs (matching domain/host).
-    4. Fetch titles for top 3 candidates.
+    Returns 3 recommended beauty sources that are not yet in the database, each
+    verified to be live and carrying its og: title / description / image.
+    The same 3 are returned until they expire (AURA_RECOMMENDATION_SLICE_TTL),
+    `next=true` asks for the next ones, or one is dismissed. New ones come from
+    the pool MediaRecommender keeps filled in the background (several queries
+    searched at once, candidates checked in parallel); only an empty pool makes
+    the request wait for a search.
     """
+    db = await get_db()
     if not db:
         return {"error": "DB not available"}
 
     try:
-        # 1. Get existing domains to exclude
-        res = db.client.from_("sources").select("url").execute()
-        existing_urls = [r['url'] for r in res.data] if res.data else []
-        existing_domains = set()
-        for u in existing_urls:
-             try:
-                 existing_domains.add(urlparse(u).netloc)
-             except:
-                 pass
-
-        # 2. Search using Gemini Grounding
-        query = random.choice(RECOMMENDATION_QUERIES)
-        logger.info(f"Recommendation Search Query: {query}")
-        
-        # Use Gemini to get raw candidates
-        raw_candidates = await generator.recommend_media_sources(query)
-        logger.info(f"AI Recommendations: {raw_candidates}")
-        
-        filtered_results = []
-        seen_domains = set()
-        
-        for cand in raw_candidates:
-            try:
-                url = cand.get('url')
-                name = cand.get('name')
-                if not url: continue
-                
-                parsed = urlparse(url)
-                domain = parsed.netloc
-                
-                # Exclude if already in manual sources
-                if domain in existing_domains:
-                    continue
-                    
-                # Exclude if already in current candidates
-                if domain in seen_domains:
-                    continue
-                
-                # Exclude major platforms if path is root (generic)
-                if domain in ["twitter.com", "instagram.com", "facebook.com", "youtube.com", "tiktok.com"]:
-                    continue
-                
-                # Add to results
-                filtered_results.append({
-                    "name": name,
-                    "url": url,
-                    "query_used": query
-                })
-                seen_domains.add(domain)
-                
-                if len(filtered_results) >= 3:
-                    break
-            except:
-                continue
-        
-        return {"recommendations": filtered_results}
-
+        with span("recommendations.current"):
+            recommendations = await get_recommender(db).current(3, advance=advance)
+        return etag_json_response(request, {"recommendations": recommendations})
     except Exception as e:
         logger.error(f"Recommendation failed: {e}")
         return {"error": str(e), "recommendations": []}
 
-    except Exception as e:
-        logger.error(f"Recommendation failed: {e}")
-        return {"error": str(e), "recommendations": []}
+@app.post("/media/recommendations/dismiss")
+async def dismiss_media_recommendation(request: DismissRecommendationRequest):
+    """Stops recommending the domain of `url`; the next GET shows a replacement in its place."""
+    db = await get_db()
+    if not db:
+        return {"error": "DB not available"}
+    get_recommender(db).dismiss(request.url)
+    return {"status": "dismissed"}
 
 if __name__ == "__main__":
     import uvicorn
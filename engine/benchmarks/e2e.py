@@ -0,0 +1,318 @@
+"""
+End-to-end pipeline benchmark, fully offline and reproducible.
+
+Boots three processes on localhost: the API (api.py under uvicorn, with an
+in-memory FakeSupabaseManager injected and local RAG indexes built from the
+fixture pages), a mock Gemini/Imagen server (benchmarks/mock_gemini.py) and a
+static server for the fixture HTML. It then drives /generate jobs at a fixed
+client concurrency and reports throughput, job latency percentiles and peak RSS
+per process (Linux /proc VmHWM).
+
+    python -m benchmarks.e2e --articles 40 --concurrency 4
+    python -m benchmarks.e2e --llm-latency 3 --image-latency 6 --db-latency 0.05 --json
+    python -m benchmarks.e2e --crawl --articles 0     # media crawl only (needs Playwright Chromium)
+"""
+import os
+import sys
+import json
+import time
+import socket
+import atexit
+import shutil
+import asyncio
+import argparse
+import platform
+import resource
+import tempfile
+import subprocess
+
+ENGINE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES_DIR = os.path.join(ENGINE_DIR, "benchmarks", "fixtures")
+API_KEY = "bench-key"
+KEYWORDS = ["水光注射", "ポテンツァ", "エクソソーム", "リジュラン", "ハイフ", "シカクリーム", "ダーマペン", "ボトックス"]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def peak_rss_kib(pid):
+    """Peak resident set size of a live process (VmHWM), in KiB; None off Linux."""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        return None
+
+
+def child_pids(pid):
+    """Direct children of `pid` (the API's image workers and Playwright driver)."""
+    children = []
+    for entry in os.listdir("/proc") if os.path.isdir("/proc") else []:
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/status") as f:
+                if any(line.split()[1:2] == [str(pid)] for line in f if line.startswith("PPid:")):
+                    children.append(int(entry))
+        except OSError:
+            pass
+    return children
+
+
+def fixture_sources(fixture_url):
+    """One media source per fixture page, served by the static fixture server."""
+    pages = sorted(os.listdir(os.path.join(FIXTURES_DIR, "html")))
+    return [{"name": os.path.splitext(page)[0], "url": f"{fixture_url}/{page}"} for page in pages]
+
+
+def serve_api(args):
+    """Child process: api.py with the fake DB and a fixture-built RAG index."""
+    import uvicorn
+    import api
+    from crawler.crawler import BeautyCrawler
+    from benchmarks.fake_supabase import FakeSupabaseManager
+
+    api._db = FakeSupabaseManager(sources=fixture_sources(args.fixture_url), latency=args.db_latency)
+    api._db_initialized = True
+
+    retriever = api.get_retriever()
+    crawler = BeautyCrawler()
+    for source in fixture_sources(args.fixture_url):
+        with open(os.path.join(FIXTURES_DIR, "html", os.path.basename(source["url"])), encoding="utf-8") as f:
+            page = crawler.parse_content(f.read(), source["url"])
+        retriever.add_article(source["url"], page["title"], page["chunks"], source["name"])
+    retriever.flush()
+
+    @api.app.get("/bench/stats")
+    async def bench_stats():
+        return {"db": api._db.stats(), "generate": api.generate_admission.stats(), "crawl": api.crawl_admission.stats()}
+
+    uvicorn.run(api.app, host="127.0.0.1", port=args.port, log_level="warning")
+
+
+class Cluster:
+    """The benchmark's server processes, started in order and torn down at exit."""
+
+    def __init__(self, args):
+        self.args = args
+        self.workdir = tempfile.mkdtemp(prefix="aura-e2e-")
+        atexit.register(shutil.rmtree, self.workdir, True)
+        self.processes = {}
+        self.api_url = f"http://127.0.0.1:{free_port()}"
+        self.gemini_url = f"http://127.0.0.1:{free_port()}"
+        self.fixture_url = f"http://127.0.0.1:{free_port()}"
+
+    def spawn(self, name, argv, env=None):
+        log = open(os.path.join(self.workdir, f"{name}.log"), "w")
+        self.processes[name] = subprocess.Popen(argv, cwd=ENGINE_DIR, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+    def start(self):
+        args = self.args
+        self.spawn("fixtures", [sys.executable, "-m", "http.server", self.fixture_url.rsplit(":", 1)[1],
+                                "--bind", "127.0.0.1", "--directory", os.path.join(FIXTURES_DIR, "html")])
+        self.spawn("mock_gemini", [sys.executable, "-m", "benchmarks.mock_gemini", "--port", self.gemini_url.rsplit(":", 1)[1],
+                                   "--llm-latency", str(args.llm_latency), "--image-latency", str(args.image_latency)])
+        env = dict(
+            os.environ,
+            GEMINI_API_BASE=self.gemini_url,
+            GEMINI_API_KEY="bench",
+            AURA_API_KEY=API_KEY,
+            AURA_EMBEDDER="hash",
+            AURA_INDEX_DIR=os.path.join(self.workdir, "index"),
+            AURA_CHECKPOINT_DB=os.path.join(self.workdir, "checkpoints.db"),
+            AURA_GENERATE_MAX_CONCURRENCY=str(args.server_concurrency),
+            AURA_GENERATE_MAX_QUEUE=str(max(args.concurrency, 1) * 2),
+            AURA_GENERATE_MAX_PER_CLIENT=str(max(args.concurrency, 1) * 2),
+            # Set (empty) so a developer .env cannot point the run at real services
+            LINE_CHANNEL_ACCESS_TOKEN="",
+            SUPABASE_URL="",
+            SUPABASE_KEY="",
+        )
+        self.spawn("api", [sys.executable, "-m", "benchmarks.e2e", "--serve-api", "--port", self.api_url.rsplit(":", 1)[1],
+                           "--fixture-url", self.fixture_url, "--db-latency", str(args.db_latency)], env=env)
+
+    async def wait_ready(self, client, timeout=60):
+        deadline = time.monotonic() + timeout
+        for url in (f"{self.fixture_url}/", f"{self.gemini_url}/stats", f"{self.api_url}/bench/stats"):
+            while True:
+                for name, proc in self.processes.items():
+                    if proc.poll() is not None:
+                        raise RuntimeError(f"{name} exited with {proc.returncode}; see {self.workdir}/{name}.log")
+                try:
+                    if (await client.get(url)).status_code == 200:
+                        break
+                except Exception:
+                    pass
+                if time.monotonic() > deadline:
+                    raise RuntimeError(f"Timed out waiting for {url}")
+                await asyncio.sleep(0.2)
+
+    def peak_rss(self):
+        peaks = {name: peak_rss_kib(proc.pid) for name, proc in self.processes.items()}
+        workers = [peak_rss_kib(pid) for pid in child_pids(self.processes["api"].pid)]
+        peaks["api_children"] = max([w for w in workers if w] or [0]) or None
+        peaks["driver"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peaks
+
+    def stop(self):
+        for proc in self.processes.values():
+            proc.terminate()
+        for proc in self.processes.values():
+            try:
+                proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+
+
+def percentiles(values):
+    if not values:
+        return {"p50": None, "p95": None, "p99": None, "max": None}
+    ordered = sorted(values)
+
+    def pct(p):
+        return round(ordered[min(len(ordered) - 1, int(p * len(ordered)))], 3)
+
+    return {"p50": pct(0.5), "p95": pct(0.95), "p99": pct(0.99), "max": round(ordered[-1], 3)}
+
+
+async def generate_one(client, api_url, keyword, poll_interval):
+    """Submits one /generate job and waits for it; returns (status, seconds, rejections)."""
+    started = time.perf_counter()
+    rejections = 0
+    while True:
+        response = await client.post(f"{api_url}/generate", json={"keyword": keyword})
+        if response.status_code != 429:
+            break
+        rejections += 1
+        await asyncio.sleep(float(response.headers.get("Retry-After", 1)))
+    response.raise_for_status()
+    job = response.json().get("job")
+    if not job:
+        return "duplicate", time.perf_counter() - started, rejections
+    while job["status"] == "running":
+        await asyncio.sleep(poll_interval)
+        job = (await client.get(f"{api_url}/jobs/{job['job_id']}")).json()
+    return job["status"], time.perf_counter() - started, rejections
+
+
+async def run_generate(client, cluster, articles, concurrency, poll_interval):
+    semaphore = asyncio.Semaphore(concurrency)
+    run_id = int(time.time())
+
+    async def one(i):
+        async with semaphore:
+            # Unique keywords, so dedupe never short-circuits a job
+            return await generate_one(client, cluster.api_url, f"{KEYWORDS[i % len(KEYWORDS)]} {run_id}-{i}", poll_interval)
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(one(i) for i in range(articles)))
+    elapsed = time.perf_counter() - started
+    done = [seconds for status, seconds, _ in results if status == "done"]
+    return {
+        "articles": articles,
+        "succeeded": len(done),
+        "failed": sum(1 for status, _, _ in results if status != "done"),
+        "rejected_429": sum(r for _, _, r in results),
+        "elapsed_seconds": round(elapsed, 3),
+        "articles_per_hour": round(len(done) / elapsed * 3600, 1) if elapsed else 0.0,
+        "latency_seconds": percentiles(done),
+    }
+
+
+async def run_crawl(client, cluster, poll_interval, timeout):
+    started = time.perf_counter()
+    response = await client.post(f"{cluster.api_url}/media/crawl", params={"force": "true"})
+    response.raise_for_status()
+    while time.perf_counter() - started < timeout:
+        await asyncio.sleep(poll_interval)
+        crawl = (await client.get(f"{cluster.api_url}/admission/stats")).json()["crawl"]
+        if crawl["admitted_total"] and not crawl["depth"] and not crawl["running"]:
+            break
+    elapsed = time.perf_counter() - started
+    db = (await client.get(f"{cluster.api_url}/bench/stats")).json()["db"]
+    return {
+        "sources": len(fixture_sources(cluster.fixture_url)),
+        "pages_saved": db["crawled_articles"],
+        "elapsed_seconds": round(elapsed, 3),
+        "pages_per_minute": round(db["crawled_articles"] / elapsed * 60, 1) if elapsed else 0.0,
+    }
+
+
+async def run(args):
+    import httpx
+
+    cluster = Cluster(args)
+    cluster.start()
+    report = {"python": platform.python_version(), "machine": platform.machine(), "config": {
+        k: v for k, v in vars(args).items() if k not in ("serve_api", "port", "fixture_url", "json")
+    }}
+    try:
+        async with httpx.AsyncClient(timeout=120, headers={"X-API-Key": API_KEY, "X-Aura-Client": "bench"}) as client:
+            await cluster.wait_ready(client)
+            if args.crawl:
+                report["crawl"] = await run_crawl(client, cluster, args.poll_interval, args.crawl_timeout)
+            if args.articles:
+                report["generate"] = await run_generate(client, cluster, args.articles, args.concurrency, args.poll_interval)
+            stats = (await client.get(f"{cluster.api_url}/bench/stats")).json()
+            report["db_calls"] = stats["db"]["calls"]
+            report["admission"] = {"generate": stats["generate"]["queue_wait_seconds"], "crawl": stats["crawl"]["queue_wait_seconds"]}
+            report["mock_gemini_requests"] = (await client.get(f"{cluster.gemini_url}/stats")).json()["requests"]
+        report["peak_rss_kib"] = cluster.peak_rss()
+    finally:
+        cluster.stop()
+    return report
+
+
+def print_report(report):
+    generate = report.get("generate")
+    if generate:
+        latency = generate["latency_seconds"]
+        print(f"generate: {generate['succeeded']}/{generate['articles']} articles in {generate['elapsed_seconds']}s "
+              f"({generate['articles_per_hour']} articles/hour), {generate['rejected_429']} admission rejections")
+        print(f"  job latency p50 {latency['p50']}s  p95 {latency['p95']}s  p99 {latency['p99']}s  max {latency['max']}s")
+    crawl = report.get("crawl")
+    if crawl:
+        print(f"crawl: {crawl['pages_saved']}/{crawl['sources']} pages in {crawl['elapsed_seconds']}s ({crawl['pages_per_minute']} pages/min)")
+    print(f"admission queue wait: {report['admission']}")
+    print(f"DB calls: {report['db_calls']}")
+    print(f"mock Gemini requests: {report['mock_gemini_requests']}")
+    print("peak RSS:")
+    for name, kib in report["peak_rss_kib"].items():
+        print(f"  {name:20s} {kib / 1024:8.1f} MiB" if kib else f"  {name:20s}      n/a")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline end-to-end benchmark for the AURA engine")
+    parser.add_argument("--articles", type=int, default=20, help="Articles to generate (0 to skip)")
+    parser.add_argument("--concurrency", type=int, default=4, help="Jobs the driver keeps in flight")
+    parser.add_argument("--server-concurrency", type=int, default=2, help="AURA_GENERATE_MAX_CONCURRENCY for the API")
+    parser.add_argument("--crawl", action="store_true", help="Also run /media/crawl over the fixture pages (needs Playwright)")
+    parser.add_argument("--crawl-timeout", type=float, default=300)
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="Mock generateContent latency (seconds)")
+    parser.add_argument("--image-latency", type=float, default=1.0, help="Mock Imagen latency (seconds)")
+    parser.add_argument("--db-latency", type=float, default=0.02, help="Fake Supabase latency per call (seconds)")
+    parser.add_argument("--poll-interval", type=float, default=0.2)
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    parser.add_argument("--serve-api", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--fixture-url", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve_api:
+        return serve_api(args)
+    report = asyncio.run(run(args))
+    if args.json:
+        print(json.dumps(report, indent=2, ensure_ascii=False))
+    else:
+        print_report(report)
+    if report.get("generate", {}).get("failed"):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""
+Main-content extraction quality over the fixture pages.
+
+Each page in benchmarks/fixtures/html with a gold file in benchmarks/fixtures/extraction
+(the text a reader would call the article) is run through every extractor. Reports
+token precision / recall / F1 (CJK characters and Korean/Latin words as tokens),
+extracted characters and time per page. Exits 1 when --min-f1 is set and an
+extractor's mean F1 is below it.
+
+    python -m benchmarks.extraction_quality
+    python -m benchmarks.extraction_quality --extractor density --pages --min-f1 0.9
+"""
+import os
+import re
+import sys
+import glob
+import json
+import time
+import argparse
+from collections import Counter
+
+ENGINE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES_DIR = os.path.join(ENGINE_DIR, "benchmarks", "fixtures")
+
+# Latin/digit runs and Hangul words as one token each, every other word character (kanji, kana) alone
+TOKEN = re.compile(r"[0-9A-Za-z]+|[가-힣]+|[^\W\d_A-Za-z가-힣]")
+
+
+def tokens(text):
+    return Counter(TOKEN.findall(text))
+
+
+def score(extracted, gold):
+    """Token precision, recall and F1 of `extracted` against `gold` (multiset overlap)."""
+    got, want = tokens(extracted), tokens(gold)
+    overlap = sum((got & want).values())
+    precision = overlap / sum(got.values()) if got else 0.0
+    recall = overlap / sum(want.values()) if want else 0.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return precision, recall, f1
+
+
+def extract_legacy(html):
+    from crawler.crawler import BeautyCrawler
+
+    return BeautyCrawler().extract_soup(html)["blocks"]
+
+
+def extract_streaming(html):
+    from crawler.streaming import StreamingExtractor
+
+    extractor = StreamingExtractor()
+    extractor.feed(html)
+    extractor.close()
+    return extractor.result()["blocks"]
+
+
+def extract_density(html):
+    from crawler.extraction import extract_main_content
+
+    return extract_main_content(html)["blocks"]
+
+
+def learned_template_extractor(html):
+    """Density pass to learn the page's selector and noise selectors (untimed), then a timed extractor reusing them."""
+    from crawler.extraction import extract_main_content
+
+    learned = extract_main_content(html)
+    return lambda html: extract_main_content(html, learned["selector"], learned["noise"])["blocks"]
+
+
+EXTRACTORS = {
+    "legacy": lambda html: extract_legacy,
+    "streaming": lambda html: extract_streaming,
+    "density": lambda html: extract_density,
+    "template": learned_template_extractor,
+}
+
+
+def load_pages():
+    """[(name, html, gold text)] for every fixture page that has a gold file."""
+    pages = []
+    for gold_path in sorted(glob.glob(os.path.join(FIXTURES_DIR, "extraction", "*.txt"))):
+        name = os.path.splitext(os.path.basename(gold_path))[0]
+        with open(os.path.join(FIXTURES_DIR, "html", f"{name}.html"), encoding="utf-8") as f:
+            html = f.read()
+        with open(gold_path, encoding="utf-8") as f:
+            pages.append((name, html, f.read()))
+    return pages
+
+
+def evaluate(name, pages, repeat=5):
+    results = []
+    for page, html, gold in pages:
+        extract = EXTRACTORS[name](html)
+        started = time.perf_counter()
+        for _ in range(repeat):
+            blocks = extract(html)
+        elapsed = (time.perf_counter() - started) / repeat
+        text = "\n\n".join(block["text"] for block in blocks)
+        precision, recall, f1 = score(text, gold)
+        results.append({"page": page, "precision": round(precision, 3), "recall": round(recall, 3), "f1": round(f1, 3),
+                        "chars": len(text), "gold_chars": len(gold.strip()), "ms": round(elapsed * 1000, 2)})
+    return results
+
+
+def summarize(results):
+    n = len(results) or 1
+    return {
+        "precision": round(sum(r["precision"] for r in results) / n, 3),
+        "recall": round(sum(r["recall"] for r in results) / n, 3),
+        "f1": round(sum(r["f1"] for r in results) / n, 3),
+        "chars": sum(r["chars"] for r in results),
+        "ms_per_page": round(sum(r["ms"] for r in results) / n, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Main-content extraction precision/recall on the fixture pages")
+    parser.add_argument("--extractor", action="append", choices=list(EXTRACTORS), help="Extractor to run (repeatable; default: all)")
+    parser.add_argument("--pages", action="store_true", help="Also print per-page scores")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per page")
+    parser.add_argument("--min-f1", type=float, help="Fail when an extractor's mean F1 is below this")
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON")
+    args = parser.parse_args()
+
+    pages = load_pages()
+    report = {}
+    for name in args.extractor or list(EXTRACTORS):
+        results = evaluate(name, pages, repeat=args.repeat)
+        report[name] = {"summary": summarize(results), "pages": results}
+
+    if args.json:
+        print(json.dumps(report, indent=2, ensure_ascii=False))
+    else:
+        gold_chars = sum(len(gold.strip()) for _, _, gold in pages)
+        print(f"{len(pages)} pages, {gold_chars} gold chars")
+        print(f"{'extractor':18s} {'precision':>10s} {'recall':>8s} {'F1':>7s} {'chars':>8s} {'ms/page':>9s}")
+        for name, result in report.items():
+            s = result["summary"]
+            print(f"{name:18s} {s['precision']:10.3f} {s['recall']:8.3f} {s['f1']:7.3f} {s['chars']:8d} {s['ms_per_page']:9.2f}")
+            if args.pages:
+                for r in result["pages"]:
+                    print(f"  {r['page']:24s} {r['precision']:6.3f} {r['recall']:8.3f} {r['f1']:7.3f} {r['chars']:8d} {r['ms']:9.2f}")
+
+    if args.min_f1 is not None:
+        failed = [name for name, result in report.items() if result["summary"]["f1"] < args.min_f1]
+        for name in failed:
+            print(f"FAIL: {name} mean F1 {report[name]['summary']['f1']:.3f} < {args.min_f1}")
+        sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+"""
+In-memory stand-in for AsyncSupabaseManager, for offline benchmarks.
+
+Implements the manager surface the API and its jobs use, with an optional
+per-call latency to model PostgREST round trips. Every call is counted in
+`calls` so benchmark reports can show the DB work per article.
+"""
+import uuid
+import asyncio
+from collections import Counter
+from datetime import datetime, timezone
+
+from utils.db import BulkResult, category_slug, find_category, dedupe_by_url, clean_keywords
+from utils.async_db import AsyncWriteBuffer
+from utils.storage import content_key
+
+
+class Result:
+    """What postgrest's execute() returns, as far as callers look at it."""
+
+    def __init__(self, data):
+        self.data = data
+
+
+def _now():
+    return datetime.now(timezone.utc).isoformat()
+
+
+class FakeSupabaseManager:
+    def __init__(self, sources=None, categories=None, latency=0.0):
+        self.latency = latency
+        self.calls = Counter()
+        self.sources = [
+            dict({"id": str(uuid.uuid4()), "name": f"Source {i}", "type": "japanese_media", "is_active": True,
+                  "last_crawled_at": None, "created_at": _now()}, **source)
+            for i, source in enumerate(sources or [])
+        ]
+        self.category_rows = [
+            {"id": str(uuid.uuid4()), "name": name, "slug": category_slug(name)}
+            for name in (categories or ["美容", "スキンケア", "美容医療"])
+        ]
+        self.articles = []
+        self.crawled = {}  # url -> row
+        self.chunks = {}   # crawled article id -> chunks
+        self.uploads = {}  # key -> bytes
+        self.templates = {}  # domain -> extraction_templates row
+
+    async def _call(self, name):
+        self.calls[name] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    def stats(self):
+        return {
+            "calls": dict(self.calls),
+            "articles": len(self.articles),
+            "crawled_articles": len(self.crawled),
+            "uploads": len(self.uploads),
+            "extraction_templates": len(self.templates),
+            "upload_bytes": sum(len(data) for data in self.uploads.values()),
+        }
+
+    async def get_sources(self, columns=None):
+        await self._call("get_sources")
+        return Result([dict(s) for s in self.sources if s["is_active"]])
+
+    async def iter_sources(self, active_only=True, columns=None, page_size=None):
+        await self._call("iter_sources")
+        for source in self.sources:
+            if source["is_active"] or not active_only:
+                yield dict(source)
+
+    async def iter_rows(self, table, columns, filters=None, page_size=None, order_column="created_at", descending=True):
+        await self._call("iter_rows")
+        rows = {"articles": self.articles, "crawled_articles": list(self.crawled.values()), "sources": self.sources}[table]
+        for row in rows:
+            yield dict(row)
+
+    async def get_categories(self, refresh=False):
+        await self._call("get_categories")
+        return [dict(c) for c in self.category_rows]
+
+    async def get_or_create_category(self, name):
+        await self._call("get_or_create_category")
+        category_id = find_category(self.category_rows, name)
+        if not category_id:
+            category_id = str(uuid.uuid4())
+            self.category_rows.append({"id": category_id, "name": name, "slug": category_slug(name)})
+        return category_id
+
+    def invalidate_categories(self):
+        pass
+
+    async def insert_article(self, article_data):
+        await self._call("insert_article")
+        row = dict(article_data, id=str(uuid.uuid4()), created_at=_now())
+        self.articles.append(row)
+        return Result([row])
+
+    async def bulk_insert_articles(self, rows, batch_size=100):
+        await self._call("bulk_insert_articles")
+        result = BulkResult()
+        result.requests = 1
+        for row in rows:
+            stored = dict(row, id=str(uuid.uuid4()), created_at=_now())
+            self.articles.append(stored)
+            result.succeeded.append(stored)
+        return result
+
+    async def find_recent_articles_by_keywords(self, normalized_keywords, since_iso):
+        await self._call("find_recent_articles_by_keywords")
+        found = {}
+        for row in self.articles:
+            keyword = row.get("keyword_normalized")
+            if keyword in normalized_keywords and row["created_at"] >= since_iso:
+                found[keyword] = {"id": row["id"], "title": row["title"], "status": row["status"], "created_at": row["created_at"]}
+        return found
+
+    async def bulk_upsert_crawled(self, rows, batch_size=100):
+        await self._call("bulk_upsert_crawled")
+        result = BulkResult()
+        result.requests = 1
+        for row in dedupe_by_url(rows):
+            existing = self.crawled.get(row["url"])
+            stored = dict(existing or {"id": str(uuid.uuid4())}, **row, crawled_at=_now())
+            self.crawled[row["url"]] = stored
+            result.succeeded.append(stored)
+        return result
+
+    async def replace_crawled_chunks(self, chunks_by_article, batch_size=500):
+        await self._call("replace_crawled_chunks")
+        self.chunks.update(chunks_by_article)
+
+    async def search_crawled_chunks(self, keywords, limit=5, per_article=2):
+        await self._call("search_crawled_chunks")
+        keywords = clean_keywords(keywords)
+        hits = []
+        for row in self.crawled.values():
+            matching = [c for c in self.chunks.get(row["id"], []) if any(k in c["content"] for k in keywords)]
+            for chunk in matching[:per_article]:
+                hits.append({"title": row.get("title"), "url": row["url"], "heading": chunk.get("heading"),
+                             "excerpt": chunk["content"], "source_name": None})
+        return hits[:limit]
+
+    async def bulk_record_source_crawls(self, crawls, batch_size=100):
+        await self._call("bulk_record_source_crawls")
+        result = BulkResult()
+        result.requests = 1
+        by_id = {s["id"]: s for s in self.sources}
+        for crawl in crawls:
+            source = by_id.get(crawl["id"])
+            if source is None:
+                result.errors.append({"row": crawl, "error": "unknown source"})
+                continue
+            source.update({k: v for k, v in crawl.items() if k not in ("id", "crawled_at") and v is not None})
+            if crawl["crawled_at"]:
+                source["last_crawled_at"] = crawl["crawled_at"]
+            result.succeeded.append({"id": source["id"]})
+        return result
+
+    async def get_extraction_templates(self, domains):
+        await self._call("get_extraction_templates")
+        return Result([dict(self.templates[d]) for d in set(domains) if d in self.templates])
+
+    async def bulk_upsert_extraction_templates(self, rows, batch_size=100):
+        await self._call("bulk_upsert_extraction_templates")
+        result = BulkResult()
+        result.requests = 1
+        for row in rows:
+            self.templates[row["domain"]] = dict(self.templates.get(row["domain"], {}), **row)
+            result.succeeded.append(row)
+        return result
+
+    def write_buffer(self, write, batch_size=100, max_delay=10.0, on_flush=None):
+        return AsyncWriteBuffer(write, batch_size=batch_size, max_delay=max_delay, on_flush=on_flush)
+
+    async def upload_image(self, file_bytes, filename=None, bucket='images', content_type="image/png"):
+        await self._call("upload_image")
+        key = filename or content_key(file_bytes, content_type.split("/")[-1])
+        self.uploads[key] = file_bytes
+        return f"https://storage.invalid/{bucket}/{key}"
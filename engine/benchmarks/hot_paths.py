@@ -0,0 +1,200 @@
+"""
+Micro-benchmarks for the engine's CPU hot paths, over the saved fixture corpus in
+benchmarks/fixtures (Japanese/Korean beauty-media HTML, recorded Gemini outputs
+including malformed JSON).
+
+Reports ops/sec (median of rounds) and peak traced memory per op for each stage,
+and compares against a baseline file to catch regressions (exit 1).
+
+    python -m benchmarks.hot_paths                          # all stages
+    python -m benchmarks.hot_paths --stage rag.query --rounds 10
+    python -m benchmarks.hot_paths --save baseline.json
+    python -m benchmarks.hot_paths --compare baseline.json --threshold 0.15
+"""
+import os
+import sys
+import glob
+import atexit
+import shutil
+import json
+import time
+import argparse
+import platform
+import tempfile
+import statistics
+import tracemalloc
+
+ENGINE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES_DIR = os.path.join(ENGINE_DIR, "benchmarks", "fixtures")
+
+RAG_QUERIES = ["水光注射", "ポテンツァ ダウンタイム", "물광주사", "시카크림 민감성", "エクソソーム 料金", "리쥬란"]
+# Copies of each fixture page in the RAG index, so lookups run against a realistically sized index
+RAG_INDEX_COPIES = 50
+
+
+def load_fixtures(kind):
+    """{file name: text} for benchmarks/fixtures/<kind>."""
+    paths = sorted(glob.glob(os.path.join(FIXTURES_DIR, kind, "*")))
+    return {os.path.basename(path): open(path, encoding="utf-8").read() for path in paths}
+
+
+def stage_parse_content():
+    from crawler.crawler import BeautyCrawler
+
+    crawler = BeautyCrawler()
+    pages = load_fixtures("html")
+    return [lambda html=html, name=name: crawler.parse_content(html, f"https://example.com/{name}") for name, html in pages.items()]
+
+
+def stage_parse_content_streaming():
+    from crawler.crawler import BeautyCrawler
+
+    crawler = BeautyCrawler()
+    pages = load_fixtures("html")
+    return [lambda html=html, name=name: crawler.parse_content_streaming(html, f"https://example.com/{name}") for name, html in pages.items()]
+
+
+def stage_chunk_text():
+    from crawler.crawler import BeautyCrawler
+    from crawler.chunker import chunk_text
+
+    crawler = BeautyCrawler()
+    texts = [crawler.parse_content(html, name)["content"] for name, html in load_fixtures("html").items()]
+    return [lambda text=text: chunk_text(text) for text in texts]
+
+
+def stage_rag_query():
+    from crawler.crawler import BeautyCrawler
+    from retrieval.bm25 import BM25Index
+    from retrieval.vectors import VectorIndex
+    from retrieval.embeddings import HashEmbedder
+    from retrieval.search import Retriever
+    from retrieval.context import format_learning_context
+
+    index_dir = tempfile.mkdtemp(prefix="aura-bench-")
+    atexit.register(shutil.rmtree, index_dir, True)
+    retriever = Retriever(
+        BM25Index(os.path.join(index_dir, "bm25")),
+        VectorIndex(HashEmbedder(), os.path.join(index_dir, "vectors")),
+    )
+    crawler = BeautyCrawler()
+    for name, html in load_fixtures("html").items():
+        page = crawler.parse_content(html, name)
+        for copy in range(RAG_INDEX_COPIES):
+            retriever.add_article(f"https://example.com/{copy}/{name}", page["title"], page["chunks"], "bench")
+    retriever.flush()
+    return [lambda query=query: format_learning_context(retriever.search(query, k=3)) for query in RAG_QUERIES]
+
+
+def stage_parse_generated_article():
+    import logging
+    from generator.parsing import parse_generated_article
+
+    # The recovery paths log warnings on every malformed fixture
+    logging.getLogger("generator.parsing").setLevel(logging.CRITICAL)
+    outputs = load_fixtures("gemini")
+    return [lambda raw=raw: parse_generated_article(raw, "default") for raw in outputs.values()]
+
+
+STAGES = {
+    "crawler.parse_content": stage_parse_content,
+    "crawler.parse_content_streaming": stage_parse_content_streaming,
+    "crawler.chunk_text": stage_chunk_text,
+    "rag.query": stage_rag_query,
+    "generator.parse_generated_article": stage_parse_generated_article,
+}
+
+
+def run_ops(ops, iterations):
+    for _ in range(iterations):
+        for op in ops:
+            op()
+
+
+def measure(ops, rounds=5, min_time=0.2):
+    """ops/sec (median and best over `rounds`) and peak traced bytes of the heaviest op."""
+    run_ops(ops, 1)  # warm-up (lazy imports, regex compilation, page cache)
+    iterations = 1
+    while True:
+        started = time.perf_counter()
+        run_ops(ops, iterations)
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_time:
+            break
+        iterations *= 2
+
+    rates = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        run_ops(ops, iterations)
+        rates.append(iterations * len(ops) / (time.perf_counter() - started))
+
+    peak = 0
+    tracemalloc.start()
+    try:
+        for op in ops:
+            tracemalloc.reset_peak()
+            op()
+            peak = max(peak, tracemalloc.get_traced_memory()[1])
+    finally:
+        tracemalloc.stop()
+    return {
+        "ops_per_sec": round(statistics.median(rates), 2),
+        "best_ops_per_sec": round(max(rates), 2),
+        "peak_bytes": peak,
+        "ops": len(ops),
+        "iterations": iterations,
+    }
+
+
+def compare(results, baseline, threshold):
+    """Regression messages: slower or bigger than the baseline by more than `threshold`."""
+    problems = []
+    for stage, result in results.items():
+        base = baseline.get("stages", {}).get(stage)
+        if not base:
+            continue
+        speed = result["ops_per_sec"] / base["ops_per_sec"] - 1
+        memory = result["peak_bytes"] / max(base["peak_bytes"], 1) - 1
+        print(f"  {stage:38s} speed {speed:+7.1%}   peak memory {memory:+7.1%}")
+        if speed < -threshold:
+            problems.append(f"{stage}: {-speed:.0%} slower than baseline")
+        if memory > threshold:
+            problems.append(f"{stage}: peak memory {memory:.0%} above baseline")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Hot-path benchmarks for the AURA engine")
+    parser.add_argument("--stage", action="append", choices=list(STAGES), help="Stage to run (repeatable; default: all)")
+    parser.add_argument("--rounds", type=int, default=5, help="Timed rounds per stage; the median counts")
+    parser.add_argument("--min-time", type=float, default=0.2, help="Minimum seconds per round")
+    parser.add_argument("--save", help="Write results to this JSON file (e.g. a new baseline)")
+    parser.add_argument("--compare", help="Baseline JSON file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.15, help="Allowed slowdown / memory growth vs the baseline")
+    args = parser.parse_args()
+
+    results = {}
+    print(f"{'stage':38s} {'ops/sec':>12s} {'best':>12s} {'peak KiB/op':>12s}")
+    for name in args.stage or list(STAGES):
+        result = measure(STAGES[name](), rounds=args.rounds, min_time=args.min_time)
+        results[name] = result
+        print(f"{name:38s} {result['ops_per_sec']:12.1f} {result['best_ops_per_sec']:12.1f} {result['peak_bytes'] / 1024:12.1f}")
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({"python": platform.python_version(), "machine": platform.machine(), "stages": results}, f, indent=2)
+        print(f"\nSaved results to {args.save}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print(f"\nCompared with {args.compare} (threshold {args.threshold:.0%}):")
+        problems = compare(results, baseline, args.threshold)
+        for problem in problems:
+            print(f"  FAIL: {problem}")
+        sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Import-time benchmark for the engine entry points.
+
+Runs `python -X importtime -c "import <module>"` in a fresh interpreter, reports
+the cumulative import time and the slowest dependencies, and fails (exit 1) when
+the budget is exceeded or a module that must stay lazy gets imported.
+
+    python -m benchmarks.import_time                 # api + main with default budgets
+    python -m benchmarks.import_time api --budget-ms 800 --repeat 5
+"""
+import os
+import sys
+import argparse
+import subprocess
+
+ENGINE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Heavy SDKs that must only load when a feature actually needs them.
+LAZY_MODULES = [
+    "google.generativeai",
+    "playwright",
+    "bs4",
+    "supabase",
+    "linebot",
+]
+
+DEFAULT_BUDGETS_MS = {
+    "api": 800,
+    "main": 300,
+}
+
+
+def measure(module):
+    """Returns ({module_name: cumulative_us}, total_us) for one cold import."""
+    env = dict(os.environ)
+    env.pop("PYTHONPROFILEIMPORTTIME", None)
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ENGINE_DIR, env=env, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{proc.stderr[-2000:]}")
+
+    cumulative = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        # "import time:       339 |     290259 |   fastapi"
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3:
+            continue
+        cumulative[fields[2].strip()] = int(fields[1])
+    return cumulative, cumulative.get(module, 0)
+
+
+def check(module, budget_ms, repeat=3, top=10):
+    runs = [measure(module) for _ in range(repeat)]
+    cumulative, total_us = min(runs, key=lambda r: r[1])
+    total_ms = total_us / 1000
+
+    print(f"\n== import {module}: {total_ms:.0f} ms (best of {repeat}, budget {budget_ms} ms)")
+    for name, us in sorted(cumulative.items(), key=lambda kv: kv[1], reverse=True)[1:top + 1]:
+        print(f"  {us / 1000:8.1f} ms  {name}")
+
+    problems = []
+    eager = [m for m in LAZY_MODULES if m in cumulative]
+    if eager:
+        problems.append(f"heavy modules imported eagerly: {', '.join(eager)}")
+    if total_ms > budget_ms:
+        problems.append(f"{total_ms:.0f} ms exceeds budget of {budget_ms} ms")
+    for problem in problems:
+        print(f"  FAIL: {problem}")
+    return not problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import-time budget check for the AURA engine")
+    parser.add_argument("modules", nargs="*", help="Modules to import (default: api main)")
+    parser.add_argument("--budget-ms", type=float, help="Budget override applied to every module")
+    parser.add_argument("--repeat", type=int, default=3, help="Cold imports per module; the fastest counts")
+    args = parser.parse_args()
+
+    modules = args.modules or list(DEFAULT_BUDGETS_MS)
+    ok = True
+    for module in modules:
+        budget = args.budget_ms or DEFAULT_BUDGETS_MS.get(module, 500)
+        ok = check(module, budget, repeat=args.repeat) and ok
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
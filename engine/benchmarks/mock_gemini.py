@@ -0,0 +1,144 @@
+"""
+Mock Gemini / Imagen REST server for offline benchmarks.
+
+Answers generateContent (SDK REST transport and the grounding call), Imagen
+:predict and batchEmbedContents with canned responses after a configurable
+latency. Point the engine at it with GEMINI_API_BASE=http://127.0.0.1:<port>.
+
+    python -m benchmarks.mock_gemini --port 8790 --llm-latency 2 --image-latency 4
+"""
+import io
+import re
+import json
+import time
+import base64
+import random
+import hashlib
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+ARTICLE_BODY = (
+    "# {keyword}の最新事情\\n\\n## {keyword}とは？\\n\\n{keyword}は今SNSで話題の美容トピックです。"
+    "韓国のクリニックでも人気が高まっています。\\n\\n## 効果とダウンタイム\\n\\n"
+    + "施術の効果には個人差があります。カウンセリングで医師とよく相談しましょう。" * 20
+    + "\\n\\n## 美咲のまとめ\\n\\nまずは気軽にカウンセリングから始めてみてくださいね。"
+)
+
+
+def make_png(width=1408, height=768, seed=0):
+    """Imagen-sized PNG with a gradient and noise, so re-encoding costs what a real image does."""
+    from PIL import Image
+
+    rng = random.Random(seed)
+    image = Image.linear_gradient("L").resize((width, height)).convert("RGB")
+    noise = Image.effect_noise((width, height), 40).convert("RGB")
+    image = Image.blend(image, noise, 0.3)
+    image.putpixel((rng.randrange(width), rng.randrange(height)), (255, 0, 0))
+    out = io.BytesIO()
+    image.save(out, "PNG")
+    return out.getvalue()
+
+
+def prompt_text(body):
+    return "".join(part.get("text", "") for content in body.get("contents", []) for part in content.get("parts", []))
+
+
+def answer_for(prompt):
+    """Canned model output matching what the engine asks for."""
+    if "Art Director" in prompt:
+        return "High-end Japanese beauty photography, glossy water-glow skin, studio lighting, 8k"
+    if '"keywords"' in prompt:
+        return json.dumps({"keywords": ["水光注射", "ポテンツァ", "エクソソーム", "リジュラン", "ハイフ"]}, ensure_ascii=False)
+    match = re.search(r"キーワード: (.+)", prompt)
+    keyword = match.group(1).strip() if match else "美容"
+    return (
+        '```json\n{\n  "title": "【徹底解説】' + keyword + 'の最新事情",\n  "category": "美容医療",\n'
+        '  "content": "' + ARTICLE_BODY.format(keyword=keyword) + '"\n}\n```'
+    )
+
+
+class MockGeminiHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    llm_latency = 0.0
+    image_latency = 0.0
+    png_variants = []
+    counts = {}
+    lock = threading.Lock()
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status, payload):
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _count(self, kind):
+        with self.lock:
+            self.counts[kind] = self.counts.get(kind, 0) + 1
+
+    def do_GET(self):
+        if self.path.startswith("/stats"):
+            return self._reply(200, {"requests": self.counts})
+        self._reply(404, {"error": {"code": 404, "message": "not found"}})
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        path = self.path.split("?")[0]
+        if path.endswith(":generateContent"):
+            self._count("generateContent")
+            time.sleep(self.llm_latency)
+            text = answer_for(prompt_text(body))
+            return self._reply(200, {
+                "candidates": [{"content": {"parts": [{"text": text}], "role": "model"}, "finishReason": 1, "index": 0}],
+                "usageMetadata": {"promptTokenCount": len(prompt_text(body)) // 2, "candidatesTokenCount": len(text) // 2},
+            })
+        if path.endswith(":predict"):
+            self._count("predict")
+            time.sleep(self.image_latency)
+            # Different bytes per prompt, so content-addressed uploads are not all deduplicated
+            prompt = (body.get("instances") or [{}])[0].get("prompt", "")
+            png = self.png_variants[int(hashlib.md5(prompt.encode("utf-8")).hexdigest(), 16) % len(self.png_variants)]
+            return self._reply(200, {"predictions": [{"bytesBase64Encoded": png, "mimeType": "image/png"}]})
+        if path.endswith(":batchEmbedContents"):
+            self._count("batchEmbedContents")
+            time.sleep(self.llm_latency / 10)
+            dim = 768
+            embeddings = []
+            for request in body.get("requests", []):
+                dim = request.get("outputDimensionality", dim)
+                seed = int(hashlib.md5(prompt_text({"contents": [request.get("content", {})]}).encode("utf-8")).hexdigest(), 16)
+                rng = random.Random(seed)
+                embeddings.append({"values": [rng.uniform(-1, 1) for _ in range(dim)]})
+            return self._reply(200, {"embeddings": embeddings})
+        self._reply(404, {"error": {"code": 404, "message": f"unknown method {path}"}})
+
+
+def make_server(port=0, llm_latency=0.0, image_latency=0.0, image_variants=4):
+    """ThreadingHTTPServer on 127.0.0.1:`port` (0 = any free port)."""
+    handler = type("Handler", (MockGeminiHandler,), {
+        "llm_latency": llm_latency,
+        "image_latency": image_latency,
+        "png_variants": [base64.b64encode(make_png(seed=i)).decode("ascii") for i in range(image_variants)],
+        "counts": {},
+    })
+    return ThreadingHTTPServer(("127.0.0.1", port), handler)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock Gemini/Imagen REST server")
+    parser.add_argument("--port", type=int, default=8790)
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="Seconds per generateContent call")
+    parser.add_argument("--image-latency", type=float, default=0.0, help="Seconds per Imagen predict call")
+    args = parser.parse_args()
+    server = make_server(args.port, args.llm_latency, args.image_latency)
+    print(f"Mock Gemini listening on http://127.0.0.1:{server.server_address[1]}", flush=True)
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
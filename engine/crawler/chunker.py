@@ -0,0 +1,113 @@
+import re
+
+MAX_CHUNK_CHARS = 800
+MIN_CHUNK_CHARS = 200
+
+_SENTENCE_END_RE = re.compile(r"(?<=[。．！？!?.])\s*|\n")
+_MARKDOWN_HEADING_RE = re.compile(r"^(#{1,6})\s+(.+)$")
+
+
+def make_block(text, start, heading_level=0):
+    """A run of extracted text at [start, start + len(text)); heading_level 1-6 for h1-h6."""
+    return {"text": text, "start": start, "end": start + len(text), "heading_level": heading_level}
+
+
+def blocks_from_text(text):
+    """Paragraph blocks (split on blank lines) of plain text; `# ...` lines count as headings."""
+    blocks = []
+    for match in re.finditer(r"[^\n]+(?:\n(?!\s*\n)[^\n]+)*", text or ""):
+        para = match.group(0)
+        stripped = para.strip()
+        if not stripped:
+            continue
+        start = match.start() + (len(para) - len(para.lstrip()))
+        heading = _MARKDOWN_HEADING_RE.match(stripped)
+        blocks.append(make_block(stripped, start, len(heading.group(1)) if heading else 0))
+    return blocks
+
+
+def _split_long(block, max_chars):
+    """Splits an oversized block at sentence ends (hard cut as a last resort)."""
+    pieces = []
+    text, base = block["text"], block["start"]
+    piece_start = 0
+    last_break = 0
+    for match in _SENTENCE_END_RE.finditer(text):
+        cut = match.end()
+        if cut - piece_start > max_chars and last_break > piece_start:
+            pieces.append((piece_start, last_break))
+            piece_start = last_break
+        last_break = cut
+    pieces.append((piece_start, len(text)))
+
+    blocks = []
+    for start, end in pieces:
+        while end - start > max_chars:
+            blocks.append(make_block(text[start:start + max_chars], base + start))
+            start += max_chars
+        piece = text[start:end].strip()
+        if piece:
+            blocks.append(make_block(piece, base + start + (len(text[start:end]) - len(text[start:end].lstrip()))))
+    return blocks
+
+
+def chunk_blocks(text, blocks, max_chars=MAX_CHUNK_CHARS, min_chars=MIN_CHUNK_CHARS):
+    """
+    Groups extracted blocks into passages of at most ~max_chars.
+
+    A heading starts a new chunk (unless the current one is still shorter than
+    min_chars) and is kept as the chunk's first line. Each chunk records the
+    heading path it sits under and its [start_offset, end_offset) in `text`.
+    """
+    chunks = []
+    headings = []  # [(level, text)] of the enclosing sections
+    current = []
+
+    def flush():
+        if not current:
+            return
+        start, end = current[0]["start"], current[-1]["end"]
+        chunks.append({
+            "chunk_index": len(chunks),
+            "heading": " > ".join(h for _, h in headings_at_start) or None,
+            "content": text[start:end],
+            "start_offset": start,
+            "end_offset": end,
+        })
+        current.clear()
+
+    headings_at_start = []
+    for block in blocks:
+        level = block["heading_level"]
+        if level:
+            if current and current[-1]["end"] - current[0]["start"] >= min_chars:
+                flush()
+            while headings and headings[-1][0] >= level:
+                headings.pop()
+            headings.append((level, block["text"].lstrip("#").strip()))
+            if not current:
+                headings_at_start = list(headings)
+            current.append(block)
+            continue
+
+        pieces = _split_long(block, max_chars) if len(block["text"]) > max_chars else [block]
+        for piece in pieces:
+            if current and piece["end"] - current[0]["start"] > max_chars:
+                # Headings at the tail belong with the text that follows them
+                carry = []
+                while current and current[-1]["heading_level"]:
+                    carry.insert(0, current.pop())
+                flush()
+                current.extend(carry)
+                if carry:
+                    headings_at_start = list(headings)
+            if not current:
+                headings_at_start = list(headings)
+            current.append(piece)
+    flush()
+    return chunks
+
+
+def chunk_text(text, max_chars=MAX_CHUNK_CHARS, min_chars=MIN_CHUNK_CHARS):
+    """Chunks plain text (e.g. stored crawled_articles.content) by paragraphs."""
+    return chunk_blocks(text or "", blocks_from_text(text), max_chars=max_chars, min_chars=min_chars)
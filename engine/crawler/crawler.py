@@ -1,41 +1,216 @@
 import os
+import re
 import asyncio
-from playwright.async_api import async_playwright
-from bs4 import BeautifulSoup
 import logging
+import tracemalloc
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from crawler.chunker import chunk_blocks, make_block
+from crawler.streaming import StreamingExtractor
+from crawler.extraction import extract_main_content
+from crawler.templates import ExtractionTemplates
+from utils.tracing import current_span
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+HEADING_TAGS = ['h1', 'h2', 'h3', 'h4', 'h5', 'h6']
+
+# Hard cap on the HTML pulled out of the browser per page (UTF-8 bytes)
+MAX_HTML_BYTES = int(os.getenv("AURA_CRAWL_MAX_HTML_BYTES", 2 * 1024 * 1024))
+# The HTML crosses from the browser in slices of this many characters
+HTML_SLICE_CHARS = 64 * 1024
+# Streaming mode stops parsing once this much main text is collected
+MAX_TEXT_CHARS = int(os.getenv("AURA_CRAWL_MAX_TEXT_CHARS", 20000))
+# Stored `content` length (chunks cover all extracted text)
+CONTENT_CHARS = 10000
+# Per-page parse allocation peaks via tracemalloc (slows parsing down; for diagnosis)
+TRACE_MEMORY = os.getenv("AURA_CRAWL_TRACE_MEMORY", "0") == "1"
+# "density" (text/link-density scoring, crawler/extraction.py) or "legacy" (article > main > classes > body)
+EXTRACTOR = os.getenv("AURA_CRAWL_EXTRACTOR", "density")
+# Timeout of the plain HTTP fetch used for pages whose template says needs_js = false
+STATIC_TIMEOUT = 15
+# The static HTML must hold this share of the rendered main text for needs_js = false
+STATIC_TEXT_RATIO = float(os.getenv("AURA_TEMPLATE_STATIC_RATIO", 0.8))
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+META_CHARSET = re.compile(rb"""<meta[^>]+charset=["']?([\w-]+)""", re.IGNORECASE)
+
+
+def decode_html(body, response):
+    """HTML bytes of a requests `response` as text: header charset, else <meta charset>, else UTF-8."""
+    charset = META_CHARSET.search(body[:4096])
+    if "charset" in response.headers.get("Content-Type", ""):
+        encoding = response.encoding
+    else:
+        encoding = charset.group(1).decode() if charset else "utf-8"
+    try:
+        return bytes(body).decode(encoding, errors="ignore")
+    except LookupError:
+        return bytes(body).decode("utf-8", errors="ignore")
+
+
+def _rss_peak_kib():
+    """Process peak RSS so far (KiB on Linux), or None where unavailable."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss if resource else None
+
+
+@contextmanager
+def _traced_peak(memory):
+    """Records the block's allocation peak in memory["parse_peak_bytes"] (max over calls) when tracing."""
+    if not (TRACE_MEMORY and tracemalloc.is_tracing()):
+        yield
+        return
+    start = tracemalloc.get_traced_memory()[0]
+    tracemalloc.reset_peak()
+    try:
+        yield
+    finally:
+        peak = tracemalloc.get_traced_memory()[1] - start
+        memory["parse_peak_bytes"] = max(memory.get("parse_peak_bytes") or 0, peak)
+
+
 class BeautyCrawler:
-    def __init__(self):
+    """
+    Playwright crawler. Page HTML is read out of the browser in slices and capped
+    at `max_html_bytes`. With `streaming` (AURA_CRAWL_STREAMING=1) the slices are
+    parsed as they arrive without building a DOM, reading stops once enough main
+    text is collected, and the browser skips images, media and fonts.
+    Every result carries a `memory` dict; `stats()` sums them per crawler.
+
+    Main content is found by text/link density (`extractor`). Each crawl updates
+    the page's domain template in `templates` (crawler/templates.py); a domain with
+    a template is extracted by its selectors directly, and one whose content is in
+    the static HTML (needs_js false) is fetched without the browser. Without a
+    template a source's own `content_selector` is passed in as `selector` and tried
+    first; the selector that produced (or was learned from) the result comes back
+    as `content_selector`.
+    """
+
+    def __init__(self, streaming=None, max_html_bytes=MAX_HTML_BYTES, max_text_chars=MAX_TEXT_CHARS, extractor=EXTRACTOR, templates=None):
         self.playwright = None
         self.browser = None
         self.context = None
+        self._browser_lock = asyncio.Lock()
+        self.templates = templates or ExtractionTemplates()
+        self.streaming = os.getenv("AURA_CRAWL_STREAMING", "0") == "1" if streaming is None else streaming
+        self.extractor = extractor
+        self.max_html_bytes = max_html_bytes
+        self.max_text_chars = max_text_chars
+        self._stats = {"pages": 0, "html_bytes": 0, "max_html_bytes": 0, "truncated": 0, "stopped_early": 0, "max_parse_peak_bytes": 0, "static_pages": 0}
+        if TRACE_MEMORY and not tracemalloc.is_tracing():
+            tracemalloc.start()
 
     async def start_browser(self):
         """Starts the Playwright browser."""
+        from playwright.async_api import async_playwright
         self.playwright = await async_playwright().start()
         self.browser = await self.playwright.chromium.launch(headless=True)
         # Random user agent or typical browser context setup could go here
-        self.context = await self.browser.new_context(
-            user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-        )
+        self.context = await self.browser.new_context(user_agent=USER_AGENT)
+        if self.streaming:
+            # Text extraction never needs these, and they are most of a tab's memory
+            await self.context.route("**/*", self._block_heavy_resources)
+
+    @staticmethod
+    async def _block_heavy_resources(route):
+        if route.request.resource_type in ("image", "media", "font"):
+            await route.abort()
+        else:
+            await route.continue_()
 
     async def close_browser(self):
-        """Closes the Playwright browser."""
+        """Closes the Playwright browser (if it was started); the next rendered fetch starts it again."""
         if self.context:
             await self.context.close()
         if self.browser:
             await self.browser.close()
         if self.playwright:
             await self.playwright.stop()
+        self.playwright = self.browser = self.context = None
 
-    async def fetch_page_content(self, url):
-        """Fetches page content and extracts relevant text and metadata."""
-        if not self.browser:
-            await self.start_browser()
+    async def fetch_page_content(self, url, selector=None):
+        """
+        Fetches page content and extracts relevant text and metadata: with the
+        domain's template when there is one (statically when it allows), in the
+        browser otherwise or when the template no longer matches the static HTML.
+        """
+        template = self.templates.get(url)
+        noise = None
+        static_missed = False
+        if template and template["content_selector"]:
+            selector, noise = template["content_selector"], template["noise_selectors"]
+            if template["needs_js"] is False:
+                data = await self.fetch_static(url, selector, noise)
+                if data and data["extraction"] == "selector":
+                    self._record(url, data)
+                    self.templates.observe(url, data)
+                    return data
+                static_missed = True
+                logger.info(f"Template for {url} does not match the static HTML; rendering the page")
+
+        data = await self.fetch_rendered(url, selector, noise)
+        if data is None:
+            return None
+        known = template is not None and template["content_selector"] == data["content_selector"]
+        needs_js = None
+        if known and static_missed:
+            needs_js = True
+        elif data["content_selector"] and not (known and template["needs_js"] is not None):
+            needs_js = await self.needs_js(url, data)
+        self.templates.observe(url, data, needs_js)
+        return data
+
+    async def fetch_static(self, url, selector=None, noise=None):
+        """Plain HTTP fetch of `url` parsed like a rendered page (no JavaScript), or None on failure."""
+        try:
+            memory = {"static": True}
+            html = await asyncio.to_thread(self._get_static_html, url, memory)
+            data = self.parse_content(html, url, selector, noise)
+            data["memory"] = dict(memory, **data["memory"])
+            return data
+        except Exception as e:
+            logger.warning(f"Static fetch of {url} failed: {e}")
+            return None
+
+    def _get_static_html(self, url, memory):
+        import requests
+
+        with requests.get(url, headers={"User-Agent": USER_AGENT}, timeout=STATIC_TIMEOUT, stream=True) as response:
+            response.raise_for_status()
+            content_type = response.headers.get("Content-Type", "text/html")
+            if "html" not in content_type:
+                raise ValueError(f"not HTML ({content_type})")
+            body = bytearray()
+            for piece in response.iter_content(HTML_SLICE_CHARS):
+                body += piece
+                if len(body) > self.max_html_bytes:
+                    break
+        memory.update(html_bytes=min(len(body), self.max_html_bytes), html_truncated=len(body) > self.max_html_bytes)
+        if memory["html_truncated"]:
+            logger.warning(f"HTML capped at {self.max_html_bytes} bytes: {url}")
+        return decode_html(body[:self.max_html_bytes], response)
+
+    async def needs_js(self, url, data):
+        """
+        Whether the rendered result `data` depends on JavaScript: its selector misses,
+        or finds under STATIC_TEXT_RATIO of the text, in the static HTML.
+        """
+        static = await self.fetch_static(url, data["content_selector"], data["noise_selectors"])
+        if static is None or static["extraction"] != "selector":
+            return True
+        return static["memory"]["text_chars"] < STATIC_TEXT_RATIO * data["memory"]["text_chars"]
+
+    async def fetch_rendered(self, url, selector=None, noise=None):
+        """Loads `url` in the browser and extracts it from the rendered HTML, or None on failure."""
+        async with self._browser_lock:
+            if not self.browser:
+                await self.start_browser()
 
         page = await self.context.new_page()
         try:
@@ -45,16 +220,89 @@ class BeautyCrawler:
             # Simple wait for hydration if needed, but domcontentloaded is often enough for static extraction
             # await page.wait_for_timeout(2000) 
 
-            html = await page.content()
-            return self.parse_content(html, url)
+            rss_before = _rss_peak_kib()
+            memory = {}
+            if self.streaming:
+                data = await self.parse_stream(self.iter_html(page, memory), url, memory, selector)
+            else:
+                html = "".join([piece async for piece in self.iter_html(page, memory)])
+                data = self.parse_content(html, url, selector, noise)
+                data["memory"] = dict(memory, **data["memory"])
+            if rss_before is not None:
+                data["memory"]["rss_peak_growth_kib"] = _rss_peak_kib() - rss_before
+            self._record(url, data)
+            return data
         except Exception as e:
             logger.error(f"Error fetching {url}: {e}")
             return None
         finally:
             await page.close()
 
-    def parse_content(self, html, url):
-        """Parses HTML and extracts clean content using BeautifulSoup."""
+    async def iter_html(self, page, memory):
+        """
+        The rendered HTML of `page` in slices, up to `max_html_bytes`. The
+        serialised document stays in the browser until a slice is asked for, so
+        stopping early never copies the rest. Sets page_chars (whole document),
+        html_bytes (read) and html_truncated in `memory`.
+        """
+        length = await page.evaluate("() => (window.__auraHtml = document.documentElement.outerHTML).length")
+        memory.update(page_chars=length, html_bytes=0, html_truncated=False)
+        try:
+            for start in range(0, length, HTML_SLICE_CHARS):
+                piece = await page.evaluate("([start, end]) => window.__auraHtml.slice(start, end)", [start, start + HTML_SLICE_CHARS])
+                data = piece.encode("utf-8")
+                if memory["html_bytes"] + len(data) > self.max_html_bytes:
+                    data = data[:self.max_html_bytes - memory["html_bytes"]]
+                    piece = data.decode("utf-8", errors="ignore")
+                    memory["html_truncated"] = True
+                memory["html_bytes"] += len(data)
+                yield piece
+                if memory["html_truncated"]:
+                    logger.warning(f"HTML capped at {self.max_html_bytes} bytes ({length} chars in the page)")
+                    return
+        finally:
+            await page.evaluate("() => { delete window.__auraHtml; }")
+
+    async def parse_stream(self, pieces, url, memory, selector=None):
+        """Streaming counterpart of parse_content over an async iterator of HTML pieces."""
+        memory.update(stopped_early=False, parse_peak_bytes=None)
+        extractor = StreamingExtractor(max_chars=self.max_text_chars, selector=selector)
+        read = 0
+        async for piece in pieces:
+            with _traced_peak(memory):
+                extractor.feed(piece)
+            read += len(piece)
+            if extractor.done:
+                # Main text complete: the rest of the document is never read
+                memory["stopped_early"] = read < memory["page_chars"]
+                break
+        await pieces.aclose()
+        with _traced_peak(memory):
+            extractor.close()
+        return self._build_result(extractor.result(), url, memory)
+
+    def parse_content_streaming(self, html, url, selector=None):
+        """parse_stream over an HTML string already in memory (offline re-parsing, benchmarks)."""
+        async def pieces():
+            for start in range(0, len(html), HTML_SLICE_CHARS):
+                yield html[start:start + HTML_SLICE_CHARS]
+
+        memory = {"page_chars": len(html), "html_bytes": len(html.encode("utf-8")), "html_truncated": False}
+        return asyncio.run(self.parse_stream(pieces(), url, memory, selector))
+
+    def parse_content(self, html, url, selector=None, noise=None):
+        """Parses HTML and extracts the main content (density scoring, or the legacy BeautifulSoup rules)."""
+        memory = {"parse_peak_bytes": None}
+        with _traced_peak(memory):
+            if self.extractor == "legacy":
+                extracted = self.extract_soup(html)
+            else:
+                extracted = extract_main_content(html, selector, noise)
+        return self._build_result(extracted, url, memory)
+
+    def extract_soup(self, html):
+        """Metadata and main-content blocks of `html`, from a full BeautifulSoup tree."""
+        from bs4 import BeautifulSoup
         soup = BeautifulSoup(html, 'html.parser')
 
         # 1. Metadata Extraction
@@ -85,24 +333,89 @@ class BeautyCrawler:
         if not content_node:
             content_node = soup.body
 
-        # Extract text
-        if content_node:
-            text = content_node.get_text(separator='\n\n', strip=True)
-        else:
-            text = ""
+        # Extract text (as heading/paragraph blocks so it can be chunked by section)
+        blocks = self.extract_blocks(content_node) if content_node else []
+        return {"title": title, "site_name": site_name, "thumbnail_url": thumbnail, "blocks": blocks, "selector": None, "noise": [], "method": "legacy"}
+
+    def _build_result(self, extracted, url, memory):
+        blocks = extracted["blocks"]
+        text = "\n\n".join(block["text"] for block in blocks)
 
-        # 4. Truncate if too long (simple safety for context limits)
-        if len(text) > 10000:
-            text = text[:10000] + "..."
+        # 4. Chunk the full text for retrieval; offsets point into the untruncated text
+        chunks = chunk_blocks(text, blocks)
+        memory["text_chars"] = len(text)
+
+        # 5. Truncate if too long (simple safety for context limits)
+        if len(text) > CONTENT_CHARS:
+            text = text[:CONTENT_CHARS] + "..."
 
         return {
-            "title": title,
-            "site_name": site_name,
-            "thumbnail_url": thumbnail,
+            "title": extracted["title"],
+            "site_name": extracted["site_name"],
+            "thumbnail_url": extracted["thumbnail_url"],
             "source_url": url,
-            "content": text
+            "content": text,
+            "chunks": chunks,
+            "content_selector": extracted["selector"],
+            "noise_selectors": extracted["noise"],
+            "extraction": extracted["method"],
+            "memory": memory,
         }
 
+    def _record(self, url, data):
+        """Adds one page to stats(), logs it and tags the current span."""
+        memory = data["memory"]
+        stats = self._stats
+        stats["pages"] += 1
+        stats["html_bytes"] += memory["html_bytes"]
+        stats["max_html_bytes"] = max(stats["max_html_bytes"], memory["html_bytes"])
+        stats["truncated"] += memory["html_truncated"]
+        stats["stopped_early"] += memory.get("stopped_early", False)
+        stats["static_pages"] += memory.get("static", False)
+        peak = memory.get("parse_peak_bytes")
+        stats["max_parse_peak_bytes"] = max(stats["max_parse_peak_bytes"], peak or 0)
+        logger.info(
+            f"Page {url}: {data['extraction']} extraction ({data['content_selector'] or 'no selector'}), "
+            f"{memory['html_bytes'] / 1024:.0f} KiB {'static ' if memory.get('static') else ''}HTML"
+            + (" (capped)" if memory["html_truncated"] else "")
+            + (", stopped early" if memory.get("stopped_early") else "")
+            + f", {memory['text_chars']} chars"
+            + (f", parse peak {peak / 1024:.0f} KiB" if peak is not None else "")
+            + (f", RSS peak +{memory['rss_peak_growth_kib']} KiB" if memory.get("rss_peak_growth_kib") else "")
+        )
+        span = current_span()
+        span.set_attribute("aura.extraction", data["extraction"])
+        for key, value in memory.items():
+            span.set_attribute(f"aura.{key}", value)
+
+    def stats(self):
+        """Totals of the per-page memory accounting since this crawler was created, plus template counts."""
+        return dict(self._stats, templates=self.templates.stats())
+
+    def extract_blocks(self, node):
+        """
+        Text blocks of `node` in document order, as joined by '\n\n' in `content`.
+        Strings inside one h1-h6 element are merged into a single heading block.
+        """
+        blocks = []
+        offset = 0
+        last_heading = None
+        for string in node.strings:
+            piece = string.strip()
+            if not piece:
+                continue
+            heading = string.find_parent(HEADING_TAGS)
+            if heading is not None and heading is last_heading:
+                block = blocks[-1]
+                block["text"] = f"{block['text']} {piece}"
+                block["end"] = block["start"] + len(block["text"])
+                offset = block["end"] + 2
+                continue
+            last_heading = heading
+            blocks.append(make_block(piece, offset, int(heading.name[1]) if heading is not None else 0))
+            offset = blocks[-1]["end"] + 2
+        return blocks
+
     def get_meta_property(self, soup, property_name):
         tag = soup.find('meta', property=property_name)
         if tag and tag.get('content'):
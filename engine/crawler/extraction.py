@@ -0,0 +1,338 @@
+"""
+Main-content extraction by text and link density (Readability / jusText style).
+
+Text-bearing blocks are scored by length, punctuation and link density, the scores
+flow up to their containers, and the best container (plus sibling blocks that
+score nearly as well) is the main content. Link-heavy lists and negatively named
+elements (related, ranking, share, comment ...) inside it are dropped.
+
+The winning elements' selector list (`div#kiji-body`, `div.news-head, div.news-body`)
+and the selectors of the noise blocks removed inside them are returned so they can
+be stored (crawler/templates.py) and used directly on the next crawl of the site.
+"""
+import re
+
+from crawler.chunker import make_block
+
+JUNK_TAGS = {'script', 'style', 'noscript', 'iframe', 'form', 'button', 'select', 'svg', 'nav', 'header', 'footer', 'aside', 'template'}
+HEADING_TAGS = {'h1', 'h2', 'h3', 'h4', 'h5', 'h6'}
+INLINE_TAGS = {'a', 'abbr', 'b', 'br', 'code', 'em', 'font', 'i', 'img', 'mark', 'small', 'span', 'strong', 'sub', 'sup', 'time', 'u', 'ruby', 'rt', 'rp', 'wbr'}
+CONTAINER_TAGS = {'div', 'section', 'article', 'main', 'td', 'blockquote', 'pre'}
+LIST_TAGS = {'ul', 'ol', 'dl', 'table', 'div', 'section'}
+
+POSITIVE_TOKENS = {'article', 'body', 'content', 'entry', 'main', 'post', 'text', 'story', 'column', 'kiji', 'honbun', 'detail', 'news', 'blog'}
+NEGATIVE_TOKENS = {
+    'ad', 'ads', 'advert', 'advertisement', 'banner', 'breadcrumb', 'comment', 'cta', 'footer', 'foot', 'header', 'menu',
+    'nav', 'pickup', 'popular', 'popup', 'pr', 'profile', 'ranking', 'rank', 'recommend', 'related', 'share', 'side',
+    'sidebar', 'sns', 'social', 'sponsor', 'tag', 'widget', 'login', 'pager', 'pagination',
+}
+UNLIKELY_KEEP = {'html', 'body', 'article', 'main'}
+
+PUNCTUATION = re.compile(r"[、。，,.．!！?？]")
+TOKEN_SPLIT = re.compile(r"[-_\s]+|(?<=[a-z])(?=[A-Z])")
+GENERATED_NAME = re.compile(r"\d{3,}|^[a-z]{1,2}\d|[0-9a-f]{8}")
+SELECTOR = re.compile(r"^([a-z][a-z0-9]*)(?:#([\w-]+)|((?:\.[\w-]+)+))?$")
+
+MIN_PARAGRAPH_CHARS = 25
+MIN_SELECTED_CHARS = 200
+MAX_LINK_DENSITY = 0.5
+
+
+def name_tokens(el):
+    """Lower-cased words of an element's class and id (camelCase and -/_ split)."""
+    words = f"{el.get('class') or ''} {el.get('id') or ''}"
+    return {token.lower() for token in TOKEN_SPLIT.split(words) if token}
+
+
+def class_weight(el):
+    tokens = name_tokens(el)
+    weight = 0
+    if tokens & POSITIVE_TOKENS:
+        weight += 25
+    if tokens & NEGATIVE_TOKENS:
+        weight -= 25
+    return weight
+
+
+def text_length(el):
+    return len("".join(el.itertext()).strip())
+
+
+def link_density(el, length=None):
+    length = text_length(el) if length is None else length
+    if not length:
+        return 0.0
+    return sum(text_length(a) for a in el.iter('a')) / length
+
+
+def own_text(el):
+    """Text of `el` outside its block-level children (what a browser shows as its own paragraph)."""
+    parts = [el.text or ""]
+    links = 0
+    for child in el:
+        if isinstance(child.tag, str) and child.tag in INLINE_TAGS:
+            text = "".join(child.itertext())
+            parts.append(text)
+            if child.tag == 'a':
+                links += len(text.strip())
+        parts.append(child.tail or "")
+    return "".join(parts).strip(), links
+
+
+def is_generated(name):
+    return bool(GENERATED_NAME.search(name))
+
+
+def selector_for(el):
+    """Stable simple selector for `el` (tag#id or tag.class...), or None if its names look generated."""
+    tag = el.tag
+    node_id = el.get('id')
+    if node_id and not is_generated(node_id):
+        return f"{tag}#{node_id}"
+    classes = [c for c in (el.get('class') or '').split() if not is_generated(c)]
+    if classes:
+        return f"{tag}." + ".".join(classes)
+    if tag in ('article', 'main'):
+        return tag
+    return None
+
+
+def matching(root, selector):
+    """Elements in `root` (itself included) matching one simple selector."""
+    match = SELECTOR.match(selector.strip())
+    if not match:
+        return []
+    tag, node_id, classes = match.groups()
+    wanted = set((classes or "").split(".")[1:])
+    return [
+        el for el in root.iter(tag)
+        if (not node_id or el.get('id') == node_id) and wanted <= set((el.get('class') or '').split())
+    ]
+
+
+def select_one(root, selector):
+    """The element matching one simple selector with the most text, or None."""
+    return max(matching(root, selector), key=text_length, default=None)
+
+
+def select(root, selector):
+    """Elements for a comma-separated list of simple selectors, in document order ([] if any is missing)."""
+    nodes = [select_one(root, part) for part in (selector or "").split(",")]
+    if not nodes or any(node is None for node in nodes):
+        return []
+    if len(nodes) > 1:
+        order = {el: i for i, el in enumerate(root.iter())}
+        nodes = sorted(set(nodes), key=order.get)
+    return nodes
+
+
+def learn_selector(root, nodes):
+    """Selector list that finds exactly `nodes` again, or None."""
+    parts = [selector_for(node) for node in nodes]
+    if not parts or None in parts:
+        return None
+    selector = ", ".join(parts)
+    return selector if select(root, selector) == nodes else None
+
+
+def remove(el):
+    """Drops `el` but keeps its tail text."""
+    parent = el.getparent()
+    if parent is None:
+        return
+    if el.tail:
+        previous = el.getprevious()
+        if previous is not None:
+            previous.tail = (previous.tail or "") + el.tail
+        else:
+            parent.text = (parent.text or "") + el.tail
+    parent.remove(el)
+
+
+def strip_junk(root):
+    """Removes non-content tags and elements named like boilerplate (unless also named like content)."""
+    for el in list(root.iter()):
+        if el is root:
+            continue
+        if not isinstance(el.tag, str):
+            remove(el)
+            continue
+        if el.tag in JUNK_TAGS:
+            remove(el)
+            continue
+        tokens = name_tokens(el)
+        if el.tag not in UNLIKELY_KEEP and tokens & NEGATIVE_TOKENS and not tokens & POSITIVE_TOKENS:
+            remove(el)
+
+
+def score_containers(root):
+    """{container element: score} from the paragraphs beneath them."""
+    scores = {}
+
+    def add(el, points):
+        if el is None or not isinstance(el.tag, str) or el.tag in ('html', 'head'):
+            return
+        if el not in scores:
+            scores[el] = class_weight(el) + (5 if el.tag in CONTAINER_TAGS else -3 if el.tag in ('ul', 'ol', 'form') else 0)
+        scores[el] += points
+
+    for el in root.iter():
+        if not isinstance(el.tag, str) or el.tag in INLINE_TAGS or el.tag in HEADING_TAGS:
+            continue
+        text, links = own_text(el)
+        if len(text) < MIN_PARAGRAPH_CHARS:
+            continue
+        points = (1 + len(PUNCTUATION.findall(text)) + min(len(text) / 100, 3)) * (1 - links / len(text))
+        # A block holding text directly (<div>text<br>text</div>) is its own candidate too
+        if el.tag in CONTAINER_TAGS:
+            add(el, points)
+        parent = el.getparent()
+        add(parent, points)
+        if parent is not None:
+            add(parent.getparent(), points / 2)
+            if parent.getparent() is not None:
+                add(parent.getparent().getparent(), points / 3)
+
+    return {el: score * (1 - link_density(el)) for el, score in scores.items()}
+
+
+def pick_content(root):
+    """Elements forming the main content: the best-scoring container and its qualifying siblings."""
+    scores = score_containers(root)
+    if not scores:
+        body = root.find('body')
+        return [body] if body is not None else []
+    top = max(scores, key=scores.get)
+    parent = top.getparent()
+    # Climb out of single-child wrappers so the headline block next to the wrapper is a sibling
+    while parent is not None and parent.tag not in ('body', 'html') and [c for c in parent if isinstance(c.tag, str) and text_length(c)] == [top]:
+        top, parent = parent, parent.getparent()
+    if parent is None:
+        return [top]
+
+    # Siblings that score nearly as well belong to the same content (split body,
+    # long paragraphs next to it, the title block just before it)
+    threshold = max(10, scores[top] * 0.2)
+    nodes = []
+    before_top = True
+    for sibling in parent:
+        if sibling is top:
+            before_top = False
+            nodes.append(sibling)
+            continue
+        if not isinstance(sibling.tag, str):
+            continue
+        length = text_length(sibling)
+        if scores.get(sibling, 0) >= threshold:
+            nodes.append(sibling)
+        elif sibling.tag == 'p' and length > 80 and link_density(sibling, length) < 0.25:
+            nodes.append(sibling)
+        elif before_top and length < 300 and link_density(sibling, length) < 0.25 and (
+                sibling.tag in HEADING_TAGS or sibling.find('.//h1') is not None or sibling.find('.//h2') is not None):
+            nodes.append(sibling)
+    return nodes
+
+
+def clean(node):
+    """Removes link-heavy lists and low-text boilerplate inside the chosen content; returns the link-heavy ones."""
+    removed = []
+    for el in list(node.iter(*LIST_TAGS)):
+        if el is node or el.getparent() is None:
+            continue
+        length = text_length(el)
+        if not length:
+            if not el.findall('.//img'):
+                remove(el)
+            continue
+        if link_density(el, length) > MAX_LINK_DENSITY:
+            removed.append(el)
+            remove(el)
+    return removed
+
+
+def learn_noise(nodes, removed):
+    """Selectors of the removed blocks that match nothing left in the content (sorted), for drop_noise."""
+    selectors = {selector_for(el) for el in removed} - {None}
+    return sorted(s for s in selectors if not any(matching(node, s) for node in nodes))
+
+
+def drop_noise(node, noise):
+    """Removes the elements inside `node` matching any of the `noise` selectors."""
+    for selector in noise:
+        for el in matching(node, selector):
+            if el is not node:
+                remove(el)
+
+
+def iter_strings(el, heading=None):
+    """(text, enclosing heading element) pairs of `el` in document order."""
+    heading = el if el.tag in HEADING_TAGS else heading
+    if el.text:
+        yield el.text, heading
+    for child in el:
+        if isinstance(child.tag, str):
+            yield from iter_strings(child, heading)
+        if child.tail:
+            yield child.tail, heading
+
+
+def extract_blocks(nodes):
+    """Same block layout as BeautyCrawler.extract_blocks, over lxml elements."""
+    blocks = []
+    offset = 0
+    last_heading = None
+    for node in nodes:
+        for string, heading in iter_strings(node):
+            piece = string.strip()
+            if not piece:
+                continue
+            if heading is not None and heading is last_heading:
+                block = blocks[-1]
+                block["text"] = f"{block['text']} {piece}"
+                block["end"] = block["start"] + len(block["text"])
+                offset = block["end"] + 2
+                continue
+            last_heading = heading
+            blocks.append(make_block(piece, offset, int(heading.tag[1]) if heading is not None else 0))
+            offset = blocks[-1]["end"] + 2
+    return blocks
+
+
+def meta_property(root, name):
+    values = root.xpath("//meta[@property=$name]/@content", name=name)
+    return values[0] if values and values[0] else None
+
+
+def extract_main_content(html, selector=None, noise=None):
+    """
+    Metadata and main-content blocks of `html`, plus the selector and noise
+    selectors to reuse. A stored `selector` that still matches enough
+    low-link-density text is used directly ("selector"): only its elements are
+    cleaned, by junk tags / names and the stored `noise` selectors. Otherwise the
+    whole page is scored ("density") and the winners' selectors are learned.
+    """
+    import lxml.html
+
+    root = lxml.html.document_fromstring(html)
+    title_el = root.find('.//title')
+    result = {
+        "title": meta_property(root, 'og:title') or (title_el.text_content().strip() if title_el is not None else '') or 'No Title',
+        "site_name": meta_property(root, 'og:site_name') or '',
+        "thumbnail_url": meta_property(root, 'og:image') or '',
+    }
+
+    nodes = select(root, selector) if selector else []
+    if nodes:
+        for node in nodes:
+            strip_junk(node)
+            drop_noise(node, noise or [])
+        length = sum(text_length(node) for node in nodes)
+        links = sum(link_density(node) * text_length(node) for node in nodes)
+        if length >= MIN_SELECTED_CHARS and links / length <= MAX_LINK_DENSITY:
+            return dict(result, blocks=extract_blocks(nodes), selector=selector, noise=list(noise or []), method="selector")
+
+    strip_junk(root)
+    nodes = pick_content(root)
+    learned = learn_selector(root, nodes)
+    removed = [el for node in nodes for el in clean(node)]
+    return dict(result, blocks=extract_blocks(nodes), selector=learned, noise=learn_noise(nodes, removed) if learned else [], method="density")
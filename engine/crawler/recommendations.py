@@ -0,0 +1,292 @@
+"""
+Media source recommendations for the admin dashboard (GET /media/recommendations).
+
+Several RECOMMENDATION_QUERIES are searched at once (Gemini + Google Search
+grounding), candidates on domains already in `sources` or on social platforms are
+dropped, and the rest are verified in parallel: a HEAD request for liveness, then
+a GET of just the page's <head> for its og: metadata. Verified recommendations go
+into a ready pool. Requests are answered with a stable slice of it (the same
+recommendations, so the ETag holds) until the slice expires or the caller asks
+for the next one or dismisses an entry; only then is the pool drawn from, and it
+is refilled in the background when it runs low.
+
+Candidate URLs come from a model's search results, so they are untrusted: probe()
+only connects to hosts that resolve to public addresses and follows redirects by
+hand, checking every hop.
+"""
+import os
+import time
+import random
+import socket
+import asyncio
+import logging
+import ipaddress
+from datetime import datetime, timezone
+from urllib.parse import urljoin, urlsplit
+
+from crawler.crawler import USER_AGENT, decode_html
+from crawler.extraction import meta_property
+from crawler.templates import template_domain
+
+logger = logging.getLogger(__name__)
+
+RECOMMENDATION_QUERIES = [
+    "美容整形 ブログ おすすめ",
+    "美容クリニック 評判 ブログ",
+    "美容皮膚科 体験記",
+    "医療ダイエット 経過 ブログ",
+    "AGA治療 体験 ブログ",
+    "低用量ピル 服用日記",
+    "韓国美容整形 レポ ブログ",
+    "美容ナース ブログ",
+    "美容情報サイト ランキング",
+    # Specific / Maniac / NightWork contexts as requested
+    "キャバ嬢 美容整形 ダウンタイム ブログ",
+    "夜職 美容代 内訳 ブログ",
+    "美容整形 失敗 修正 ブログ",
+    "鼻整形 経過 レポ",
+    "骨切り ダウンタイム 経過ブログ",
+    "美容オタク スキンケア 成分解析 ブログ",
+    "カンナムオンニ レポ 翻訳",
+    "美容医療 課金 リアル ブログ"
+]
+# Social platforms; subdomains (m.youtube.com, ...) are excluded too
+EXCLUDED_DOMAINS = {"twitter.com", "x.com", "instagram.com", "facebook.com", "youtube.com", "tiktok.com"}
+
+# Queries searched concurrently per refill
+QUERIES_PER_REFILL = int(os.getenv("AURA_RECOMMENDATION_QUERIES", 3))
+# Verified recommendations kept ready; a refill starts below POOL_LOW
+POOL_SIZE = int(os.getenv("AURA_RECOMMENDATION_POOL_SIZE", 12))
+POOL_LOW = int(os.getenv("AURA_RECOMMENDATION_POOL_LOW", 6))
+# Pooled recommendations verified longer ago than this are dropped unserved
+POOL_TTL = int(os.getenv("AURA_RECOMMENDATION_POOL_TTL", 6 * 3600))
+# How long the same slice of recommendations is served before the next one
+SLICE_TTL = int(os.getenv("AURA_RECOMMENDATION_SLICE_TTL", 3600))
+# How long the known `sources` domains are cached
+SOURCES_TTL = int(os.getenv("AURA_RECOMMENDATION_SOURCES_TTL", 600))
+VERIFY_CONCURRENCY = int(os.getenv("AURA_RECOMMENDATION_VERIFY_CONCURRENCY", 8))
+VERIFY_TIMEOUT = 8
+SEARCH_TIMEOUT = 90
+# A page's <head> is expected within this many bytes
+HEAD_BYTES = 64 * 1024
+# Servers that reject HEAD (but may answer GET)
+HEAD_UNSUPPORTED = {403, 405, 501}
+MAX_REDIRECTS = 5
+
+
+def is_excluded(domain):
+    """True for an EXCLUDED_DOMAINS domain or any subdomain of one."""
+    return any(domain == excluded or domain.endswith("." + excluded) for excluded in EXCLUDED_DOMAINS)
+
+
+def check_public_url(url):
+    """
+    Raises ValueError unless `url` is http(s) and its host resolves only to public
+    addresses (no private, loopback, link-local, reserved or multicast ones).
+    """
+    parts = urlsplit(url)
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        raise ValueError(f"Not an http(s) URL: {url}")
+    try:
+        infos = socket.getaddrinfo(parts.hostname, parts.port or (443 if parts.scheme == "https" else 80),
+                                   type=socket.SOCK_STREAM)
+    except socket.gaierror as e:
+        raise ValueError(f"Cannot resolve {parts.hostname}: {e}")
+    for info in infos:
+        address = ipaddress.ip_address(info[4][0].split("%")[0])
+        if address.version == 6 and address.ipv4_mapped:
+            address = address.ipv4_mapped
+        if not address.is_global or address.is_multicast:
+            raise ValueError(f"{parts.hostname} resolves to non-public address {address}")
+
+
+def _request(method, url, timeout, **kwargs):
+    """A `requests` call that follows redirects itself, checking each URL with check_public_url."""
+    import requests
+
+    for _ in range(MAX_REDIRECTS + 1):
+        check_public_url(url)
+        response = requests.request(method, url, headers={"User-Agent": USER_AGENT}, timeout=timeout,
+                                    allow_redirects=False, **kwargs)
+        if not response.is_redirect:
+            return response
+        response.close()
+        url = urljoin(url, response.headers["Location"])
+    raise ValueError(f"More than {MAX_REDIRECTS} redirects: {url}")
+
+
+def probe(url, timeout=VERIFY_TIMEOUT):
+    """
+    Liveness and metadata of `url`: a HEAD request, then a streamed GET read up to
+    </head> (at most HEAD_BYTES). Returns {"url" (after redirects), "status",
+    "title", "site_name", "description", "thumbnail_url"}, or None when the page is
+    dead or not HTML. Raises ValueError for URLs check_public_url rejects (on any hop).
+    """
+    import lxml.html
+
+    head = _request("HEAD", url, timeout)
+    if head.status_code >= 400 and head.status_code not in HEAD_UNSUPPORTED:
+        return None
+    if head.status_code < 400 and "html" not in head.headers.get("Content-Type", "text/html"):
+        return None
+
+    with _request("GET", head.url if head.status_code < 400 else url, timeout, stream=True) as response:
+        if response.status_code >= 400 or "html" not in response.headers.get("Content-Type", "text/html"):
+            return None
+        body = bytearray()
+        for piece in response.iter_content(8192):
+            body += piece
+            if len(body) >= HEAD_BYTES or b"</head>" in body[-len(piece) - 7:].lower():
+                break
+        final_url, status = response.url, response.status_code
+        text = decode_html(body, response)
+    if not text.strip():
+        return None
+
+    root = lxml.html.document_fromstring(text)
+    title = root.find('.//title')
+    description = root.xpath("//meta[@name='description']/@content")
+    return {
+        "url": final_url,
+        "status": status,
+        "title": meta_property(root, 'og:title') or (title.text_content().strip() if title is not None else ''),
+        "site_name": meta_property(root, 'og:site_name') or '',
+        "description": meta_property(root, 'og:description') or (description[0] if description else ''),
+        "thumbnail_url": meta_property(root, 'og:image') or '',
+    }
+
+
+class MediaRecommender:
+    """
+    Ready pool of verified media source recommendations.
+
+    `search(query)` returns raw candidates ([{"name", "url"}], e.g.
+    AIGenerator.recommend_media_sources) and `load_source_urls()` every source url,
+    cached for SOURCES_TTL to dedupe against. current() answers with the slice
+    on show, moving on to the next one from the pool only when it expires
+    (SLICE_TTL), `advance` is set or dismiss() removed entries. The pool is
+    refilled in the background when it runs low; only an empty pool makes the
+    caller wait for a refill. Concurrent refills are coalesced into one.
+    """
+
+    def __init__(self, search, load_source_urls, queries=RECOMMENDATION_QUERIES, pool_size=POOL_SIZE, pool_low=POOL_LOW):
+        self.search = search
+        self.load_source_urls = load_source_urls
+        self.queries = queries
+        self.pool_size = pool_size
+        self.pool_low = pool_low
+        self._pool = []  # [(verified at (monotonic), recommendation)]
+        self._shown = []  # the slice current() answers with
+        self._shown_at = 0.0
+        self._dismissed = set()  # domains never to recommend again (this process)
+        self._known = None
+        self._known_at = 0.0
+        self._refill = None
+        self._stats = {"refills": 0, "candidates": 0, "verified": 0, "dead": 0, "last_refill_seconds": None}
+
+    async def known_domains(self, refresh=False):
+        """Domains of every source (active or not), cached for SOURCES_TTL seconds."""
+        if refresh or self._known is None or time.monotonic() - self._known_at > SOURCES_TTL:
+            self._known = {template_domain(url) for url in await self.load_source_urls()}
+            self._known_at = time.monotonic()
+        return self._known
+
+    async def current(self, count=3, advance=False):
+        """
+        The `count` recommendations on show. Repeated calls return the same slice;
+        entries whose domain became a source are replaced, and the whole slice is
+        replaced from the pool once it is older than SLICE_TTL or `advance` is set.
+        """
+        known = await self.known_domains()
+        now = time.monotonic()
+        self._pool = [(at, r) for at, r in self._pool if template_domain(r["url"]) not in known and now - at <= POOL_TTL]
+        if advance or now - self._shown_at > SLICE_TTL:
+            self._shown = []
+        self._shown = [r for r in self._shown if template_domain(r["url"]) not in known]
+        if len(self._shown) < count:
+            if not self._shown and not self._pool:
+                await self.refill()
+            missing = count - len(self._shown)
+            self._shown += [r for _, r in self._pool[:missing]]
+            self._pool = self._pool[missing:]
+            self._shown_at = now
+            if len(self._pool) < self.pool_low:
+                self.refill_later()
+        return list(self._shown)
+
+    def dismiss(self, url):
+        """Drops the recommendation for `url`'s domain; the next current() call fills its place."""
+        domain = template_domain(url)
+        self._dismissed.add(domain)
+        self._shown = [r for r in self._shown if template_domain(r["url"]) != domain]
+        self._pool = [(at, r) for at, r in self._pool if template_domain(r["url"]) != domain]
+
+    def refill_later(self):
+        """Starts a refill in the background unless one is running; returns its task."""
+        if self._refill is None:
+            self._refill = asyncio.ensure_future(self._fill())
+            self._refill.add_done_callback(self._refill_done)
+        return self._refill
+
+    async def refill(self):
+        """Tops the pool up to pool_size; callers during a running refill wait for that one."""
+        await asyncio.shield(self.refill_later())
+
+    def _refill_done(self, task):
+        self._refill = None
+        if not task.cancelled() and task.exception():
+            logger.error(f"Recommendation refill failed: {task.exception()}")
+
+    async def _fill(self):
+        started = time.monotonic()
+        queries = random.sample(self.queries, min(QUERIES_PER_REFILL, len(self.queries)))
+        logger.info(f"Recommendation refill: searching {len(queries)} queries: {queries}")
+        results = await asyncio.gather(*(asyncio.wait_for(self.search(q), SEARCH_TIMEOUT) for q in queries), return_exceptions=True)
+
+        known = await self.known_domains()
+        taken = {template_domain(r["url"]) for _, r in self._pool} | {template_domain(r["url"]) for r in self._shown}
+        taken |= self._dismissed
+        candidates = []
+        for query, found in zip(queries, results):
+            if isinstance(found, BaseException):
+                logger.error(f"Recommendation search failed for {query}: {found}")
+                continue
+            for cand in found or []:
+                url = cand.get('url') if isinstance(cand, dict) else None
+                domain = template_domain(url) if url else ''
+                if not domain or domain in known or domain in taken or is_excluded(domain):
+                    continue
+                taken.add(domain)
+                candidates.append({"name": cand.get('name'), "url": url, "query_used": query})
+
+        semaphore = asyncio.Semaphore(VERIFY_CONCURRENCY)
+
+        async def verify(cand):
+            async with semaphore:
+                try:
+                    page = await asyncio.to_thread(probe, cand["url"])
+                except Exception as e:
+                    logger.info(f"Recommendation {cand['url']} unreachable: {e}")
+                    return None
+            if page is None or template_domain(page["url"]) in known or is_excluded(template_domain(page["url"])):
+                return None
+            return dict(cand, url=page["url"], name=cand["name"] or page["site_name"] or page["title"],
+                        title=page["title"], description=page["description"], thumbnail_url=page["thumbnail_url"],
+                        verified_at=datetime.now(timezone.utc).isoformat())
+
+        verified = [r for r in await asyncio.gather(*(verify(c) for c in candidates)) if r]
+        random.shuffle(verified)
+        now = time.monotonic()
+        self._pool.extend((now, r) for r in verified[:max(self.pool_size - len(self._pool), 0)])
+
+        stats = self._stats
+        stats["refills"] += 1
+        stats["candidates"] += len(candidates)
+        stats["verified"] += len(verified)
+        stats["dead"] += len(candidates) - len(verified)
+        stats["last_refill_seconds"] = round(time.monotonic() - started, 2)
+        logger.info(f"Recommendation refill: {len(verified)} of {len(candidates)} candidates verified "
+                    f"in {stats['last_refill_seconds']}s, pool {len(self._pool)}")
+
+    def stats(self):
+        return dict(self._stats, pool=len(self._pool), shown=len(self._shown), refilling=self._refill is not None)
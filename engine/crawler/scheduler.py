@@ -0,0 +1,140 @@
+import os
+import math
+import hashlib
+import logging
+from datetime import datetime, timedelta, timezone
+
+logger = logging.getLogger(__name__)
+
+MIN_INTERVAL = int(os.getenv("AURA_CRAWL_MIN_INTERVAL", 3600))
+MAX_INTERVAL = int(os.getenv("AURA_CRAWL_MAX_INTERVAL", 7 * 86400))
+DEFAULT_INTERVAL = 86400
+CRAWL_BUDGET = int(os.getenv("AURA_CRAWL_BUDGET", 50))
+# Retry delay after a failed fetch, doubled per consecutive failure (up to MAX_INTERVAL)
+FAILURE_BACKOFF = int(os.getenv("AURA_CRAWL_FAILURE_BACKOFF", 3600))
+# Checks remembered per source; older history is decayed so the estimate follows the site
+HISTORY = 20
+
+
+def content_hash(text):
+    """Hash of the extracted text with whitespace normalised (layout-only changes do not count)."""
+    return hashlib.sha256(" ".join((text or "").split()).encode("utf-8")).hexdigest()
+
+
+def parse_time(value):
+    if not value:
+        return None
+    if isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+
+def estimate_interval(interval, checks, changes, elapsed):
+    """
+    Next revisit interval from the change history. The change rate uses the
+    Cho & Garcia-Molina estimator for periodic checks, -ln((n - X + 0.5) / (n + 0.5)) / I,
+    with I the observed mean time between checks (`elapsed`, which differs from the
+    planned interval when crawls run late), and the source is revisited about once
+    per expected change. Each observation moves the interval by at most 2x.
+    """
+    rate = -math.log((checks - changes + 0.5) / (checks + 0.5)) / elapsed
+    proposed = 1 / rate if rate > 0 else interval * 2
+    proposed = min(max(proposed, interval / 2), interval * 2)
+    return int(min(max(proposed, MIN_INTERVAL), MAX_INTERVAL))
+
+
+class CrawlScheduler:
+    """
+    Freshness-aware crawl selection. Each source keeps a content hash and a decayed
+    count of checks / changes / seconds between checks (sources columns, see
+    20261019100600_source_crawl_schedule.sql); from those it gets an adaptive revisit
+    interval and a next_crawl_at. Failed fetches push next_crawl_at back exponentially
+    instead, so a dead source does not stay due and take a budget slot every run.
+    """
+
+    def __init__(self, budget=CRAWL_BUDGET):
+        self.budget = budget
+
+    def priority(self, source, now):
+        """How overdue a source is, in revisit intervals (never-crawled sources first)."""
+        next_at = parse_time(source.get("next_crawl_at"))
+        last_at = parse_time(source.get("last_crawled_at"))
+        if next_at is None and last_at is None:
+            return math.inf
+        interval = source.get("revisit_interval_seconds") or DEFAULT_INTERVAL
+        due_at = next_at or last_at + timedelta(seconds=interval)
+        return (now - due_at).total_seconds() / interval
+
+    def select(self, sources, now=None, budget=None):
+        """Due sources, most overdue first, at most `budget` of them."""
+        now = now or datetime.now(timezone.utc)
+        budget = self.budget if budget is None else budget
+        ranked = sorted(((self.priority(s, now), s) for s in sources), key=lambda pair: pair[0], reverse=True)
+        due = [source for score, source in ranked if score >= 0]
+        if len(due) > budget:
+            logger.info(f"Crawl budget {budget}: deferring {len(due) - budget} due sources")
+        logger.info(f"Crawl schedule: {min(len(due), budget)} of {len(sources)} sources due")
+        return due[:budget]
+
+    def observe(self, source, text, now=None):
+        """
+        Records one successful crawl of `source`. Returns the row for
+        record_source_crawls (new hash, history, interval, next_crawl_at) and
+        whether the content changed since the last crawl.
+        """
+        now = now or datetime.now(timezone.utc)
+        new_hash = content_hash(text)
+        previous = source.get("content_hash")
+        changed = previous != new_hash
+
+        checks = float(source.get("crawl_checks") or 0)
+        changes = float(source.get("crawl_changes") or 0)
+        interval = source.get("revisit_interval_seconds") or DEFAULT_INTERVAL
+        # Rows from before crawl_seconds was tracked: assume the planned interval
+        seconds = float(source.get("crawl_seconds") or 0) or checks * interval
+        last_at = parse_time(source.get("last_crawled_at"))
+        if previous is not None:
+            if checks >= HISTORY:
+                decay = (HISTORY - 1) / HISTORY
+                checks, changes, seconds = checks * decay, changes * decay, seconds * decay
+            checks += 1
+            changes += 1 if changed else 0
+            seconds += max((now - last_at).total_seconds(), 1) if last_at else interval
+            interval = estimate_interval(interval, checks, changes, seconds / checks)
+
+        record = {
+            "id": source["id"],
+            "crawled_at": now.isoformat(),
+            "content_hash": new_hash,
+            "crawl_checks": round(checks, 3),
+            "crawl_changes": round(changes, 3),
+            "crawl_seconds": round(seconds, 3),
+            "crawl_failures": 0,
+            "revisit_interval_seconds": interval,
+            "next_crawl_at": (now + timedelta(seconds=interval)).isoformat(),
+            "last_changed_at": now.isoformat() if changed else None,
+        }
+        return record, changed
+
+    def observe_failure(self, source, now=None):
+        """
+        Records a failed fetch of `source`: the change history is kept and the next
+        attempt is FAILURE_BACKOFF * 2^(failures - 1) seconds away (at most MAX_INTERVAL).
+        Returns the row for record_source_crawls.
+        """
+        now = now or datetime.now(timezone.utc)
+        failures = int(source.get("crawl_failures") or 0) + 1
+        delay = min(FAILURE_BACKOFF * 2 ** min(failures - 1, 32), MAX_INTERVAL)
+        logger.info(f"Crawl of {source.get('url')} failed {failures}x in a row; retrying in {delay}s")
+        return {
+            "id": source["id"],
+            "crawled_at": None,
+            "content_hash": source.get("content_hash"),
+            "crawl_checks": source.get("crawl_checks") or 0,
+            "crawl_changes": source.get("crawl_changes") or 0,
+            "crawl_seconds": source.get("crawl_seconds") or 0,
+            "crawl_failures": failures,
+            "revisit_interval_seconds": source.get("revisit_interval_seconds"),
+            "next_crawl_at": (now + timedelta(seconds=delay)).isoformat(),
+            "last_changed_at": None,
+        }
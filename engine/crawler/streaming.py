@@ -0,0 +1,179 @@
+from html.parser import HTMLParser
+
+from crawler.chunker import make_block
+from crawler.extraction import SELECTOR, MIN_SELECTED_CHARS
+
+HEADING_TAGS = {'h1', 'h2', 'h3', 'h4', 'h5', 'h6'}
+SKIP_TAGS = {'script', 'style', 'nav', 'header', 'footer', 'iframe', 'noscript'}
+AD_CLASSES = {'ad', 'advertisement', 'banner', 'sidebar', 'popup'}
+VOID_TAGS = {'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta', 'param', 'source', 'track', 'wbr'}
+# Elements that close an open sibling of the same name (<p>a<p>b, <li>a<li>b)
+IMPLICIT_CLOSE = {'p', 'li', 'option', 'dt', 'dd', 'tr', 'td', 'th'}
+# Content containers, best first (same priority as BeautyCrawler.extract_soup)
+CONTENT_CLASSES = ['post-content', 'entry-content', 'article-body', 'news-body']
+SCOPES = ['article', 'main'] + CONTENT_CLASSES + ['body']
+META_PROPERTIES = {'og:title', 'og:site_name', 'og:image'}
+
+
+class _Scope:
+    """Blocks collected inside one candidate content container."""
+
+    def __init__(self, depth):
+        self.depth = depth
+        self.closed = False
+        self.blocks = []
+        self.chars = 0
+        self.offset = 0
+        self.last_heading = None
+
+
+class StreamingExtractor(HTMLParser):
+    """
+    Incremental version of BeautyCrawler.extract_soup's container rules: feed() the
+    HTML in pieces and stop once `done`. Only metadata and the text blocks of the
+    best content container seen so far are kept (at most `max_chars` of text), so
+    memory does not grow with the page and no DOM tree is built.
+
+    A learned `selector` (sources.content_selector, see crawler/extraction.py) is
+    tried first: text inside its elements wins when there is enough of it.
+    """
+
+    def __init__(self, max_chars=20000, selector=None):
+        super().__init__(convert_charrefs=True)
+        self.max_chars = max_chars
+        self.selector = selector
+        self._selector_parts = [m.groups() for m in (SELECTOR.match(p.strip()) for p in (selector or "").split(",")) if m] if selector else []
+        self._selector_seen = set()
+        self._selector_depth = None
+        self._selected = _Scope(None)
+        self.meta = {}
+        self.title = None
+        self._title_parts = None
+        self._stack = []  # [(tag, serial)] of open elements
+        self._serial = 0
+        self._skip_depth = None
+        self._scopes = {}
+        self._best = len(SCOPES)
+
+    @property
+    def done(self):
+        """
+        Every selector element was read (with enough text), or the first <article> is
+        complete, or the best container already has max_chars of text.
+        """
+        if self._selector_parts:
+            if self._selected.chars >= self.max_chars:
+                return True
+            if self._selector_depth is None and len(self._selector_seen) == len(self._selector_parts):
+                return self._selected.chars >= MIN_SELECTED_CHARS
+        article = self._scopes.get('article')
+        if article and (article.closed or article.chars >= self.max_chars):
+            return True
+        best = self._scopes.get(SCOPES[self._best]) if self._best < len(SCOPES) else None
+        return best is not None and best.chars >= self.max_chars
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'meta':
+            attrs = dict(attrs)
+            if attrs.get('property') in META_PROPERTIES and attrs.get('content') and attrs['property'] not in self.meta:
+                self.meta[attrs['property']] = attrs['content']
+            return
+        if tag in VOID_TAGS:
+            return
+        if tag in IMPLICIT_CLOSE and self._stack and self._stack[-1][0] == tag:
+            self.handle_endtag(tag)
+        self._serial += 1
+        self._stack.append((tag, self._serial))
+        depth = len(self._stack)
+        if self._skip_depth is not None:
+            return
+        classes = set((dict(attrs).get('class') or '').split())
+        if tag in SKIP_TAGS or classes & AD_CLASSES:
+            self._skip_depth = depth
+            return
+        if tag == 'title' and self.title is None:
+            self._title_parts = []
+        if self._selector_depth is None:
+            for i, (part_tag, part_id, part_classes) in enumerate(self._selector_parts):
+                if i in self._selector_seen or tag != part_tag:
+                    continue
+                if part_id and dict(attrs).get('id') != part_id:
+                    continue
+                if part_classes and not set(part_classes.split(".")[1:]) <= classes:
+                    continue
+                self._selector_seen.add(i)
+                self._selector_depth = depth
+                break
+        for name in [tag] if tag in ('article', 'main', 'body') else [c for c in CONTENT_CLASSES if c in classes]:
+            if name in self._scopes:
+                continue
+            priority = SCOPES.index(name)
+            if priority > self._best:
+                continue
+            self._scopes[name] = _Scope(depth)
+            self._best = priority
+            # A better container makes the ones collected so far irrelevant
+            for other in SCOPES[priority + 1:]:
+                self._scopes.pop(other, None)
+
+    def handle_endtag(self, tag):
+        if tag in VOID_TAGS or not any(open_tag == tag for open_tag, _ in self._stack):
+            return
+        while self._stack:
+            open_tag, _ = self._stack.pop()
+            depth = len(self._stack) + 1
+            if self._skip_depth is not None and depth <= self._skip_depth:
+                self._skip_depth = None
+            if self._selector_depth is not None and depth <= self._selector_depth:
+                self._selector_depth = None
+            for scope in self._scopes.values():
+                if scope.depth == depth:
+                    scope.closed = True
+            if open_tag == 'title' and self._title_parts is not None:
+                self.title = "".join(self._title_parts).strip() or None
+                self._title_parts = None
+            if open_tag == tag:
+                break
+
+    def handle_data(self, data):
+        if self._skip_depth is not None:
+            return
+        if self._title_parts is not None:
+            self._title_parts.append(data)
+            return
+        piece = data.strip()
+        if not piece:
+            return
+        heading = next((serial for tag, serial in reversed(self._stack) if tag in HEADING_TAGS), None)
+        scopes = list(self._scopes.values())
+        if self._selector_depth is not None:
+            scopes.append(self._selected)
+        for scope in scopes:
+            if scope.closed or scope.chars >= self.max_chars:
+                continue
+            if heading is not None and heading == scope.last_heading:
+                # Strings inside one h1-h6 element form a single heading block
+                block = scope.blocks[-1]
+                block["text"] = f"{block['text']} {piece}"
+                block["end"] = block["start"] + len(block["text"])
+            else:
+                scope.last_heading = heading
+                level = int(next(tag for tag, serial in self._stack if serial == heading)[1]) if heading is not None else 0
+                scope.blocks.append(make_block(piece, scope.offset, level))
+            scope.offset = scope.blocks[-1]["end"] + 2
+            scope.chars += len(piece)
+
+    def result(self):
+        """
+        title, site_name, thumbnail_url and the text blocks of the selector's elements
+        (method "selector") or else of the best content container ("streaming").
+        """
+        result = {
+            "title": self.meta.get('og:title') or self.title or 'No Title',
+            "site_name": self.meta.get('og:site_name') or '',
+            "thumbnail_url": self.meta.get('og:image') or '',
+        }
+        if len(self._selector_seen) == len(self._selector_parts) > 0 and self._selected.chars >= MIN_SELECTED_CHARS:
+            return dict(result, blocks=self._selected.blocks, selector=self.selector, noise=[], method="selector")
+        best = self._scopes.get(SCOPES[self._best]) if self._best < len(SCOPES) else None
+        return dict(result, blocks=best.blocks if best else [], selector=None, noise=[], method="streaming")
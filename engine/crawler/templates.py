@@ -0,0 +1,91 @@
+import logging
+from datetime import datetime, timezone
+from urllib.parse import urlsplit
+
+logger = logging.getLogger(__name__)
+
+# Extraction methods that a template can be learned from or confirmed by
+LEARNING_METHODS = ("density", "selector")
+
+
+def template_domain(url):
+    """Host of `url`, lower-cased and without a leading www."""
+    host = (urlsplit(url).hostname or "").lower()
+    return host[4:] if host.startswith("www.") else host
+
+
+class ExtractionTemplates:
+    """
+    Per-domain extraction templates learned from previous crawls (extraction_templates,
+    see 20261019100900_extraction_templates.sql): the main-content selector list, the noise
+    selectors dropped inside it and whether the page needs a browser (needs_js).
+
+    A crawl whose result came from the template's selector counts as a hit; a crawl
+    that fell back to the full density heuristics replaces the template with what
+    they learned (a miss when there was a template). Changed templates are returned
+    by pop_changes() for one batched upsert per run.
+    """
+
+    def __init__(self, rows=()):
+        self._templates = {}
+        self._dirty = set()
+        self.load(rows)
+
+    def load(self, rows):
+        """Adds stored templates; ones changed in memory and not yet saved are kept."""
+        for row in rows or []:
+            if row["domain"] not in self._dirty:
+                self._templates[row["domain"]] = dict(row, noise_selectors=list(row.get("noise_selectors") or []))
+
+    def get(self, url):
+        return self._templates.get(template_domain(url))
+
+    def observe(self, url, data, needs_js=None):
+        """
+        Updates the template of `url`'s domain from one crawl result (BeautyCrawler
+        data). `needs_js` None keeps the stored value. Returns the template, or None
+        when the result's extraction cannot teach one (legacy / streaming).
+        """
+        if data["extraction"] not in LEARNING_METHODS:
+            return None
+        domain = template_domain(url)
+        now = datetime.now(timezone.utc).isoformat()
+        template = self._templates.get(domain)
+        if template and data["extraction"] == "selector" and data["content_selector"] == template["content_selector"]:
+            template["hits"] += 1
+        else:
+            missed = bool(template and template["content_selector"])
+            if missed:
+                logger.info(f"Extraction template for {domain} stopped matching ({template['content_selector']}); "
+                            f"relearned: {data['content_selector'] or 'no selector'}")
+            template = {
+                "domain": domain,
+                "content_selector": data["content_selector"],
+                "noise_selectors": data["noise_selectors"],
+                "needs_js": template["needs_js"] if template and not missed else None,
+                "hits": template["hits"] if template else 0,
+                "misses": (template["misses"] if template else 0) + missed,
+                "learned_at": now,
+            }
+            self._templates[domain] = template
+        if needs_js is not None:
+            template["needs_js"] = needs_js
+        template["updated_at"] = now
+        self._dirty.add(domain)
+        return template
+
+    def pop_changes(self):
+        """Templates changed since the last call, as extraction_templates rows."""
+        rows = [dict(self._templates[domain]) for domain in sorted(self._dirty)]
+        self._dirty.clear()
+        return rows
+
+    def stats(self):
+        templates = self._templates.values()
+        return {
+            "domains": len(self._templates),
+            "with_selector": sum(1 for t in templates if t["content_selector"]),
+            "static": sum(1 for t in templates if t["needs_js"] is False),
+            "hits": sum(t["hits"] for t in templates),
+            "misses": sum(t["misses"] for t in templates),
+        }
@@ -1,14 +1,20 @@
 import os
-import google.generativeai as genai
+import asyncio
 from dotenv import load_dotenv
-import requests
 import base64
 import logging
 import json
+import inspect
 from utils.db import SupabaseManager
+from utils.tracing import span
+from generator.images import process_and_upload
 
 load_dotenv()
 
+DEFAULT_GEMINI_API_BASE = "https://generativelanguage.googleapis.com"
+# Override to point every Gemini/Imagen call at a mock server (benchmarks/mock_gemini.py)
+GEMINI_API_BASE = os.getenv("GEMINI_API_BASE", DEFAULT_GEMINI_API_BASE).rstrip("/")
+
 MISAKI_PERSONA = """
 あなたは美容メディア「AURA」の編集長「美咲（みさき）」です。
 「AURA」は、20代〜40代の美容関心層に向けた、信頼できる美容情報メディアです。
@@ -86,17 +92,25 @@ AIが生成したような機械的な表現や、不自然な記号（文中の
 
 class AIGenerator:
     def __init__(self, mock=False):
-        api_key = os.environ.get("GEMINI_API_KEY")
-        if not api_key:
+        self._model = None
+        self._api_key = os.environ.get("GEMINI_API_KEY")
+        if not self._api_key:
             if not mock:
                 raise ValueError("GEMINI_API_KEY not found in environment variables.")
-            if mock:
-                print("Mock mode enabled: AI generation will be simulated.")
-                self.model = None
-                return
-        else:
-            genai.configure(api_key=api_key)
-            self.model = genai.GenerativeModel('gemini-2.0-flash')
+            print("Mock mode enabled: AI generation will be simulated.")
+
+    @property
+    def model(self):
+        """Gemini SDK model, configured on first use (the SDK import alone takes ~1s)."""
+        if self._model is None and self._api_key:
+            import google.generativeai as genai
+            if GEMINI_API_BASE != DEFAULT_GEMINI_API_BASE:
+                # Local mock / proxy (benchmarks): the gRPC transport cannot target plain HTTP
+                genai.configure(api_key=self._api_key, transport="rest", client_options={"api_endpoint": GEMINI_API_BASE})
+            else:
+                genai.configure(api_key=self._api_key)
+            self._model = genai.GenerativeModel('gemini-2.0-flash')
+        return self._model
 
     async def generate_article(self, keyword, source_content=None, category="美容", target_audience="美容に関心のある女性"):
         """Generates a blog post using the strict Misaki prompt."""
@@ -134,7 +148,7 @@ class AIGenerator:
             
         # Use gemini-2.0-flash (stable/available fast model with grounding capabilities)
         model_name = "models/gemini-2.0-flash" 
-        url = f"https://generativelanguage.googleapis.com/v1beta/{model_name}:generateContent?key={api_key}"
+        url = f"{GEMINI_API_BASE}/v1beta/{model_name}:generateContent?key={api_key}"
         
         # Prepare Reference Section with Learning Context
         reference_info = "(Google検索に基づき自動生成)"
@@ -192,6 +206,7 @@ class AIGenerator:
         }
         
         try:
+            import requests
             # Using REST API directly to access tools configuration more reliably than old SDK
             response = requests.post(url, headers=headers, json=payload)
             if response.status_code == 200:
@@ -213,8 +228,18 @@ class AIGenerator:
         except Exception as e:
             logging.error(f"Error generating with grounding: {e}")
             return None
-    async def generate_image(self, keyword, title=None):
-        """Generates a thumbnail using a 2-step process: 1. Generate Prompt 2. Generate Image."""
+    async def generate_image(self, keyword, title=None, db=None):
+        """Generates a thumbnail and returns its URL (see generate_thumbnail for the variants)."""
+        thumbnail = await self.generate_thumbnail(keyword, title=title, db=db)
+        return thumbnail["url"] if thumbnail else None
+
+    async def generate_thumbnail(self, keyword, title=None, db=None):
+        """
+        Generates a thumbnail using a 2-step process: 1. Generate Prompt 2. Generate Image.
+        Returns {"url", "variants"} (variants: {format: {width: url}}) or None.
+        `db` (SupabaseManager or AsyncSupabaseManager) uploads the result; a new
+        SupabaseManager is created when omitted.
+        """
         subject_text = title if title else keyword
         
         # Step 1: Use Gemini to write a high-fidelity image prompt
@@ -234,7 +259,8 @@ class AIGenerator:
         Output ONLY the prompt text in English.
         """
         
-        image_prompt = await self.generate_text(prompt_generation_prompt)
+        with span("thumbnail.prompt"):
+            image_prompt = await self.generate_text(prompt_generation_prompt)
         # Fallback if generation fails or returns weird JSON
         if not image_prompt or "Error" in image_prompt:
              image_prompt = f"High-end beauty photography of {keyword}, clean, pastel colors, aesthetic, photorealistic, 8k"
@@ -251,7 +277,7 @@ class AIGenerator:
                 return None
 
             model_name = "models/imagen-4.0-ultra-generate-001"
-            url = f"https://generativelanguage.googleapis.com/v1beta/{model_name}:predict?key={api_key}"
+            url = f"{GEMINI_API_BASE}/v1beta/{model_name}:predict?key={api_key}"
             
             headers = {"Content-Type": "application/json"}
             payload = {
@@ -267,7 +293,9 @@ class AIGenerator:
             # Using synchronous requests in async via loop or just blocking (ok for low traffic tool)
             # ideally use aiohttp, but requests is simpler and available.
             # To avoid blocking event loop too much, we could run in executor, but for now direct call is fine for this scale.
-            response = requests.post(url, headers=headers, json=payload)
+            import requests
+            with span("thumbnail.imagen", **{"aura.model": model_name}):
+                response = requests.post(url, headers=headers, json=payload)
             
             if response.status_code == 200:
                 data = response.json()
@@ -275,16 +303,24 @@ class AIGenerator:
                     b64_data = data['predictions'][0]['bytesBase64Encoded']
                     image_bytes = base64.b64decode(b64_data)
                     
-                    filename = f"generated_{os.urandom(4).hex()}.png"
-
-                    # Upload to Supabase Storage
+                    uploader = db or SupabaseManager()
+                    # Resize/re-encode to WebP (AVIF) variants in the image process pool, upload in parallel
+                    with span("thumbnail.variants", **{"aura.bytes": len(image_bytes)}):
+                        thumbnail = await process_and_upload(image_bytes, uploader)
+                    if thumbnail:
+                        logger.info(f"Image uploaded successfully: {thumbnail['url']}")
+                        return thumbnail
+
+                    # Fall back to the original PNG (content-addressed: identical bytes reuse one object)
                     try:
-                        db = SupabaseManager()
-                        full_url = db.upload_image(image_bytes, filename)
+                        with span("thumbnail.upload", **{"aura.bytes": len(image_bytes)}):
+                            full_url = uploader.upload_image(image_bytes)
+                            if inspect.isawaitable(full_url):
+                                full_url = await full_url
                         
                         if full_url:
                             logger.info(f"Image uploaded successfully: {full_url}")
-                            return full_url
+                            return {"url": full_url, "variants": None}
                         else:
                             logger.error("Failed to upload image to Supabase")
                             return None
@@ -371,7 +407,7 @@ class AIGenerator:
             return []
         
         model_name = "models/gemini-2.0-flash" 
-        url = f"https://generativelanguage.googleapis.com/v1beta/{model_name}:generateContent?key={api_key}"
+        url = f"{GEMINI_API_BASE}/v1beta/{model_name}:generateContent?key={api_key}"
         
         prompt_text = f"""
         Find 5 high-quality, popular Japanese blog or media websites about '{keyword}'.
@@ -394,7 +430,8 @@ class AIGenerator:
         
         try:
             import requests
-            response = requests.post(url, headers=headers, json=payload)
+            # In a thread: MediaRecommender runs several of these searches at once
+            response = await asyncio.to_thread(requests.post, url, headers=headers, json=payload)
             if response.status_code == 200:
                 data = response.json()
                 if 'candidates' in data and len(data['candidates']) > 0:
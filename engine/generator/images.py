@@ -0,0 +1,102 @@
+import io
+import os
+import asyncio
+import inspect
+import logging
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+# Widths the blog serves (OG/card 1200x630, list cards, mobile); all 1.91:1
+VARIANT_WIDTHS = (1200, 800, 400)
+ASPECT_RATIO = 1200 / 630
+QUALITY = {"webp": 80, "avif": 55}
+
+_pool = None
+
+
+def variant_formats():
+    """WebP always; AVIF when AURA_IMAGE_AVIF is set and this Pillow can encode it."""
+    formats = ["webp"]
+    if os.getenv("AURA_IMAGE_AVIF", "").lower() in ("1", "true", "yes"):
+        from PIL import features
+        if features.check("avif"):
+            formats.append("avif")
+        else:
+            logger.warning("AURA_IMAGE_AVIF is set but Pillow has no AVIF encoder; using WebP only")
+    return formats
+
+
+def render_variants(data, widths=VARIANT_WIDTHS, formats=("webp",)):
+    """
+    Decodes `data` once and returns [(format, width, bytes)] for every width/format.
+    Runs in a worker process. Re-encoding from bare pixels drops EXIF/ICC/text chunks.
+    """
+    with Image.open(io.BytesIO(data)) as source:
+        source = ImageOps.exif_transpose(source).convert("RGB")
+    height = round(source.width / ASPECT_RATIO)
+    if height <= source.height:
+        base = ImageOps.fit(source, (source.width, height), Image.LANCZOS)
+    else:
+        base = ImageOps.fit(source, (round(source.height * ASPECT_RATIO), source.height), Image.LANCZOS)
+
+    variants = []
+    for width in widths:
+        width = min(width, base.width)
+        resized = base if width == base.width else base.resize((width, round(width / ASPECT_RATIO)), Image.LANCZOS)
+        for fmt in formats:
+            out = io.BytesIO()
+            options = {"method": 6} if fmt == "webp" else {}
+            resized.save(out, fmt.upper(), quality=QUALITY[fmt], **options)
+            variants.append((fmt, width, out.getvalue()))
+    return variants
+
+
+def get_pool():
+    """Process pool shared by all image jobs (AURA_IMAGE_WORKERS, default 2)."""
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=int(os.getenv("AURA_IMAGE_WORKERS", 2)))
+    return _pool
+
+
+async def _upload(uploader, data, content_type):
+    upload = uploader.upload_image
+    if inspect.iscoroutinefunction(upload):
+        return await upload(data, content_type=content_type)
+    return await asyncio.to_thread(upload, data, content_type=content_type)
+
+
+async def process_and_upload(data, uploader, widths=VARIANT_WIDTHS):
+    """
+    Encodes the responsive variants off the event loop and uploads them in parallel.
+    Returns {"url": <largest WebP>, "variants": {format: {width: url}}}, or None if
+    encoding fails. Variants whose upload failed are left out.
+    """
+    formats = variant_formats()
+    loop = asyncio.get_running_loop()
+    try:
+        rendered = await loop.run_in_executor(get_pool(), render_variants, data, widths, tuple(formats))
+    except Exception as e:
+        logger.error(f"Image processing failed: {e}")
+        return None
+
+    urls = await asyncio.gather(
+        *(_upload(uploader, body, f"image/{fmt}") for fmt, _, body in rendered),
+        return_exceptions=True,
+    )
+    variants = {}
+    for (fmt, width, body), url in zip(rendered, urls):
+        if isinstance(url, Exception) or not url:
+            logger.error(f"Upload of {fmt} {width}w variant failed: {url}")
+            continue
+        variants.setdefault(fmt, {})[str(width)] = url
+    webp = variants.get("webp") or {}
+    if not webp:
+        return None
+    largest = max(webp, key=int)
+    saved = len(data) - sum(len(body) for fmt, width, body in rendered if fmt == "webp" and str(width) == largest)
+    logger.info(f"Thumbnail variants: {sum(len(v) for v in variants.values())} uploaded, {saved} bytes saved on the {largest}w card")
+    return {"url": webp[largest], "variants": variants}
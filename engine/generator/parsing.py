@@ -0,0 +1,68 @@
+import re
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+TITLE_PATTERN = re.compile(r'"title":\s*"([^"]+)"')
+CATEGORY_PATTERN = re.compile(r'"category":\s*"([^"]+)"')
+CONTENT_PATTERN = re.compile(r'"content":\s*"(.*)"\s*(\}|,)', re.DOTALL)
+
+
+def strip_code_fences(text):
+    """Removes ```json / ``` wrappers Gemini puts around JSON answers."""
+    return text.replace("```json", "").replace("```", "").strip()
+
+
+def extract_json_object(text):
+    """
+    The outermost {...} span of `text` (drops prose before/after the JSON). Output
+    cut off before its closing brace keeps everything from the opening one.
+    """
+    start = text.find("{")
+    if start == -1:
+        return text
+    end = text.rfind("}")
+    return text[start:end + 1] if end > start else text[start:]
+
+
+def parse_generated_article(raw, default_title):
+    """
+    Recovers (title, content, category) from the grounding model's JSON answer.
+    Strict JSON first; for broken JSON (unescaped quotes, truncation) the fields are
+    pulled out with regexes, and as a last resort the Markdown body is located
+    by its first heading.
+    """
+    cleaned = extract_json_object(strip_code_fences(raw))
+    title = default_title
+    content = ""
+    category = None
+    try:
+        # raw_decode: a complete object followed by more braces in trailing prose still parses
+        data, _ = json.JSONDecoder().raw_decode(cleaned)
+        return data.get("title", title), data.get("content", ""), data.get("category")
+    except (json.JSONDecodeError, AttributeError) as e:
+        logger.warning(f"JSON Parse Failed: {e}. Attempting regex extraction.")
+
+    t_match = TITLE_PATTERN.search(cleaned)
+    if t_match:
+        title = t_match.group(1)
+    c_match = CATEGORY_PATTERN.search(cleaned)
+    if c_match:
+        category = c_match.group(1)
+
+    # Content is the tricky field (quotes and newlines inside); assume it runs to the
+    # last quote before a closing brace or comma.
+    con_match = CONTENT_PATTERN.search(cleaned)
+    if con_match:
+        # Unescape standard JSON escapes that might be in there
+        content = con_match.group(1).replace('\\n', '\n').replace('\\"', '"')
+    else:
+        # Never return the broken JSON itself: fall back to the first Markdown heading
+        logger.error("Could not extract content from broken JSON.")
+        m_start = cleaned.find("# ")
+        if m_start != -1:
+            content = cleaned[m_start:].replace('\\n', '\n').replace('\\"', '"')
+        else:
+            content = "（記事生成に失敗しました。JSON形式のエラーです。）\n\nOriginal Output:\n" + cleaned[:200]
+    return title, content, category
@@ -1,22 +1,49 @@
 import asyncio
 import argparse
 import logging
-from utils.db import SupabaseManager
+from utils.async_db import AsyncSupabaseManager
+from utils.db import SOURCE_COLUMNS
 from crawler.crawler import BeautyCrawler
+from crawler.templates import template_domain
 from generator.generator import AIGenerator
-from utils.line_notifier import LineNotifier
+from utils.tracing import span
+from utils.profiling import profile_if_slow
+from utils.pipeline import Stage, run_stages
+from utils.checkpoints import RunCheckpoint
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-async def run_pipeline(source_url=None, mock=False):
-    """Runs the full content generation pipeline."""
+DEFAULT_CRAWL_CONCURRENCY = 3
+DEFAULT_GENERATE_CONCURRENCY = 2
+DEFAULT_PERSIST_CONCURRENCY = 1
+
+async def run_pipeline(source_url=None, mock=False, profile=False,
+                       crawl_concurrency=DEFAULT_CRAWL_CONCURRENCY,
+                       generate_concurrency=DEFAULT_GENERATE_CONCURRENCY,
+                       persist_concurrency=DEFAULT_PERSIST_CONCURRENCY,
+                       queue_size=None, resume=False):
+    """
+    Runs the full content generation pipeline as overlapping stages
+    (crawl -> generate -> persist) connected by bounded queues. Stage completion
+    per source is checkpointed; `resume` continues the last unfinished run.
+    """
+    with span("run_pipeline", **{"aura.mock": mock, "aura.resume": resume}), profile_if_slow("run_pipeline", force=profile):
+        checkpoint = RunCheckpoint("pipeline", resume=resume)
+        try:
+            await _run_pipeline(checkpoint, source_url, mock, crawl_concurrency, generate_concurrency, persist_concurrency, queue_size)
+        finally:
+            checkpoint.close()
+
+async def _run_pipeline(checkpoint, source_url=None, mock=False, crawl_concurrency=DEFAULT_CRAWL_CONCURRENCY,
+                        generate_concurrency=DEFAULT_GENERATE_CONCURRENCY,
+                        persist_concurrency=DEFAULT_PERSIST_CONCURRENCY, queue_size=None):
     # Initialize components
     # Logic: If mock is True, we tolerate missing keys for some components
     db = None
     try:
-        db = SupabaseManager()
+        db = await AsyncSupabaseManager.create()
     except Exception as e:
         if mock:
              logger.warning(f"DB Connection failed: {e}. Using mock DB mode.")
@@ -25,7 +52,8 @@ async def run_pipeline(source_url=None, mock=False):
 
     crawler = BeautyCrawler()
     generator = AIGenerator(mock=mock)
-    notifier = LineNotifier()
+    drafts = None
+    completed = False
 
     try:
         # 1. Identify Target
@@ -35,7 +63,7 @@ async def run_pipeline(source_url=None, mock=False):
         else:
             if db:
                 try:
-                    targets = db.get_sources().data
+                    targets = (await db.get_sources(columns=f"{SOURCE_COLUMNS}, content_selector")).data
                 except Exception as e:
                     if mock:
                         logger.warning(f"Failed to fetch sources from DB: {e}. Using mock targets.")
@@ -53,14 +81,35 @@ async def run_pipeline(source_url=None, mock=False):
             logger.info("No active sources found.")
             return
 
-        # 2. Crawl & Generate
-        await crawler.start_browser()
-        
-        for target in targets:
+        # 2. Crawl & Generate (the browser starts on the first page that needs rendering)
+        if db:
+            try:
+                with span("db.get_extraction_templates"):
+                    crawler.templates.load((await db.get_extraction_templates(template_domain(t['url']) for t in targets)).data)
+            except Exception as e:
+                logger.error(f"Failed to load extraction templates: {e}")
+
+        def on_drafts_saved(result):
+            for error in result.errors:
+                logger.error(f"Failed to save to DB: {error['row']['title']}: {error['error']}")
+            for saved_article in result.succeeded:
+                checkpoint.mark(saved_article.get('source_url'), "persist")
+                # Notify Owner
+                logger.info("Sending LINE notification to owner... (DISABLED TEMPORARILY)")
+                # notifier.notify_owner_review(saved_article)
+
+        drafts = db.write_buffer(db.bulk_insert_articles, batch_size=20, max_delay=60, on_flush=on_drafts_saved) if db else None
+
+        async def crawl(target):
             url = target['url']
+            if checkpoint.done(url, "persist"):
+                logger.info(f"Already done in this run, skipping: {url}")
+                return None
+            if checkpoint.done(url, "generate") or checkpoint.done(url, "crawl"):
+                logger.info(f"Resuming from checkpoint: {url}")
+                return url, checkpoint.payload(url, "crawl")
+
             logger.info(f"Processing source: {url}")
-            
-            # Crawl
             if mock and url == "https://www.example.com":
                 crawled_data = {
                     "title": "Mock Article Title",
@@ -69,25 +118,33 @@ async def run_pipeline(source_url=None, mock=False):
                     "source_url": url
                 }
             else:
-                crawled_data = await crawler.fetch_page_content(url)
-            
+                with span("crawler.fetch_page_content", **{"url.full": url}):
+                    crawled_data = await crawler.fetch_page_content(url, selector=target.get('content_selector'))
+
             if not crawled_data or not crawled_data.get('content'):
                 logger.warning(f"Failed to crawl or empty content: {url}")
-                continue
+                return None
+            crawled_data = {key: crawled_data.get(key) for key in ("title", "content", "thumbnail_url", "source_url")}
+            checkpoint.mark(url, "crawl", crawled_data)
+            return url, crawled_data
+
+        async def generate(crawled):
+            url, crawled_data = crawled
+            article_data = checkpoint.payload(url, "generate")
+            if article_data:
+                return article_data
 
-            # Generate
             logger.info(f"Generating article for: {crawled_data['title']}")
-            article_content = await generator.generate_article(
-                keyword=crawled_data['title'],
-                source_content=crawled_data['content']
-            )
+            with span("llm.generate_article"):
+                article_content = await generator.generate_article(
+                    keyword=crawled_data['title'],
+                    source_content=crawled_data['content']
+                )
 
             if not article_content:
                 logger.error("Failed to generate article content.")
-                continue
+                return None
 
-            # Save Draft
-            logger.info("Saving draft to Supabase...")
             article_data = {
                 "title": f"【美咲のトレンドcheck】{crawled_data['title']}",
                 "content": article_content,
@@ -96,34 +153,76 @@ async def run_pipeline(source_url=None, mock=False):
                 "thumbnail_url": crawled_data['thumbnail_url'],
                 "generated_by": "ai_misaki"
             }
-            if db:
-                try:
-                    res = db.insert_article(article_data)
-                    
-                    # Notify Owner
-                    if res and res.data and len(res.data) > 0:
-                        saved_article = res.data[0]
-                        logger.info("Sending LINE notification to owner... (DISABLED TEMPORARILY)")
-                        # notifier.notify_owner_review(saved_article)
-                    else:
-                        logger.info("Draft saved (ID unknown). notification skipped.")
+            checkpoint.mark(url, "generate", article_data)
+            return article_data
 
-                except Exception as e:
-                    logger.error(f"Failed to save to DB: {e}")
+        async def persist(article_data):
+            logger.info("Saving draft to Supabase...")
+            if drafts:
+                # Buffered: drafts are inserted in batches; on_drafts_saved checkpoints them
+                with span("db.insert_articles"):
+                    await drafts.add(article_data)
             elif mock:
                  logger.info(f"Mock Save: {article_data['title']}")
-                 # Mock notification
-                 notifier.notify_owner_review({'title': article_data['title'], 'id': 'mock-id'})
+                 # Owner-review notifications are disabled, mock runs included
+                 logger.info("Mock notification to owner skipped (DISABLED TEMPORARILY)")
+                 checkpoint.mark(article_data['source_url'], "persist")
+            return article_data
+
+        # Chromium keeps crawling while Gemini generates earlier pages
+        await run_stages(targets, [
+            Stage("crawl", crawl, crawl_concurrency),
+            Stage("generate", generate, generate_concurrency),
+            Stage("persist", persist, persist_concurrency),
+        ], queue_size=queue_size)
+        completed = True
 
     except Exception as e:
         logger.error(f"Pipeline error: {e}")
     finally:
         await crawler.close_browser()
+        logger.info(f"Crawler page memory: {crawler.stats()}")
+        if db:
+            try:
+                with span("db.save_extraction_templates"):
+                    result = await db.bulk_upsert_extraction_templates(crawler.templates.pop_changes())
+                for error in result.errors:
+                    logger.error(f"Failed to save extraction template for {error['row']['domain']}: {error['error']}")
+            except Exception as e:
+                logger.error(f"Failed to save extraction templates: {e}")
+        if drafts:
+            try:
+                with span("db.insert_articles"):
+                    await drafts.close()
+            except Exception as e:
+                logger.error(f"Failed to save to DB: {e}")
+                completed = False
+        if completed:
+            # Sources that failed a stage stay pending so --resume retries them
+            pending = [t['url'] for t in targets if not checkpoint.done(t['url'], "persist")]
+            if pending:
+                logger.warning(f"Run left open, {len(pending)} of {len(targets)} sources not persisted "
+                               f"(retry with --resume): {pending}")
+            else:
+                checkpoint.finish()
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Bikatsu Club AURA Engine")
     parser.add_argument("--url", type=str, help="Specific URL to crawl and process")
     parser.add_argument("--mock", action="store_true", help="Run in mock mode (no API calls)")
+    parser.add_argument("--profile", action="store_true", help="Write a sampling profile (folded stacks) for this run")
+    parser.add_argument("--crawl-concurrency", type=int, default=DEFAULT_CRAWL_CONCURRENCY, help="Pages crawled at once")
+    parser.add_argument("--generate-concurrency", type=int, default=DEFAULT_GENERATE_CONCURRENCY, help="Articles generated at once")
+    parser.add_argument("--persist-concurrency", type=int, default=DEFAULT_PERSIST_CONCURRENCY, help="Concurrent draft writers")
+    parser.add_argument("--resume", action="store_true", help="Continue the last unfinished run, skipping sources it already finished")
+    parser.add_argument("--queue-size", type=int, default=None, help="Items buffered between stages (default: 2x the next stage's concurrency)")
     args = parser.parse_args()
 
-    asyncio.run(run_pipeline(args.url, args.mock))
+    asyncio.run(run_pipeline(
+        args.url, args.mock, profile=args.profile,
+        crawl_concurrency=args.crawl_concurrency,
+        generate_concurrency=args.generate_concurrency,
+        persist_concurrency=args.persist_concurrency,
+        queue_size=args.queue_size,
+        resume=args.resume,
+    ))
@@ -0,0 +1,364 @@
+import os
+import json
+import math
+import mmap
+import heapq
+import shutil
+import logging
+import threading
+from array import array
+from collections import Counter, defaultdict
+
+from retrieval.tokenizer import tokenize
+
+logger = logging.getLogger(__name__)
+
+INDEX_DIR_ENV = "AURA_INDEX_DIR"
+DEFAULT_INDEX_DIR = "index"
+MANIFEST = "manifest.json"
+# Flushed deltas become new segments; once there are more than this many,
+# they are merged (and deleted passages dropped) into a single segment.
+MAX_SEGMENTS = 8
+# Separates a passage's heading path from its text in text.bin
+_HEADING_SEP = "\x1f"
+
+
+def index_dir():
+    return os.getenv(INDEX_DIR_ENV, DEFAULT_INDEX_DIR)
+
+
+def _mapped_array(path, typecode):
+    """Read-only view of a binary array file (memory-mapped; empty files give an empty array)."""
+    size = os.path.getsize(path)
+    if size == 0:
+        return None, array(typecode)
+    f = open(path, "rb")
+    try:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    finally:
+        f.close()
+    return mm, memoryview(mm).cast(typecode)
+
+
+class _Segment:
+    """Immutable on-disk slice of the index. Posting lists and passage text stay memory-mapped."""
+
+    FILES = {"docs.len": "I", "docs.article": "I", "postings.doc": "I", "postings.tf": "H", "text.off": "Q"}
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "lexicon.json"), encoding="utf-8") as f:
+            self.lexicon = json.load(f)
+        self._maps = []
+        views = {}
+        for name, typecode in self.FILES.items():
+            mm, view = _mapped_array(os.path.join(path, name), typecode)
+            if mm is not None:
+                self._maps.append((mm, view))
+            views[name] = view
+        self.doc_len = views["docs.len"]
+        self.doc_article = views["docs.article"]
+        self._post_doc = views["postings.doc"]
+        self._post_tf = views["postings.tf"]
+        self._text_off = views["text.off"]
+        self._text_mm, self._text = _mapped_array(os.path.join(path, "text.bin"), "B")
+        self.doc_count = len(self.doc_len)
+
+    def postings(self, term):
+        entry = self.lexicon.get(term)
+        if not entry:
+            return ()
+        start, count = entry
+        return zip(self._post_doc[start:start + count], self._post_tf[start:start + count])
+
+    def text(self, doc):
+        """(heading, content) of a passage."""
+        heading, _, content = bytes(self._text[self._text_off[doc]:self._text_off[doc + 1]]).decode("utf-8").partition(_HEADING_SEP)
+        return heading or None, content
+
+    def close(self):
+        for mm, view in self._maps:
+            view.release()
+            mm.close()
+        if self._text_mm is not None:
+            self._text.release()
+            self._text_mm.close()
+        self._maps = []
+        self._text_mm = None
+
+
+def _write_segment(path, docs, postings):
+    """
+    docs: [(article_idx, length, (heading, content))] in local doc-id order.
+    postings: {term: [(local_doc, tf), ...]} with doc ids ascending.
+    """
+    os.makedirs(path, exist_ok=True)
+    lexicon = {}
+    post_doc, post_tf = array("I"), array("H")
+    for term in sorted(postings):
+        entries = postings[term]
+        lexicon[term] = [len(post_doc), len(entries)]
+        for doc, tf in entries:
+            post_doc.append(doc)
+            post_tf.append(min(tf, 65535))
+
+    text_off = array("Q", [0])
+    with open(os.path.join(path, "text.bin"), "wb") as f:
+        for _, _, (heading, content) in docs:
+            data = f"{heading or ''}{_HEADING_SEP}{content}".encode("utf-8")
+            f.write(data)
+            text_off.append(text_off[-1] + len(data))
+
+    arrays = {
+        "docs.len": array("I", (length for _, length, _ in docs)),
+        "docs.article": array("I", (article for article, _, _ in docs)),
+        "postings.doc": post_doc,
+        "postings.tf": post_tf,
+        "text.off": text_off,
+    }
+    for name, values in arrays.items():
+        with open(os.path.join(path, name), "wb") as f:
+            values.tofile(f)
+    with open(os.path.join(path, "lexicon.json"), "w", encoding="utf-8") as f:
+        json.dump(lexicon, f, ensure_ascii=False, separators=(",", ":"))
+
+
+class BM25Index:
+    """
+    BM25 passage index over crawled_articles, stored under AURA_INDEX_DIR/bm25.
+
+    Each article is indexed as its crawler chunks (title and heading path prepended
+    to each) and tokenized with character bigrams for Japanese/Korean. New articles go to an in-memory delta
+    that is searchable immediately; `flush()` persists it as a new segment.
+    Re-adding a URL replaces the earlier version.
+
+    Thread-safe: searches and flushes run in worker threads while articles are added
+    on the event loop. One lock guards the in-memory state and is held for a whole
+    search, so segments are never closed under a reader; a compaction merges the
+    old segments outside it and only swaps the result in under it.
+    """
+
+    def __init__(self, path=None, k1=1.2, b=0.75):
+        self.path = path or os.path.join(index_dir(), "bm25")
+        self.k1 = k1
+        self.b = b
+        self._segments = []
+        self._articles = []  # {"url", "title", "source_name", "docs", "length"}
+        self._dead = set()  # article indexes that were replaced
+        self._next_segment = 1
+        self._delta_docs = []
+        self._delta_postings = defaultdict(list)
+        self._dirty = False
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()  # one flush/compaction at a time
+        self._load()
+        self._by_url = {a["url"]: i for i, a in enumerate(self._articles) if i not in self._dead}
+
+    # -- persistence ---------------------------------------------------------
+
+    def _load(self):
+        manifest_path = os.path.join(self.path, MANIFEST)
+        if not os.path.exists(manifest_path):
+            return
+        with open(manifest_path, encoding="utf-8") as f:
+            manifest = json.load(f)
+        self._articles = manifest["articles"]
+        self._dead = set(manifest["dead"])
+        self._next_segment = manifest["next_segment"]
+        self._segments = [_Segment(os.path.join(self.path, name)) for name in manifest["segments"]]
+
+    def _write_manifest(self):
+        manifest = {
+            "version": 1,
+            "segments": [os.path.basename(s.path) for s in self._segments],
+            "articles": self._articles,
+            "dead": sorted(self._dead),
+            "next_segment": self._next_segment,
+        }
+        tmp = os.path.join(self.path, MANIFEST + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False)
+        os.replace(tmp, os.path.join(self.path, MANIFEST))
+
+    def _new_segment_path(self):
+        name = f"seg-{self._next_segment:06d}"
+        self._next_segment += 1
+        return os.path.join(self.path, name)
+
+    def flush(self):
+        """Persists pending additions/replacements. Cheap when nothing changed."""
+        with self._flush_lock:
+            with self._lock:
+                if not self._dirty:
+                    return
+                os.makedirs(self.path, exist_ok=True)
+                if self._delta_docs:
+                    seg_path = self._new_segment_path()
+                    _write_segment(seg_path, self._delta_docs, self._delta_postings)
+                    self._segments.append(_Segment(seg_path))
+                    self._delta_docs = []
+                    self._delta_postings = defaultdict(list)
+                self._write_manifest()
+                self._dirty = False
+                compact = None
+                if len(self._segments) > MAX_SEGMENTS:
+                    compact = (list(self._segments), frozenset(self._dead), len(self._articles), self._new_segment_path())
+            if compact:
+                self._compact(*compact)
+
+    def _compact(self, segments, dead, article_count, seg_path):
+        """
+        Merges `segments` into one at `seg_path`, dropping the articles in `dead` and
+        renumbering. Runs without the lock (the segments are immutable); articles added
+        or replaced meanwhile are carried over when the result is swapped in.
+        """
+        article_map = {}
+        for i in range(article_count):
+            if i not in dead:
+                article_map[i] = len(article_map)
+
+        docs = []
+        doc_maps = []
+        for seg in segments:
+            remap = {}
+            for local in range(seg.doc_count):
+                art = seg.doc_article[local]
+                if art in article_map:
+                    remap[local] = len(docs)
+                    docs.append((article_map[art], seg.doc_len[local], seg.text(local)))
+            doc_maps.append(remap)
+
+        postings = defaultdict(list)
+        for seg, remap in zip(segments, doc_maps):
+            for term in seg.lexicon:
+                for doc, tf in seg.postings(term):
+                    if doc in remap:
+                        postings[term].append((remap[doc], tf))
+
+        _write_segment(seg_path, docs, postings)
+        merged = _Segment(seg_path)
+        with self._lock:
+            for i in range(article_count, len(self._articles)):
+                article_map[i] = len(article_map)
+            self._articles = [a for i, a in enumerate(self._articles) if i in article_map]
+            self._dead = {article_map[i] for i in self._dead if i in article_map}
+            self._delta_docs = [(article_map[art], length, text) for art, length, text in self._delta_docs]
+            self._segments = [merged] + self._segments[len(segments):]
+            self._by_url = {a["url"]: i for i, a in enumerate(self._articles) if i not in self._dead}
+            self._write_manifest()
+            articles = len(self._articles)
+        for seg in segments:
+            seg.close()
+            shutil.rmtree(seg.path, ignore_errors=True)
+        logger.info(f"BM25: compacted index to {len(docs)} passages / {articles} articles")
+
+    def close(self):
+        with self._lock:
+            for seg in self._segments:
+                seg.close()
+            self._segments = []
+
+    # -- updates -------------------------------------------------------------
+
+    def add_article(self, url, title, chunks, source_name=None):
+        """
+        Indexes (or re-indexes) one crawled article given its chunks (crawler/chunker.py).
+        Searchable immediately, durable after flush().
+        """
+        counted = []
+        for chunk in chunks:
+            heading = chunk.get("heading")
+            counts = Counter(tokenize(f"{title or ''}\n{heading or ''}\n{chunk['content']}"))
+            counted.append((heading, chunk["content"], counts, sum(counts.values())))
+
+        with self._lock:
+            if url in self._by_url:
+                self._dead.add(self._by_url[url])
+            article_idx = len(self._articles)
+            for heading, content, counts, length in counted:
+                doc = len(self._delta_docs)
+                self._delta_docs.append((article_idx, length, (heading, content)))
+                for term, tf in counts.items():
+                    self._delta_postings[term].append((doc, tf))
+            self._articles.append({
+                "url": url, "title": title, "source_name": source_name,
+                "docs": len(chunks), "length": sum(length for _, _, _, length in counted),
+            })
+            self._by_url[url] = article_idx
+            self._dirty = True
+
+    # -- search --------------------------------------------------------------
+
+    @property
+    def passage_count(self):
+        with self._lock:
+            return sum(a["docs"] for i, a in enumerate(self._articles) if i not in self._dead)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._articles) - len(self._dead)
+
+    def _sources(self):
+        """(doc_len(doc), doc_article(doc), postings(term), text(doc)) per slice."""
+        for seg in self._segments:
+            yield seg.doc_len.__getitem__, seg.doc_article.__getitem__, seg.postings, seg.text
+        delta = self._delta_docs
+        postings = self._delta_postings
+        yield (
+            lambda d: delta[d][1],
+            lambda d: delta[d][0],
+            lambda t: postings.get(t, ()),
+            lambda d: delta[d][2],
+        )
+
+    def search(self, queries, k=5):
+        """
+        Top-k passages for one query string or a list of alternatives (e.g. JP and KR
+        keyword), scored with BM25 over the union of their terms.
+        """
+        if isinstance(queries, str):
+            queries = [queries]
+        terms = {t for q in queries if q for t in tokenize(q)}
+        with self._lock:
+            return self._search(terms, k)
+
+    def _search(self, terms, k):
+        dead = self._dead
+        live = [a for i, a in enumerate(self._articles) if i not in dead]
+        n_docs = sum(a["docs"] for a in live)
+        if not terms or not n_docs:
+            return []
+        avgdl = max(sum(a["length"] for a in live) / n_docs, 1.0)
+        sources = list(self._sources())
+
+        scores = defaultdict(float)
+        for term in terms:
+            # Postings of replaced articles are skipped, and left out of df too
+            matches = [
+                (slot, doc, tf, doc_len(doc))
+                for slot, (doc_len, doc_article, postings, _) in enumerate(sources)
+                for doc, tf in postings(term)
+                if doc_article(doc) not in dead
+            ]
+            if not matches:
+                continue
+            df = len(matches)
+            idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+            for slot, doc, tf, length in matches:
+                norm = tf + self.k1 * (1 - self.b + self.b * length / avgdl)
+                scores[(slot, doc)] += idf * tf * (self.k1 + 1) / norm
+
+        results = []
+        for (slot, doc), score in heapq.nlargest(k, scores.items(), key=lambda kv: kv[1]):
+            _, doc_article, _, text = sources[slot]
+            article = self._articles[doc_article(doc)]
+            heading, content = text(doc)
+            results.append({
+                "title": article["title"],
+                "url": article["url"],
+                "source_name": article["source_name"],
+                "heading": heading,
+                "excerpt": content,
+                "score": round(score, 4),
+            })
+        return results
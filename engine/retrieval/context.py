@@ -0,0 +1,9 @@
+def format_learning_context(passages):
+    """RAG context block for the generation prompt: one section per retrieved passage."""
+    context_parts = []
+    for art in passages:
+        source_name = art.get('source_name') or 'Unknown Source'
+        content_preview = (art.get('excerpt') or '').replace('\n', ' ')
+        heading = f"\n- 見出し: {art['heading']}" if art.get('heading') else ""
+        context_parts.append(f"## 参考記事: {art['title']}\n- 出典: {source_name}\n- URL: {art['url']}{heading}\n- 内容抜粋: {content_preview}...")
+    return "\n\n".join(context_parts)
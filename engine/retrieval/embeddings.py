@@ -0,0 +1,140 @@
+import os
+import hashlib
+import logging
+
+import numpy as np
+
+from retrieval.tokenizer import tokenize
+
+logger = logging.getLogger(__name__)
+
+EMBEDDER_ENV = "AURA_EMBEDDER"
+GEMINI_API_BASE = os.getenv("GEMINI_API_BASE", "https://generativelanguage.googleapis.com").rstrip("/")
+
+
+def _normalize_rows(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class Embedder:
+    """
+    Maps texts to L2-normalized float32 vectors. `name` + `dim` identify a vector space;
+    `min_score` is the cosine similarity below which a passage is not treated as related.
+    """
+
+    name = "base"
+    dim = 0
+    min_score = 0.5
+
+    def embed_documents(self, texts):
+        raise NotImplementedError
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+class GeminiEmbedder(Embedder):
+    """Multilingual Gemini embeddings via the REST batchEmbedContents endpoint."""
+
+    BATCH_SIZE = 100
+    # Unrelated Japanese/Korean beauty passages score around 0.5 with gemini-embedding-001
+    min_score = 0.6
+
+    def __init__(self, model=None, dim=768, api_key=None):
+        self.model = model or os.getenv("AURA_EMBED_MODEL", "gemini-embedding-001")
+        self.dim = dim
+        self.api_key = api_key or os.getenv("GEMINI_API_KEY")
+        self.name = f"gemini:{self.model}"
+
+    def _embed(self, texts, task_type):
+        import requests
+
+        if not self.api_key:
+            raise RuntimeError("GEMINI_API_KEY is not set")
+        url = f"{GEMINI_API_BASE}/v1beta/models/{self.model}:batchEmbedContents?key={self.api_key}"
+        vectors = []
+        for start in range(0, len(texts), self.BATCH_SIZE):
+            batch = texts[start:start + self.BATCH_SIZE]
+            payload = {"requests": [{
+                "model": f"models/{self.model}",
+                "content": {"parts": [{"text": text}]},
+                "taskType": task_type,
+                "outputDimensionality": self.dim,
+            } for text in batch]}
+            response = requests.post(url, json=payload, timeout=60)
+            if response.status_code != 200:
+                raise RuntimeError(f"Embedding request failed ({response.status_code}): {response.text[:200]}")
+            vectors.extend(e["values"] for e in response.json()["embeddings"])
+        return _normalize_rows(vectors)
+
+    def embed_documents(self, texts):
+        return self._embed(texts, "RETRIEVAL_DOCUMENT")
+
+    def embed_query(self, text):
+        return self._embed([text], "RETRIEVAL_QUERY")[0]
+
+
+class LocalEmbedder(Embedder):
+    """sentence-transformers model on this machine (optional dependency)."""
+
+    # E5 similarities are compressed towards the top: unrelated passages still score ~0.75
+    min_score = 0.8
+
+    def __init__(self, model=None):
+        from sentence_transformers import SentenceTransformer
+
+        model = model or os.getenv("AURA_EMBED_MODEL", "intfloat/multilingual-e5-small")
+        self._model = SentenceTransformer(model)
+        self.dim = self._model.get_sentence_embedding_dimension()
+        self.name = f"local:{model}"
+        # E5 models are trained with these prefixes
+        self._e5 = "e5" in model
+
+    def embed_documents(self, texts):
+        if self._e5:
+            texts = [f"passage: {t}" for t in texts]
+        return self._model.encode(texts, normalize_embeddings=True, convert_to_numpy=True).astype(np.float32)
+
+    def embed_query(self, text):
+        text = f"query: {text}" if self._e5 else text
+        return self._model.encode([text], normalize_embeddings=True, convert_to_numpy=True)[0].astype(np.float32)
+
+
+class HashEmbedder(Embedder):
+    """
+    Deterministic offline stub: signed feature hashing of tokenizer terms.
+    Not cross-lingual, but stable across runs, which is what tests and benchmarks need.
+    Similarity is term overlap, so unrelated texts stay near 0.
+    """
+
+    min_score = 0.2
+
+    def __init__(self, dim=256):
+        self.dim = dim
+        self.name = f"hash:{dim}"
+
+    def embed_documents(self, texts):
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for term in tokenize(text):
+                h = int.from_bytes(hashlib.blake2b(term.encode("utf-8"), digest_size=8).digest(), "little")
+                vectors[row, h % self.dim] += 1.0 if (h >> 63) else -1.0
+        return _normalize_rows(vectors)
+
+
+def get_embedder(name=None):
+    """
+    Embedder selected by AURA_EMBEDDER (gemini | local | hash).
+    Defaults to gemini when GEMINI_API_KEY is set, else the hash stub.
+    """
+    name = (name or os.getenv(EMBEDDER_ENV) or ("gemini" if os.getenv("GEMINI_API_KEY") else "hash")).lower()
+    if name == "gemini":
+        return GeminiEmbedder()
+    if name == "local":
+        return LocalEmbedder()
+    if name == "hash":
+        return HashEmbedder()
+    raise ValueError(f"Unknown embedder: {name}")
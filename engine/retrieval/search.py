@@ -0,0 +1,107 @@
+import logging
+
+from retrieval.bm25 import BM25Index
+from retrieval.vectors import VectorIndex
+from retrieval.embeddings import get_embedder
+from crawler.chunker import chunk_text
+
+logger = logging.getLogger(__name__)
+
+RRF_K = 60
+
+
+class Retriever:
+    """
+    Hybrid passage retrieval for RAG: BM25 (exact terms) and embeddings
+    (cross-lingual matches, e.g. a Japanese keyword against Korean articles),
+    merged with reciprocal rank fusion.
+    """
+
+    def __init__(self, bm25=None, vectors=None):
+        self.bm25 = bm25 if bm25 is not None else BM25Index()
+        self.vectors = vectors if vectors is not None else VectorIndex(get_embedder())
+
+    def __len__(self):
+        return max(len(self.bm25), len(self.vectors))
+
+    def add_article(self, url, title, chunks, source_name=None):
+        """Indexes an article's crawler chunks in both indexes."""
+        self.bm25.add_article(url, title, chunks, source_name)
+        self.vectors.add_article(url, title, chunks, source_name)
+
+    def flush(self):
+        self.bm25.flush()
+        self.vectors.flush()
+
+    def search(self, query, k=5):
+        depth = k * 4
+        ranked_lists = [self.bm25.search(query, k=depth)]
+        try:
+            ranked_lists.append(self.vectors.search(query, k=depth))
+        except Exception as e:
+            logger.error(f"Vector search failed, using BM25 only: {e}")
+
+        fused = {}
+        for hits in ranked_lists:
+            for rank, hit in enumerate(hits):
+                key = (hit["url"], hit["excerpt"])
+                entry = fused.setdefault(key, dict(hit, score=0.0))
+                entry["score"] += 1.0 / (RRF_K + rank + 1)
+        results = sorted(fused.values(), key=lambda h: h["score"], reverse=True)[:k]
+        for hit in results:
+            hit["score"] = round(hit["score"], 5)
+        return results
+
+
+def iter_crawled_articles(db, page_size=500):
+    """
+    Yields (url, title, chunks, source_name) for every crawled_articles row, using the
+    stored crawled_chunks and chunking `content` for rows crawled before they existed.
+    """
+    rows = db.iter_rows(
+        "crawled_articles",
+        "title, content, url, source:sources(name), chunks:crawled_chunks(chunk_index, heading, content, start_offset, end_offset)",
+        page_size=page_size,
+        order_column="crawled_at",
+        descending=False,
+    )
+    for row in rows:
+        chunks = sorted(row.get("chunks") or [], key=lambda c: c["chunk_index"]) or chunk_text(row.get("content") or "")
+        yield row["url"], row.get("title"), chunks, (row.get("source") or {}).get("name")
+
+
+def rebuild_from_db(db, batch_size=500):
+    """Rebuilds both indexes from scratch under AURA_INDEX_DIR."""
+    import shutil
+
+    retriever = Retriever()
+    for index in (retriever.bm25, retriever.vectors):
+        shutil.rmtree(index.path, ignore_errors=True)
+    retriever = Retriever()
+    for count, article in enumerate(iter_crawled_articles(db, page_size=batch_size), start=1):
+        retriever.add_article(*article)
+        if count % batch_size == 0:
+            retriever.flush()
+    retriever.flush()
+    logger.info(f"Retrieval: rebuilt indexes with {len(retriever)} articles ({retriever.vectors.embedder.name})")
+    return retriever
+
+
+if __name__ == "__main__":
+    import argparse
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="AURA local retrieval indexes over crawled_articles")
+    parser.add_argument("--rebuild", action="store_true", help="Rebuild the BM25 and vector indexes from Supabase")
+    parser.add_argument("--query", help="Search the indexes")
+    parser.add_argument("-k", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.rebuild:
+        from utils.db import SupabaseManager
+        rebuild_from_db(SupabaseManager())
+    if args.query:
+        for hit in Retriever().search(args.query, k=args.k):
+            print(f"{hit['score']:8.5f}  {hit['title']}  {hit['url']}\n          {hit['excerpt'][:120]!r}")
@@ -0,0 +1,38 @@
+import re
+import unicodedata
+
+# Japanese/Korean/Chinese script runs are indexed as overlapping character
+# bigrams (no dictionary needed, robust to unknown product names); Latin letters
+# and digits are indexed as whole words.
+_CJK_RANGES = (
+    ("぀", "ヿ"),  # Hiragana, Katakana
+    ("ㇰ", "ㇿ"),  # Katakana phonetic extensions
+    ("㐀", "䶿"),  # CJK extension A
+    ("一", "鿿"),  # CJK unified ideographs
+    ("가", "힯"),  # Hangul syllables
+    ("ᄀ", "ᇿ"),  # Hangul jamo
+    ("㄰", "㆏"),  # Hangul compatibility jamo
+)
+_CJK_RUN_RE = re.compile("[" + "".join(f"{lo}-{hi}" for lo, hi in _CJK_RANGES) + "]+")
+_WORD_RE = re.compile(r"[0-9a-z]+(?:[-'][0-9a-z]+)*")
+
+
+def normalize(text):
+    return unicodedata.normalize("NFKC", text or "").lower()
+
+
+def tokenize(text):
+    """Returns index terms for `text` (with repeats, so callers can count term frequency)."""
+    text = normalize(text)
+    tokens = []
+    pos = 0
+    for match in _CJK_RUN_RE.finditer(text):
+        tokens.extend(_WORD_RE.findall(text, pos, match.start()))
+        run = match.group()
+        if len(run) == 1:
+            tokens.append(run)
+        else:
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+        pos = match.end()
+    tokens.extend(_WORD_RE.findall(text, pos))
+    return tokens
@@ -0,0 +1,381 @@
+import os
+import json
+import shutil
+import logging
+import threading
+
+import numpy as np
+
+from retrieval.bm25 import index_dir
+
+logger = logging.getLogger(__name__)
+
+# Brute force is exact and fast enough below this; above it an IVF
+# (inverted file over k-means centroids) index is trained.
+IVF_MIN_VECTORS = 4096
+EMBED_BATCH = 64
+# Overrides the embedder's min_score (cosine floor for a passage to count as a hit)
+MIN_SCORE_ENV = "AURA_VECTOR_MIN_SCORE"
+# Replaced articles' rows are compacted away once they are this share of the index
+MAX_DEAD_RATIO = 0.25
+# Per-segment files; a segment holds a contiguous run of rows and is never modified
+SEGMENT_ARRAYS = ("codes.npy", "scales.npy", "doc_article.npy", "assign.npy")
+
+
+def _dequantize(codes, scales):
+    return codes.astype(np.float32) * scales[:, None]
+
+
+def _write_segment(path, codes, scales, doc_article, assign, passages):
+    os.makedirs(path, exist_ok=True)
+    for name, values in zip(SEGMENT_ARRAYS, (codes, scales, doc_article, assign)):
+        with open(os.path.join(path, name), "wb") as f:
+            np.save(f, values)
+    with open(os.path.join(path, "passages.json"), "w", encoding="utf-8") as f:
+        json.dump(passages, f, ensure_ascii=False)
+
+
+def _read_segment(path):
+    arrays = [np.load(os.path.join(path, name)) for name in SEGMENT_ARRAYS]
+    with open(os.path.join(path, "passages.json"), encoding="utf-8") as f:
+        return arrays + [json.load(f)]
+
+
+def _kmeans(vectors, nlist, iterations=10, seed=0):
+    """Spherical k-means on normalized vectors; returns (nlist, dim) centroids."""
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), nlist, replace=False)].copy()
+    for _ in range(iterations):
+        assign = np.argmax(vectors @ centroids.T, axis=1)
+        for c in range(nlist):
+            members = vectors[assign == c]
+            if len(members):
+                centroid = members.sum(axis=0)
+                centroids[c] = centroid / (np.linalg.norm(centroid) or 1.0)
+    return centroids
+
+
+class VectorIndex:
+    """
+    Embedding index over crawled-article passages, stored under AURA_INDEX_DIR/vectors.
+
+    Vectors are kept as int8 (per-row scale) or float16 codes. Small indexes are
+    searched exhaustively; from IVF_MIN_VECTORS on, vectors are bucketed by their
+    nearest k-means centroid and a query only scores the `nprobe` closest buckets.
+    Added articles are embedded and become searchable on `flush()`. Passages below
+    `min_score` cosine similarity are never returned, so an unrelated keyword gets
+    no hits instead of the k nearest passages.
+
+    On disk the rows are split into immutable segments: a flush writes only its new
+    rows as a segment, and trailing segments are merged once the newest is as large
+    as the one before it, so each row is rewritten O(log n) times. The whole index is
+    rewritten only when IVF is (re)trained or replaced articles pass MAX_DEAD_RATIO
+    of the rows (compaction). One lock guards the in-memory state against searches
+    and flushes in worker threads; embedding and file writes happen outside it.
+    """
+
+    def __init__(self, embedder, path=None, dtype="int8", nprobe=8, min_score=None):
+        if dtype not in ("int8", "float16"):
+            raise ValueError(f"Unsupported vector dtype: {dtype}")
+        self.embedder = embedder
+        self.path = path or os.path.join(index_dir(), "vectors")
+        self.dtype = dtype
+        self.nprobe = nprobe
+        if min_score is None:
+            min_score = float(os.getenv(MIN_SCORE_ENV, embedder.min_score))
+        self.min_score = min_score
+        self._articles = []  # {"url", "title", "source_name", "docs"}
+        self._dead = set()
+        self._passages = []  # [heading, content] per vector row
+        self._codes = np.zeros((0, embedder.dim), dtype=np.int8 if dtype == "int8" else np.float16)
+        self._scales = np.zeros(0, dtype=np.float32)
+        self._doc_article = np.zeros(0, dtype=np.int32)
+        self._centroids = None
+        self._assign = np.zeros(0, dtype=np.int32)
+        self._trained_size = 0
+        self._lists = None
+        self._segments = []  # [[name, rows]] in row order
+        self._next_segment = 1
+        self._rewrite = False  # loaded from the single-file (version 1) layout
+        self._pending = []  # (article_idx, [heading, content], text to embed)
+        self._dirty = False
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()  # one flush at a time
+        self._load()
+        self._by_url = {a["url"]: i for i, a in enumerate(self._articles) if i not in self._dead}
+
+    # -- persistence ---------------------------------------------------------
+
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    def _load(self):
+        if not os.path.exists(self._file("meta.json")):
+            return
+        with open(self._file("meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta["embedder"] != self.embedder.name or meta["dim"] != self.embedder.dim or meta["dtype"] != self.dtype:
+            logger.warning(
+                f"Vector index at {self.path} was built with {meta['embedder']}/{meta['dim']}/{meta['dtype']}; "
+                f"ignoring it (rebuild for {self.embedder.name})"
+            )
+            return
+        self._articles = meta["articles"]
+        self._dead = set(meta["dead"])
+        self._trained_size = meta["trained_size"]
+        if os.path.exists(self._file("centroids.npy")):
+            self._centroids = np.load(self._file("centroids.npy"))
+        if meta["version"] == 1:
+            with open(self._file("passages.json"), encoding="utf-8") as f:
+                self._passages = json.load(f)
+            self._codes, self._scales, self._doc_article, self._assign = (
+                np.load(self._file(name)) for name in SEGMENT_ARRAYS
+            )
+            # Rewritten as segments by the next flush
+            self._rewrite = self._dirty = True
+            return
+        self._segments = meta["segments"]
+        self._next_segment = meta["next_segment"]
+        if self._segments:
+            parts = [_read_segment(self._file(name)) for name, _ in self._segments]
+            self._codes, self._scales, self._doc_article, self._assign = (
+                np.concatenate([part[i] for part in parts]) for i in range(4)
+            )
+            self._passages = [passage for part in parts for passage in part[4]]
+
+    def _write_meta(self):
+        """Switches the index on disk to the current segments. Called with the lock held."""
+        meta = {
+            "version": 2,
+            "embedder": self.embedder.name,
+            "dim": self.embedder.dim,
+            "dtype": self.dtype,
+            "trained_size": self._trained_size,
+            "segments": self._segments,
+            "next_segment": self._next_segment,
+            "articles": self._articles,
+            "dead": sorted(self._dead),
+        }
+        with open(self._file("meta.json.tmp"), "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(self._file("meta.json.tmp"), self._file("meta.json"))
+
+    def _write_rows(self, start, end, codes, scales, doc_article, assign, passages):
+        """Writes rows [start, end) as a new segment; returns its [name, rows] entry."""
+        name = f"seg-{self._next_segment:06d}"
+        self._next_segment += 1
+        _write_segment(self._file(name), codes[start:end], scales[start:end], doc_article[start:end],
+                       assign[start:end], passages[start:end])
+        return [name, end - start]
+
+    def _remove_unused(self):
+        """Deletes segment directories (and version 1 files) the current meta.json does not list."""
+        used = {name for name, _ in self._segments}
+        for name in os.listdir(self.path):
+            if name.startswith("seg-") and name not in used:
+                shutil.rmtree(self._file(name), ignore_errors=True)
+            elif name in SEGMENT_ARRAYS or name == "passages.json":
+                os.remove(self._file(name))
+
+    # -- updates -------------------------------------------------------------
+
+    def add_article(self, url, title, chunks, source_name=None):
+        """Queues an article's chunks for embedding; replaces an earlier version of the URL."""
+        with self._lock:
+            if url in self._by_url:
+                self._dead.add(self._by_url[url])
+            article_idx = len(self._articles)
+            self._articles.append({"url": url, "title": title, "source_name": source_name, "docs": len(chunks)})
+            self._by_url[url] = article_idx
+            for chunk in chunks:
+                heading = chunk.get("heading")
+                text = f"{title or ''}\n{heading or ''}\n{chunk['content']}"
+                self._pending.append((article_idx, [heading, chunk["content"]], text))
+            self._dirty = True
+
+    def _quantize(self, vectors):
+        if self.dtype == "float16":
+            return vectors.astype(np.float16), np.ones(len(vectors), dtype=np.float32)
+        scales = np.abs(vectors).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        codes = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+        return codes, scales.astype(np.float32)
+
+    def flush(self):
+        """Embeds queued passages (remote call for the Gemini embedder) and persists the new rows."""
+        with self._flush_lock:
+            with self._lock:
+                if not self._dirty:
+                    return
+                pending, self._pending = self._pending, []
+                self._dirty = False
+            batches = []
+            try:
+                for start in range(0, len(pending), EMBED_BATCH):
+                    batch = pending[start:start + EMBED_BATCH]
+                    try:
+                        vectors = self.embedder.embed_documents([text for _, _, text in batch])
+                    except Exception:
+                        # Keep what was not embedded for the next flush
+                        with self._lock:
+                            self._pending = pending[start:] + self._pending
+                            self._dirty = True
+                        raise
+                    codes, scales = self._quantize(vectors)
+                    batches.append((codes, scales, np.array([a for a, _, _ in batch], dtype=np.int32),
+                                    [passage for _, passage, _ in batch]))
+            finally:
+                self._append(batches)
+
+            with self._lock:
+                dead_rows = sum(self._articles[i]["docs"] for i in self._dead)
+            if dead_rows and dead_rows >= MAX_DEAD_RATIO * len(self._codes):
+                self._compact()
+
+    def _append(self, batches):
+        """
+        Adds embedded batches as a new segment (merging trailing segments of similar
+        size) and swaps the result in. Only flush() changes the row arrays, so they
+        are built from the current ones without holding the lock.
+        """
+        os.makedirs(self.path, exist_ok=True)
+        start = len(self._codes)
+        codes = np.concatenate([self._codes] + [b[0] for b in batches])
+        scales = np.concatenate([self._scales] + [b[1] for b in batches])
+        doc_article = np.concatenate([self._doc_article] + [b[2] for b in batches])
+        passages = self._passages + [passage for b in batches for passage in b[3]]
+        n = len(codes)
+
+        centroids, trained_size, rewrite = self._centroids, self._trained_size, self._rewrite
+        if n >= IVF_MIN_VECTORS and n >= 2 * trained_size:
+            centroids, assign = self._train(codes, scales)
+            trained_size, rewrite = n, True
+            with open(self._file("centroids.npy.tmp"), "wb") as f:
+                np.save(f, centroids)
+            os.replace(self._file("centroids.npy.tmp"), self._file("centroids.npy"))
+        elif centroids is not None:
+            assign = np.concatenate([self._assign, self._nearest_centroid(_dequantize(codes[start:], scales[start:]), centroids)])
+        else:
+            assign = np.zeros(n, dtype=np.int32)
+
+        rows = (codes, scales, doc_article, assign, passages)
+        if rewrite:
+            segments = [self._write_rows(0, n, *rows)] if n else []
+        else:
+            segments = list(self._segments)
+            if n > start:
+                segments.append(self._write_rows(start, n, *rows))
+            while len(segments) > 1 and segments[-2][1] <= segments[-1][1]:
+                merged_start = n - segments[-1][1] - segments[-2][1]
+                segments[-2:] = [self._write_rows(merged_start, n, *rows)]
+
+        with self._lock:
+            self._codes, self._scales, self._doc_article, self._assign, self._passages = rows
+            self._centroids, self._trained_size, self._rewrite = centroids, trained_size, False
+            self._segments = segments
+            self._lists = None
+            self._write_meta()
+        self._remove_unused()
+
+    def _compact(self):
+        """Rewrites the index without replaced articles' rows, renumbering the articles."""
+        with self._lock:
+            dead = sorted(self._dead)
+            article_count = len(self._articles)
+        article_map = np.full(article_count, -1, dtype=np.int64)
+        live = np.setdiff1d(np.arange(article_count), dead)
+        article_map[live] = np.arange(len(live))
+        keep = article_map[self._doc_article] >= 0
+        rows = (
+            self._codes[keep], self._scales[keep], article_map[self._doc_article[keep]].astype(np.int32),
+            self._assign[keep], [passage for passage, kept in zip(self._passages, keep) if kept],
+        )
+        n = len(rows[0])
+        segments = [self._write_rows(0, n, *rows)] if n else []
+
+        with self._lock:
+            # Articles added (or replaced) while rewriting keep their place after the live ones
+            remap = {int(old): new for new, old in enumerate(live)}
+            for i in range(article_count, len(self._articles)):
+                remap[i] = len(remap)
+            # Queued passages of articles replaced before they were embedded are dropped
+            self._pending = [(remap[a], passage, text) for a, passage, text in self._pending if a in remap]
+            self._articles = [a for i, a in enumerate(self._articles) if i in remap]
+            self._dead = {remap[i] for i in self._dead if i in remap}
+            self._by_url = {a["url"]: i for i, a in enumerate(self._articles) if i not in self._dead}
+            self._codes, self._scales, self._doc_article, self._assign, self._passages = rows
+            self._segments = segments
+            self._lists = None
+            self._write_meta()
+        self._remove_unused()
+        logger.info(f"Vectors: compacted index to {n} vectors / {len(live)} articles")
+
+    def _nearest_centroid(self, vectors, centroids):
+        return np.argmax(vectors @ centroids.T, axis=1).astype(np.int32)
+
+    def _train(self, codes, scales):
+        """Trains IVF centroids on a sample; returns (centroids, assignment of every row)."""
+        n = len(codes)
+        nlist = max(16, int(np.sqrt(n)))
+        rng = np.random.default_rng(0)
+        sample = np.sort(rng.choice(n, min(n, nlist * 64), replace=False))
+        centroids = _kmeans(_dequantize(codes[sample], scales[sample]), nlist).astype(np.float32)
+        assign = np.concatenate([
+            self._nearest_centroid(_dequantize(codes[start:start + 8192], scales[start:start + 8192]), centroids)
+            for start in range(0, n, 8192)
+        ])
+        logger.info(f"Vectors: trained IVF with {nlist} lists over {n} vectors")
+        return centroids, assign
+
+    # -- search --------------------------------------------------------------
+
+    def __len__(self):
+        with self._lock:
+            return len(self._articles) - len(self._dead)
+
+    def _candidate_rows(self, query):
+        if self._centroids is None:
+            return np.arange(len(self._codes))
+        if self._lists is None:
+            order = np.argsort(self._assign, kind="stable")
+            bounds = np.searchsorted(self._assign[order], np.arange(len(self._centroids) + 1))
+            self._lists = (order, bounds)
+        order, bounds = self._lists
+        probe = np.argsort(-(self._centroids @ query))[:self.nprobe]
+        return np.concatenate([order[bounds[c]:bounds[c + 1]] for c in probe])
+
+    def search(self, query, k=5):
+        """Top-k passages by cosine similarity to the embedded query."""
+        if not len(self._codes) or not query:
+            return []
+        q = np.asarray(self.embedder.embed_query(query), dtype=np.float32)
+        with self._lock:
+            return self._search(q, k)
+
+    def _search(self, q, k):
+        rows = self._candidate_rows(q)
+        if self._dead:
+            rows = rows[~np.isin(self._doc_article[rows], list(self._dead))]
+        if not len(rows):
+            return []
+        scores = (self._codes[rows].astype(np.float32) @ q) * self._scales[rows]
+        related = scores >= self.min_score
+        rows, scores = rows[related], scores[related]
+        if not len(rows):
+            return []
+        top = np.argpartition(-scores, min(k, len(rows)) - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        results = []
+        for i in top:
+            row = int(rows[i])
+            article = self._articles[int(self._doc_article[row])]
+            heading, content = self._passages[row]
+            results.append({
+                "title": article["title"],
+                "url": article["url"],
+                "source_name": article["source_name"],
+                "heading": heading,
+                "excerpt": content,
+                "score": round(float(scores[i]), 4),
+            })
+        return results
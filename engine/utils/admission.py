@@ -0,0 +1,200 @@
+import os
+import time
+import math
+import asyncio
+import logging
+from collections import deque, defaultdict
+
+logger = logging.getLogger(__name__)
+
+
+def _env_int(name, default):
+    try:
+        return int(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+class AdmissionRejected(Exception):
+    """Raised when a job type is saturated. `retry_after` is in whole seconds."""
+
+    def __init__(self, job_type, reason, retry_after):
+        super().__init__(f"{job_type}: {reason}")
+        self.job_type = job_type
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class Ticket:
+    __slots__ = ("client_id", "admitted_at")
+
+    def __init__(self, client_id):
+        self.client_id = client_id
+        self.admitted_at = time.monotonic()
+
+
+class AdmissionController:
+    """
+    Bounded admission for one job type.
+
+    - At most `max_queue_depth` jobs may be admitted but not finished; beyond that
+      `admit` raises AdmissionRejected with a Retry-After estimate.
+    - A single client may hold at most `max_per_client` of those slots.
+    - At most `max_concurrency` jobs run at once; waiting jobs are started
+      round-robin across clients so one caller's burst cannot starve others.
+    """
+
+    def __init__(self, job_type, max_queue_depth, max_concurrency, max_per_client=None):
+        self.job_type = job_type
+        self.max_queue_depth = max_queue_depth
+        self.max_concurrency = max_concurrency
+        self.max_per_client = max_per_client or max_queue_depth
+        self.running = 0
+        self.outstanding = defaultdict(int)  # client_id -> admitted, not yet finished
+        self._waiters = defaultdict(deque)  # client_id -> futures waiting for a run slot
+        self._rotation = deque()  # clients with waiters, in round-robin order
+        self._avg_run_seconds = None
+        self._waits = deque(maxlen=500)
+        self._tasks = set()  # spawned jobs, referenced until they finish
+        self.admitted_total = 0
+        self.rejected_total = 0
+
+    @classmethod
+    def from_env(cls, job_type, max_queue_depth, max_concurrency, max_per_client=None):
+        """Reads AURA_<TYPE>_MAX_QUEUE / _MAX_CONCURRENCY / _MAX_PER_CLIENT overrides."""
+        prefix = f"AURA_{job_type.upper()}"
+        max_queue_depth = _env_int(f"{prefix}_MAX_QUEUE", max_queue_depth)
+        return cls(
+            job_type,
+            max_queue_depth=max_queue_depth,
+            max_concurrency=_env_int(f"{prefix}_MAX_CONCURRENCY", max_concurrency),
+            max_per_client=_env_int(f"{prefix}_MAX_PER_CLIENT", max_per_client or max_queue_depth),
+        )
+
+    @property
+    def depth(self):
+        return sum(self.outstanding.values())
+
+    def retry_after(self):
+        """Rough seconds until a slot frees up, from the average job run time."""
+        avg = self._avg_run_seconds or 30.0
+        waves = max(1, math.ceil((self.depth - self.max_concurrency + 1) / max(self.max_concurrency, 1)))
+        return max(1, int(avg * waves))
+
+    def ensure_capacity(self, client_id, count=1):
+        """Raises AdmissionRejected if `count` more jobs would not be admitted (reserves nothing)."""
+        if self.depth + count > self.max_queue_depth:
+            self.rejected_total += 1
+            raise AdmissionRejected(self.job_type, "queue is full", self.retry_after())
+        if self.outstanding.get(client_id, 0) + count > self.max_per_client:
+            self.rejected_total += 1
+            raise AdmissionRejected(self.job_type, "per-client limit reached", self.retry_after())
+
+    def admit(self, client_id, count=1):
+        """Reserves `count` slots for a client or raises AdmissionRejected."""
+        self.ensure_capacity(client_id, count)
+        self.outstanding[client_id] += count
+        self.admitted_total += count
+        return [Ticket(client_id) for _ in range(count)]
+
+    async def _acquire(self, ticket):
+        if self.running < self.max_concurrency and not self._rotation:
+            self.running += 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        if not self._waiters[ticket.client_id]:
+            self._rotation.append(ticket.client_id)
+        self._waiters[ticket.client_id].append(future)
+        try:
+            await future  # slot is handed over by _release, running already counted
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Cancelled after the slot was handed over: pass it on
+                self._release()
+            else:
+                self._forget_waiter(ticket.client_id, future)
+            raise
+
+    def _forget_waiter(self, client_id, future):
+        waiters = self._waiters.get(client_id)
+        if waiters and future in waiters:
+            waiters.remove(future)
+            if not waiters:
+                del self._waiters[client_id]
+                self._rotation.remove(client_id)
+
+    def _release(self):
+        while self._rotation:
+            client_id = self._rotation.popleft()
+            waiters = self._waiters[client_id]
+            future = waiters.popleft()
+            if waiters:
+                self._rotation.append(client_id)
+            else:
+                del self._waiters[client_id]
+            if not future.done():
+                future.set_result(None)
+                return
+        self.running -= 1
+
+    def _finish(self, ticket):
+        """Frees the admission slot held by `ticket`."""
+        self.outstanding[ticket.client_id] -= 1
+        if self.outstanding[ticket.client_id] <= 0:
+            del self.outstanding[ticket.client_id]
+
+    async def run(self, ticket, func, *args, **kwargs):
+        """Waits for a run slot, then awaits `func(*args, **kwargs)`. The ticket's slot is freed however it ends."""
+        try:
+            await self._acquire(ticket)
+        except BaseException:
+            self._finish(ticket)
+            raise
+        waited = time.monotonic() - ticket.admitted_at
+        self._waits.append(waited)
+        if waited > 1:
+            logger.info(f"Admission[{self.job_type}]: job started after {waited:.1f}s in queue")
+        started = time.monotonic()
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            elapsed = time.monotonic() - started
+            self._avg_run_seconds = elapsed if self._avg_run_seconds is None else 0.8 * self._avg_run_seconds + 0.2 * elapsed
+            self._finish(ticket)
+            self._release()
+
+    def spawn(self, ticket, func, *args, **kwargs):
+        """
+        Runs `func` for `ticket` as its own task (see run). Unlike chained
+        BackgroundTasks, one failing job cannot keep the others from running and
+        releasing their slots; failures are logged.
+        """
+        task = asyncio.ensure_future(self.run(ticket, func, *args, **kwargs))
+        self._tasks.add(task)
+        task.add_done_callback(self._task_done)
+        return task
+
+    def _task_done(self, task):
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception():
+            logger.error(f"Admission[{self.job_type}]: job failed: {task.exception()!r}")
+
+    def stats(self):
+        waits = sorted(self._waits)
+
+        def pct(p):
+            return round(waits[min(len(waits) - 1, int(p * len(waits)))], 3) if waits else 0.0
+
+        return {
+            "job_type": self.job_type,
+            "depth": self.depth,
+            "running": self.running,
+            "max_queue_depth": self.max_queue_depth,
+            "max_concurrency": self.max_concurrency,
+            "max_per_client": self.max_per_client,
+            "clients": len(self.outstanding),
+            "admitted_total": self.admitted_total,
+            "rejected_total": self.rejected_total,
+            "queue_wait_seconds": {"p50": pct(0.5), "p95": pct(0.95), "max": round(waits[-1], 3) if waits else 0.0},
+            "avg_run_seconds": round(self._avg_run_seconds or 0.0, 3),
+        }
@@ -0,0 +1,252 @@
+import asyncio
+import inspect
+
+from utils.db import (
+    BULK_BATCH_SIZE, PAGE_SIZE, ARTICLE_LIST_COLUMNS, SOURCE_COLUMNS, EXTRACTION_TEMPLATE_COLUMNS,
+    BulkResult, CategoryCache, Sleep, supabase_credentials, dedupe_by_url,
+    bulk_plan, replace_crawled_chunks_plan, categories_plan, get_or_create_category_plan, fetch_page_plan,
+    recent_articles_plan, search_crawled_articles_plan, search_crawled_chunks_plan,
+)
+from utils.storage import ImageUploader, upload_options
+
+
+async def run_plan_async(plan):
+    """Drives a query plan (see utils.db.run_plan) with awaited execute() calls."""
+    reply, error = None, None
+    while True:
+        try:
+            step = plan.throw(error) if error else plan.send(reply)
+        except StopIteration as done:
+            return done.value
+        reply, error = None, None
+        try:
+            if isinstance(step, Sleep):
+                await asyncio.sleep(step.seconds)
+            else:
+                reply = await step.execute()
+        except Exception as e:
+            error = e
+
+
+class AsyncWriteBuffer:
+    """
+    Async WriteBuffer: flushes at `batch_size` rows, or `max_delay` seconds after the
+    first buffered row via a timer on the event loop. `on_flush` may be sync or async.
+    """
+
+    def __init__(self, write, batch_size=BULK_BATCH_SIZE, max_delay=10.0, on_flush=None):
+        self.write = write
+        self.batch_size = batch_size
+        self.max_delay = max_delay
+        self.on_flush = on_flush
+        self.result = BulkResult()
+        self._rows = []
+        self._timer = None
+        self._flushes = set()
+
+    async def add(self, row):
+        self._rows.append(row)
+        if len(self._rows) >= self.batch_size:
+            await self.flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.max_delay, self._flush_later)
+
+    def _flush_later(self):
+        self._timer = None
+        task = asyncio.ensure_future(self.flush())
+        self._flushes.add(task)
+        task.add_done_callback(self._flushes.discard)
+
+    async def flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._rows:
+            return None
+        rows, self._rows = self._rows, []
+        result = await self.write(rows, batch_size=self.batch_size)
+        self.result.merge(result)
+        if self.on_flush:
+            outcome = self.on_flush(result)
+            if inspect.isawaitable(outcome):
+                await outcome
+        return result
+
+    async def close(self):
+        """Flushes what is buffered and waits for timer-triggered flushes."""
+        await self.flush()
+        if self._flushes:
+            await asyncio.gather(*self._flushes, return_exceptions=True)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+        return False
+
+
+class AsyncSupabaseManager:
+    """
+    Async counterpart of SupabaseManager for the API and its background jobs.
+    Uses supabase's AsyncClient (httpx, keep-alive connection pool), so DB calls
+    do not block the event loop. Create with `await AsyncSupabaseManager.create()`.
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self.categories = CategoryCache()
+        self._uploaders = {}
+
+    @classmethod
+    async def create(cls):
+        url, key = supabase_credentials()
+        # Imported here: the supabase package pulls in httpx/postgrest/storage/realtime
+        from supabase import acreate_client
+        return cls(await acreate_client(url, key))
+
+    async def insert_article(self, article_data):
+        """Inserts a new article draft."""
+        return await self.client.table("articles").insert(article_data).execute()
+
+    async def get_sources(self, columns=SOURCE_COLUMNS):
+        """Retrieves active sources."""
+        return await self.client.table("sources").select(columns).eq("is_active", True).execute()
+
+    async def get_categories(self, refresh=False):
+        """Categories (id, name, slug), cached for CATEGORY_CACHE_TTL seconds."""
+        return await run_plan_async(categories_plan(self.client, self.categories, refresh))
+
+    async def fetch_articles_by_status(self, status='draft'):
+        """Fetches articles by status."""
+        return await self.client.table("articles").select("*").eq("status", status).execute()
+
+    async def fetch_page(self, table, columns, filters=None, page_size=PAGE_SIZE, cursor=None, order_column="created_at", descending=True):
+        """One keyset page of `table` ordered by (order_column, id): (rows, next_cursor)."""
+        return await run_plan_async(fetch_page_plan(self.client, table, columns, filters, page_size, cursor, order_column, descending))
+
+    async def iter_rows(self, table, columns, filters=None, page_size=PAGE_SIZE, order_column="created_at", descending=True):
+        """
+        Async iterator over every matching row. The next page is fetched while the
+        caller consumes the current one, so at most two pages are held in memory.
+        """
+        rows, cursor = await self.fetch_page(table, columns, filters, page_size, None, order_column, descending)
+        while True:
+            prefetch = None
+            if cursor is not None:
+                prefetch = asyncio.ensure_future(self.fetch_page(table, columns, filters, page_size, cursor, order_column, descending))
+            try:
+                for row in rows:
+                    yield row
+            except BaseException:
+                if prefetch:
+                    prefetch.cancel()
+                raise
+            if prefetch is None:
+                return
+            rows, cursor = await prefetch
+
+    def iter_articles(self, status=None, columns=ARTICLE_LIST_COLUMNS, page_size=PAGE_SIZE):
+        """`async for` over all articles (optionally with `status`), newest first."""
+        return self.iter_rows("articles", columns, {"status": status} if status else None, page_size)
+
+    def iter_sources(self, active_only=True, columns=SOURCE_COLUMNS, page_size=PAGE_SIZE):
+        """`async for` over all (active) sources, newest first."""
+        return self.iter_rows("sources", columns, {"is_active": True} if active_only else None, page_size)
+
+    async def find_recent_articles_by_keywords(self, normalized_keywords, since_iso):
+        """Returns {keyword_normalized: newest article} for articles created since `since_iso`."""
+        return await run_plan_async(recent_articles_plan(self.client, normalized_keywords, since_iso))
+
+    async def search_crawled_articles(self, keywords, limit=5, excerpt_chars=2000):
+        """Ranked search_crawled_articles RPC, falling back to the ILIKE scan."""
+        return await run_plan_async(search_crawled_articles_plan(self.client, keywords, limit, excerpt_chars))
+
+    async def save_crawled_chunks(self, article_id, chunks):
+        """Replaces the stored passages of one crawled article."""
+        return await self.replace_crawled_chunks({article_id: chunks})
+
+    async def replace_crawled_chunks(self, chunks_by_article, batch_size=500):
+        """Replaces the passages of many crawled articles: one delete, then batched inserts."""
+        return await run_plan_async(replace_crawled_chunks_plan(self.client, chunks_by_article, batch_size))
+
+    async def search_crawled_chunks(self, keywords, limit=5, per_article=2):
+        """Best passages via the search_crawled_chunks RPC, falling back to article excerpts."""
+        return await run_plan_async(search_crawled_chunks_plan(self.client, keywords, limit, per_article))
+
+    async def _bulk(self, rows, send, batch_size):
+        """bulk_plan with awaited requests; `send(part)` builds the request for one batch."""
+        return await run_plan_async(bulk_plan(rows, send, batch_size))
+
+    async def bulk_upsert_crawled(self, rows, batch_size=BULK_BATCH_SIZE):
+        """Upserts crawled_articles rows on url (last row wins for duplicate urls in one call)."""
+        return await self._bulk(
+            dedupe_by_url(rows),
+            lambda part: self.client.table("crawled_articles").upsert(part, on_conflict="url"),
+            batch_size,
+        )
+
+    async def bulk_record_source_crawls(self, crawls, batch_size=BULK_BATCH_SIZE):
+        """
+        Stores crawl observations from CrawlScheduler.observe / observe_failure
+        (last_crawled_at, content hash, change history, failure count, next_crawl_at)
+        with one record_source_crawls RPC per batch.
+        """
+        return await self._bulk(
+            list({c["id"]: c for c in crawls}.values()),
+            lambda part: self.client.rpc("record_source_crawls", {"crawls": part}),
+            batch_size,
+        )
+
+    async def get_extraction_templates(self, domains):
+        """Stored extraction templates for `domains` (crawler/templates.py)."""
+        return await self.client.table("extraction_templates").select(EXTRACTION_TEMPLATE_COLUMNS).in_("domain", sorted(set(domains))).execute()
+
+    async def bulk_upsert_extraction_templates(self, rows, batch_size=BULK_BATCH_SIZE):
+        """Upserts extraction_templates rows (ExtractionTemplates.pop_changes) on domain."""
+        return await self._bulk(
+            rows,
+            lambda part: self.client.table("extraction_templates").upsert(part, on_conflict="domain"),
+            batch_size,
+        )
+
+    async def bulk_insert_articles(self, rows, batch_size=BULK_BATCH_SIZE):
+        """Inserts article drafts in batches."""
+        return await self._bulk(rows, lambda part: self.client.table("articles").insert(part), batch_size)
+
+    def write_buffer(self, write, batch_size=BULK_BATCH_SIZE, max_delay=10.0, on_flush=None):
+        """AsyncWriteBuffer around one of the bulk_* methods."""
+        return AsyncWriteBuffer(write, batch_size=batch_size, max_delay=max_delay, on_flush=on_flush)
+
+    async def update_article_status(self, article_id, status):
+        """Updates article status."""
+        return await self.client.table("articles").update({"status": status}).eq("id", article_id).execute()
+
+    def invalidate_categories(self):
+        """Drops the category cache; the next read refetches it."""
+        self.categories.invalidate()
+
+    async def get_or_create_category(self, name):
+        """Category id for `name` from the cache, else one get_or_create_category RPC (get_or_create_category_plan)."""
+        return await run_plan_async(get_or_create_category_plan(self.client, self.categories, name))
+
+    def uploader(self, bucket='images'):
+        """Shared bounded, retrying ImageUploader for a bucket."""
+        if bucket not in self._uploaders:
+            self._uploaders[bucket] = ImageUploader(self.client.storage, bucket)
+        return self._uploaders[bucket]
+
+    async def upload_image(self, file_bytes, filename=None, bucket='images', content_type="image/png"):
+        """
+        Uploads an image and returns the public URL. Without a filename the bytes go
+        through the content-addressed ImageUploader (dedupe, retry, immutable caching).
+        """
+        try:
+            if filename is None:
+                return await self.uploader(bucket).upload(file_bytes, content_type, content_type.split("/")[-1])
+            storage = self.client.storage.from_(bucket)
+            await storage.upload(path=filename, file=file_bytes, file_options=upload_options(content_type))
+            return await storage.get_public_url(filename)
+        except Exception as e:
+            print(f"Error uploading image to Supabase: {e}")
+            return None
@@ -0,0 +1,100 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import logging
+
+logger = logging.getLogger(__name__)
+
+RETENTION_DAYS = 14
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+  run_id text PRIMARY KEY,
+  job text NOT NULL,
+  started_at real NOT NULL,
+  finished_at real
+);
+CREATE INDEX IF NOT EXISTS runs_job_started_at_idx ON runs (job, started_at);
+CREATE TABLE IF NOT EXISTS steps (
+  run_id text NOT NULL REFERENCES runs(run_id) ON DELETE CASCADE,
+  item text NOT NULL,
+  stage text NOT NULL,
+  payload text,
+  done_at real NOT NULL,
+  PRIMARY KEY (run_id, item, stage)
+);
+"""
+
+
+def checkpoint_path():
+    return os.getenv("AURA_CHECKPOINT_DB", "checkpoints.db")
+
+
+class RunCheckpoint:
+    """
+    Per-item stage completion for one run of a job ("pipeline", "media_crawl"), kept
+    in a local SQLite file so a run that died halfway can be resumed. A stage may
+    store a JSON payload (e.g. crawled page, generated draft) so resuming continues
+    from it instead of redoing the stage.
+    """
+
+    def __init__(self, job, resume=False, path=None):
+        self.job = job
+        self.conn = sqlite3.connect(path or checkpoint_path(), check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA foreign_keys=ON")
+        self.conn.executescript(SCHEMA)
+        self._prune()
+
+        self.run_id = self._latest_unfinished() if resume else None
+        self.resumed = self.run_id is not None
+        if not self.resumed:
+            if resume:
+                logger.info(f"No unfinished {job} run to resume; starting a new one")
+            self.run_id = uuid.uuid4().hex
+            self.conn.execute("INSERT INTO runs (run_id, job, started_at) VALUES (?, ?, ?)", (self.run_id, job, time.time()))
+        self._done = {
+            (item, stage): payload
+            for item, stage, payload in self.conn.execute("SELECT item, stage, payload FROM steps WHERE run_id = ?", (self.run_id,))
+        }
+        if self.resumed:
+            logger.info(f"Resuming {job} run {self.run_id} ({len(self._done)} steps already done)")
+
+    def _latest_unfinished(self):
+        row = self.conn.execute(
+            "SELECT run_id FROM runs WHERE job = ? AND finished_at IS NULL ORDER BY started_at DESC LIMIT 1",
+            (self.job,),
+        ).fetchone()
+        return row[0] if row else None
+
+    def _prune(self):
+        cutoff = time.time() - RETENTION_DAYS * 86400
+        self.conn.execute("DELETE FROM runs WHERE started_at < ?", (cutoff,))
+
+    def done(self, item, stage):
+        return (item, stage) in self._done
+
+    def payload(self, item, stage):
+        """The JSON payload stored with a completed stage, or None."""
+        payload = self._done.get((item, stage))
+        return json.loads(payload) if payload is not None else None
+
+    def mark(self, item, stage, payload=None):
+        encoded = json.dumps(payload, ensure_ascii=False) if payload is not None else None
+        self.conn.execute(
+            "INSERT OR REPLACE INTO steps (run_id, item, stage, payload, done_at) VALUES (?, ?, ?, ?, ?)",
+            (self.run_id, item, stage, encoded, time.time()),
+        )
+        self._done[(item, stage)] = encoded
+
+    def count(self, stage):
+        return sum(1 for _, s in self._done if s == stage)
+
+    def finish(self):
+        """Marks the run complete; it will not be resumed again."""
+        self.conn.execute("UPDATE runs SET finished_at = ? WHERE run_id = ?", (time.time(), self.run_id))
+
+    def close(self):
+        self.conn.close()
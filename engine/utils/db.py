@@ -1,82 +1,587 @@
 import os
-from supabase import create_client, Client
+import time
 from dotenv import load_dotenv
+from utils.storage import content_key, upload_options, is_duplicate_error
 
 load_dotenv()
 
+BULK_BATCH_SIZE = 100
+PAGE_SIZE = 200
+
+# Explicit projections: list views never need article Markdown bodies
+ARTICLE_LIST_COLUMNS = "id, title, status, category_id, thumbnail_url, source_url, created_at"
+SOURCE_COLUMNS = "id, name, url, type, is_active, last_crawled_at, created_at"
+# What CrawlScheduler needs to pick due sources
+SOURCE_SCHEDULE_COLUMNS = "id, name, url, last_crawled_at, content_hash, crawl_checks, crawl_changes, crawl_seconds, crawl_failures, revisit_interval_seconds, next_crawl_at, content_selector"
+# extraction_templates columns (crawler/templates.py)
+EXTRACTION_TEMPLATE_COLUMNS = "domain, content_selector, noise_selectors, needs_js, hits, misses, learned_at, updated_at"
+CATEGORY_CACHE_TTL = int(os.getenv("AURA_CATEGORY_CACHE_TTL", 300))
+# Bulk writes: retries of a batch that failed transiently, first delay (doubled per retry)
+BULK_RETRIES = int(os.getenv("AURA_BULK_RETRIES", 2))
+BULK_BACKOFF = 0.5
+# SQLSTATEs a row's own values cause (data exceptions 22xxx, constraint violations
+# 23xxx, RAISE in a trigger/function); only these are worth bisecting a batch for
+ROW_ERROR_CLASSES = ("22", "23")
+ROW_ERROR_CODES = {"P0001"}
+# Retried as a whole batch: connection (08xxx), serialization/deadlock (40xxx),
+# resources (53xxx), statement timeout / shutdown (57xxx), PostgREST connection errors
+TRANSIENT_ERROR_CLASSES = ("08", "40", "53", "57")
+TRANSIENT_ERROR_CODES = {"PGRST000", "PGRST001", "PGRST002", "PGRST003"}
+
+
+def is_row_error(error):
+    """True when the database rejected a row's values (postgrest APIError with a row-level SQLSTATE)."""
+    code = getattr(error, "code", None)
+    return isinstance(code, str) and (code[:2] in ROW_ERROR_CLASSES or code in ROW_ERROR_CODES)
+
+
+def is_transient_error(error):
+    """Transport failures, 429 / 5xx answers and transient SQLSTATEs: the same request may succeed later."""
+    import httpx
+
+    if isinstance(error, httpx.TransportError):
+        return True
+    code = getattr(error, "code", None)
+    if isinstance(code, int):
+        # postgrest reports non-JSON error bodies (gateway errors) with the HTTP status
+        return code == 429 or code >= 500
+    return isinstance(code, str) and (code[:2] in TRANSIENT_ERROR_CLASSES or code in TRANSIENT_ERROR_CODES)
+
+
+class BulkResult:
+    """Outcome of a bulk write: rows the API returned, and rows that failed with their error."""
+
+    def __init__(self):
+        self.succeeded = []
+        self.errors = []  # [{"row": row, "error": "..."}]
+        self.requests = 0
+
+    def merge(self, other):
+        self.succeeded.extend(other.succeeded)
+        self.errors.extend(other.errors)
+        self.requests += other.requests
+        return self
+
+    def __repr__(self):
+        return f"BulkResult(succeeded={len(self.succeeded)}, errors={len(self.errors)}, requests={self.requests})"
+
+
+class WriteBuffer:
+    """
+    Collects rows for one bulk method and flushes them once `batch_size` rows are
+    buffered or the oldest buffered row is `max_delay` seconds old (checked on add),
+    and on exit. `on_flush(result)` runs after every flush.
+    """
+
+    def __init__(self, write, batch_size=BULK_BATCH_SIZE, max_delay=10.0, on_flush=None):
+        self.write = write
+        self.batch_size = batch_size
+        self.max_delay = max_delay
+        self.on_flush = on_flush
+        self.result = BulkResult()
+        self._rows = []
+        self._first_at = None
+
+    def add(self, row):
+        if not self._rows:
+            self._first_at = time.monotonic()
+        self._rows.append(row)
+        if len(self._rows) >= self.batch_size or time.monotonic() - self._first_at >= self.max_delay:
+            self.flush()
+
+    def flush(self):
+        if not self._rows:
+            return None
+        rows, self._rows = self._rows, []
+        result = self.write(rows, batch_size=self.batch_size)
+        self.result.merge(result)
+        if self.on_flush:
+            self.on_flush(result)
+        return result
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.flush()
+        return False
+
+
+class CategoryCache:
+    """Category rows (id, name, slug) kept for CATEGORY_CACHE_TTL seconds."""
+
+    def __init__(self, ttl=CATEGORY_CACHE_TTL):
+        self.ttl = ttl
+        self._rows = None
+        self._loaded_at = 0.0
+
+    def get(self):
+        """Cached rows, or None when empty or expired."""
+        if self._rows is None or time.monotonic() - self._loaded_at > self.ttl:
+            return None
+        return list(self._rows)
+
+    def set(self, rows):
+        self._rows = [{"id": r["id"], "name": r["name"], "slug": r["slug"]} for r in rows]
+        self._loaded_at = time.monotonic()
+
+    def add(self, row):
+        if self._rows is not None and all(c["id"] != row["id"] for c in self._rows):
+            self._rows.append({"id": row["id"], "name": row["name"], "slug": row["slug"]})
+
+    def invalidate(self):
+        self._rows = None
+
+
+def supabase_credentials():
+    url = os.environ.get("SUPABASE_URL")
+    key = os.environ.get("SUPABASE_KEY")
+    if not url or not key:
+        raise ValueError("Supabase credentials not found in environment variables.")
+    return url, key
+
+
+def category_slug(name):
+    # Simple slug generation (not perfect but functional for auto-gen)
+    # In a real app, use a proper slugify library
+    return name.lower().replace(" ", "-").replace("/", "-")
+
+
+def find_category(categories, name):
+    slug = category_slug(name)
+    for category in categories:
+        if category["name"] == name or category["slug"] == slug:
+            return category["id"]
+    return None
+
+
+def clean_keywords(keywords):
+    return [k.strip() for k in dict.fromkeys(keywords) if k and k.strip()]
+
+
+def ilike_filter(keywords):
+    """PostgREST or= filter for the legacy substring scan over crawled_articles."""
+    return ",".join(f"title.ilike.%{k}%,content.ilike.%{k}%" for k in keywords)
+
+
+def ilike_results(rows, excerpt_chars):
+    """Maps legacy scan rows to the search_crawled_articles RPC shape."""
+    return [{
+        "title": row.get("title"),
+        "url": row.get("url"),
+        "excerpt": (row.get("content") or "")[:excerpt_chars],
+        "source_name": (row.get("source") or {}).get("name"),
+        "rank": 0.0,
+    } for row in rows or []]
+
+
+def newest_by_keyword(rows):
+    found = {}
+    for row in rows or []:
+        found.setdefault(row["keyword_normalized"], row)
+    return found
+
+
+def chunk_rows(chunks_by_article):
+    return [{
+        "article_id": article_id,
+        "chunk_index": chunk["chunk_index"],
+        "heading": chunk.get("heading"),
+        "content": chunk["content"],
+        "start_offset": chunk["start_offset"],
+        "end_offset": chunk["end_offset"],
+    } for article_id, chunks in chunks_by_article.items() for chunk in chunks]
+
+
+def dedupe_by_url(rows):
+    """Last row wins: one upsert batch must not touch the same url twice."""
+    return list({row["url"]: row for row in rows}.values())
+
+
+def keyset_columns(columns, order_column="created_at"):
+    """Projection plus the (order_column, id) pair the page cursor is built from."""
+    names, depth, current = [], 0, ""
+    for char in columns + ",":  # split on top-level commas only (embeds like a:b(c, d))
+        depth += {"(": 1, ")": -1}.get(char, 0)
+        if char == "," and depth == 0:
+            names.append(current.strip())
+            current = ""
+        else:
+            current += char
+    for required in (order_column, "id"):
+        if required not in names and "*" not in names:
+            names.append(required)
+    return ", ".join(names)
+
+
+def keyset_filter(cursor, order_column="created_at", descending=True):
+    """PostgREST or= filter for rows strictly after `cursor` = (order value, id)."""
+    value, row_id = cursor
+    op = "lt" if descending else "gt"
+    return f'{order_column}.{op}."{value}",and({order_column}.eq."{value}",id.{op}.{row_id})'
+
+
+def page_cursor(rows, page_size, order_column="created_at"):
+    """Cursor for the page after `rows`, or None when this was the last page."""
+    if len(rows) < page_size:
+        return None
+    return rows[-1][order_column], rows[-1]["id"]
+
+
+# -- query plans ---------------------------------------------------------------
+# Logic shared by SupabaseManager and AsyncSupabaseManager, written once as
+# generators: a plan yields PostgREST request builders (or Sleep) and receives
+# each executed response; a failed request is thrown back in at the yield.
+# run_plan / utils.async_db.run_plan_async execute the requests, blocking or awaited.
+
+class Sleep:
+    """Yielded by a plan to wait `seconds` before its next request."""
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+
+
+def run_plan(plan):
+    """Drives a query plan with blocking execute() calls; returns the plan's result."""
+    reply, error = None, None
+    while True:
+        try:
+            step = plan.throw(error) if error else plan.send(reply)
+        except StopIteration as done:
+            return done.value
+        reply, error = None, None
+        try:
+            if isinstance(step, Sleep):
+                time.sleep(step.seconds)
+            else:
+                reply = step.execute()
+        except Exception as e:
+            error = e
+
+
+def bulk_plan(rows, send, batch_size):
+    """
+    Sends rows in batches, `send(part)` building the request. Transient failures are
+    retried (BULK_RETRIES); a batch rejected for a row's values is bisected so only
+    the bad rows are reported, any other failure (auth, missing table, ...) is
+    reported for the whole batch. Returns a BulkResult.
+    """
+    result = BulkResult()
+
+    def attempt(part):
+        for retry in range(BULK_RETRIES + 1):
+            result.requests += 1
+            try:
+                res = yield send(part)
+                result.succeeded.extend(res.data or [])
+                return
+            except Exception as e:
+                error = e
+            if not is_transient_error(error) or retry == BULK_RETRIES:
+                break
+            delay = BULK_BACKOFF * 2 ** retry
+            print(f"Bulk write of {len(part)} rows failed ({error}); retrying in {delay:.1f}s")
+            yield Sleep(delay)
+        if is_row_error(error) and len(part) > 1:
+            mid = len(part) // 2
+            yield from attempt(part[:mid])
+            yield from attempt(part[mid:])
+            return
+        result.errors.extend({"row": row, "error": str(error)} for row in part)
+
+    for start in range(0, len(rows), batch_size):
+        yield from attempt(rows[start:start + batch_size])
+    if result.errors:
+        print(f"Bulk write: {len(result.errors)} of {len(rows)} rows failed")
+    return result
+
+
+def replace_crawled_chunks_plan(client, chunks_by_article, batch_size):
+    """One delete of the articles' passages, then batched inserts."""
+    article_ids = list(chunks_by_article)
+    if not article_ids:
+        return BulkResult()
+    yield client.table("crawled_chunks").delete().in_("article_id", article_ids)
+    return (yield from bulk_plan(chunk_rows(chunks_by_article), lambda part: client.table("crawled_chunks").insert(part), batch_size))
+
+
+def categories_plan(client, cache, refresh=False):
+    """Categories (id, name, slug) from `cache`, loaded when empty, expired or `refresh`."""
+    rows = None if refresh else cache.get()
+    if rows is None:
+        res = yield client.table("categories").select("id, name, slug")
+        cache.set(res.data or [])
+        rows = cache.get()
+    return rows
+
+
+def get_or_create_category_plan(client, cache, name):
+    """
+    Category id for `name`, created if missing. Answered from the category cache
+    when possible, otherwise one `get_or_create_category` RPC round trip.
+    """
+    category_id = find_category((yield from categories_plan(client, cache)), name)
+    if category_id:
+        return category_id
+
+    slug = category_slug(name)
+    try:
+        res = yield client.rpc("get_or_create_category", {"category_name": name, "category_slug": slug})
+        if res.data:
+            cache.add(res.data[0])
+            return res.data[0]['id']
+    except Exception as e:
+        print(f"get_or_create_category RPC failed, using table queries: {e}")
+
+    cache.invalidate()
+    return (yield from category_by_queries_plan(client, name, slug))
+
+
+def category_by_queries_plan(client, name, slug):
+    """Pre-RPC path (select by name, by slug, insert, retry insert) for unmigrated databases."""
+    # 1. Try to find existing
+    res = yield client.table("categories").select("id").eq("name", name)
+    if res.data:
+        return res.data[0]['id']
+        
+    # 1b. Try by slug just in case
+    res = yield client.table("categories").select("id").eq("slug", slug)
+    if res.data:
+        return res.data[0]['id']
+
+    # 2. Create new
+    try:
+        new_cat = {"name": name, "slug": slug, "description": "Auto-generated by AI"}
+        res = yield client.table("categories").insert(new_cat)
+        if res.data:
+            return res.data[0]['id']
+    except Exception as e:
+        print(f"Error creating category {name}: {e}")
+        # Fallback: maybe try again with a random suffix for slug if unique constraint failed
+        import uuid
+        slug = f"{slug}-{str(uuid.uuid4())[:8]}"
+        new_cat = {"name": name, "slug": slug, "description": "Auto-generated by AI (Retry)"}
+        res = yield client.table("categories").insert(new_cat)
+        if res.data:
+            return res.data[0]['id']
+    
+    return None
+
+
+def fetch_page_plan(client, table, columns, filters=None, page_size=PAGE_SIZE, cursor=None, order_column="created_at", descending=True):
+    """One keyset page of `table` ordered by (order_column, id): (rows, next_cursor)."""
+    query = client.table(table).select(keyset_columns(columns, order_column))
+    for column, value in (filters or {}).items():
+        query = query.eq(column, value)
+    if cursor:
+        query = query.or_(keyset_filter(cursor, order_column, descending))
+    res = yield query.order(order_column, desc=descending).order("id", desc=descending).limit(page_size)
+    rows = res.data or []
+    return rows, page_cursor(rows, page_size, order_column)
+
+
+def recent_articles_plan(client, normalized_keywords, since_iso):
+    """{keyword_normalized: newest article} for articles created since `since_iso`."""
+    if not normalized_keywords:
+        return {}
+    res = yield client.table("articles")\
+        .select("id, title, status, keyword_normalized, created_at")\
+        .in_("keyword_normalized", list(normalized_keywords))\
+        .gte("created_at", since_iso)\
+        .order("created_at", desc=True)
+    return newest_by_keyword(res.data)
+
+
+def search_crawled_articles_plan(client, keywords, limit=5, excerpt_chars=2000):
+    """
+    Ranked search over crawled_articles via the `search_crawled_articles` RPC
+    (bigram GIN index). Returns dicts with title, url, excerpt, source_name, rank.
+    Falls back to the old ILIKE OR-scan if the migration is not applied yet.
+    """
+    keywords = clean_keywords(keywords)
+    if not keywords:
+        return []
+    try:
+        res = yield client.rpc("search_crawled_articles", {
+            "keywords": keywords,
+            "match_limit": limit,
+            "excerpt_chars": excerpt_chars,
+        })
+        return res.data or []
+    except Exception as e:
+        print(f"search_crawled_articles RPC failed, using ILIKE scan: {e}")
+
+    res = yield client.table("crawled_articles")\
+        .select("title, content, url, source:sources(name)")\
+        .or_(ilike_filter(keywords))\
+        .limit(limit)
+    return ilike_results(res.data, excerpt_chars)
+
+
+def search_crawled_chunks_plan(client, keywords, limit=5, per_article=2):
+    """
+    Best passages via the `search_crawled_chunks` RPC (title, url, heading, excerpt,
+    source_name, rank). Falls back to whole-article excerpts if chunks are unavailable.
+    """
+    keywords = clean_keywords(keywords)
+    if not keywords:
+        return []
+    try:
+        res = yield client.rpc("search_crawled_chunks", {
+            "keywords": keywords,
+            "match_limit": limit,
+            "per_article": per_article,
+        })
+        if res.data:
+            return res.data
+    except Exception as e:
+        print(f"search_crawled_chunks RPC failed, using article search: {e}")
+    return (yield from search_crawled_articles_plan(client, keywords, limit=limit))
+
+
 class SupabaseManager:
     def __init__(self):
-        url = os.environ.get("SUPABASE_URL")
-        key = os.environ.get("SUPABASE_KEY")
-        if not url or not key:
-            raise ValueError("Supabase credentials not found in environment variables.")
-        self.client: Client = create_client(url, key)
+        url, key = supabase_credentials()
+        # Imported here: the supabase package pulls in httpx/postgrest/storage/realtime
+        from supabase import create_client
+        self.client = create_client(url, key)
+        self.categories = CategoryCache()
 
     def insert_article(self, article_data):
         """Inserts a new article draft."""
         return self.client.table("articles").insert(article_data).execute()
 
-    def get_sources(self):
+    def get_sources(self, columns=SOURCE_COLUMNS):
         """Retrieves active sources."""
-        return self.client.table("sources").select("*").eq("is_active", True).execute()
+        return self.client.table("sources").select(columns).eq("is_active", True).execute()
     
-    def get_categories(self):
-        """Retrieves categories."""
-        return self.client.table("categories").select("id, name, slug").execute()
+    def get_categories(self, refresh=False):
+        """Categories (id, name, slug), cached for CATEGORY_CACHE_TTL seconds."""
+        return run_plan(categories_plan(self.client, self.categories, refresh))
 
     def fetch_articles_by_status(self, status='draft'):
         """Fetches articles by status."""
         return self.client.table("articles").select("*").eq("status", status).execute()
 
+    def fetch_page(self, table, columns, filters=None, page_size=PAGE_SIZE, cursor=None, order_column="created_at", descending=True):
+        """
+        One keyset page of `table` ordered by (order_column, id): (rows, next_cursor).
+        Pass next_cursor back in to continue; it is None after the last page.
+        """
+        return run_plan(fetch_page_plan(self.client, table, columns, filters, page_size, cursor, order_column, descending))
+
+    def iter_rows(self, table, columns, filters=None, page_size=PAGE_SIZE, order_column="created_at", descending=True):
+        """Yields every matching row, holding one page in memory at a time."""
+        cursor = None
+        while True:
+            rows, cursor = self.fetch_page(table, columns, filters, page_size, cursor, order_column, descending)
+            yield from rows
+            if cursor is None:
+                return
+
+    def iter_articles(self, status=None, columns=ARTICLE_LIST_COLUMNS, page_size=PAGE_SIZE):
+        """All articles (optionally with `status`), newest first."""
+        return self.iter_rows("articles", columns, {"status": status} if status else None, page_size)
+
+    def iter_sources(self, active_only=True, columns=SOURCE_COLUMNS, page_size=PAGE_SIZE):
+        """All (active) sources, newest first."""
+        return self.iter_rows("sources", columns, {"is_active": True} if active_only else None, page_size)
+
+    def find_recent_articles_by_keywords(self, normalized_keywords, since_iso):
+        """Returns {keyword_normalized: newest article} for articles created since `since_iso`."""
+        return run_plan(recent_articles_plan(self.client, normalized_keywords, since_iso))
+
+    def search_crawled_articles(self, keywords, limit=5, excerpt_chars=2000):
+        """Ranked search_crawled_articles RPC, falling back to the ILIKE scan (search_crawled_articles_plan)."""
+        return run_plan(search_crawled_articles_plan(self.client, keywords, limit, excerpt_chars))
+
+    def save_crawled_chunks(self, article_id, chunks):
+        """Replaces the stored passages (crawler/chunker.py output) of one crawled article."""
+        return self.replace_crawled_chunks({article_id: chunks})
+
+    def replace_crawled_chunks(self, chunks_by_article, batch_size=500):
+        """Replaces the passages of many crawled articles: one delete, then batched inserts."""
+        return run_plan(replace_crawled_chunks_plan(self.client, chunks_by_article, batch_size))
+
+    def search_crawled_chunks(self, keywords, limit=5, per_article=2):
+        """Best passages via the search_crawled_chunks RPC, falling back to article excerpts."""
+        return run_plan(search_crawled_chunks_plan(self.client, keywords, limit, per_article))
+
+    def _bulk(self, rows, send, batch_size):
+        """bulk_plan with blocking requests; `send(part)` builds the request for one batch."""
+        return run_plan(bulk_plan(rows, send, batch_size))
+
+    def bulk_upsert_crawled(self, rows, batch_size=BULK_BATCH_SIZE):
+        """Upserts crawled_articles rows on url (last row wins for duplicate urls in one call)."""
+        return self._bulk(
+            dedupe_by_url(rows),
+            lambda part: self.client.table("crawled_articles").upsert(part, on_conflict="url"),
+            batch_size,
+        )
+
+    def bulk_record_source_crawls(self, crawls, batch_size=BULK_BATCH_SIZE):
+        """
+        Stores crawl observations from CrawlScheduler.observe / observe_failure
+        (last_crawled_at, content hash, change history, failure count, next_crawl_at)
+        with one record_source_crawls RPC per batch.
+        """
+        return self._bulk(
+            list({c["id"]: c for c in crawls}.values()),
+            lambda part: self.client.rpc("record_source_crawls", {"crawls": part}),
+            batch_size,
+        )
+
+    def get_extraction_templates(self, domains):
+        """Stored extraction templates for `domains` (crawler/templates.py)."""
+        return self.client.table("extraction_templates").select(EXTRACTION_TEMPLATE_COLUMNS).in_("domain", sorted(set(domains))).execute()
+
+    def bulk_upsert_extraction_templates(self, rows, batch_size=BULK_BATCH_SIZE):
+        """Upserts extraction_templates rows (ExtractionTemplates.pop_changes) on domain."""
+        return self._bulk(
+            rows,
+            lambda part: self.client.table("extraction_templates").upsert(part, on_conflict="domain"),
+            batch_size,
+        )
+
+    def bulk_insert_articles(self, rows, batch_size=BULK_BATCH_SIZE):
+        """Inserts article drafts in batches."""
+        return self._bulk(rows, lambda part: self.client.table("articles").insert(part), batch_size)
+
+    def write_buffer(self, write, batch_size=BULK_BATCH_SIZE, max_delay=10.0, on_flush=None):
+        """WriteBuffer around one of the bulk_* methods, e.g. `db.write_buffer(db.bulk_insert_articles)`."""
+        return WriteBuffer(write, batch_size=batch_size, max_delay=max_delay, on_flush=on_flush)
+
     def update_article_status(self, article_id, status):
         """Updates article status."""
         return self.client.table("articles").update({"status": status}).eq("id", article_id).execute()
 
-    def get_or_create_category(self, name):
-        """Retrieves a category by name, or creates it if it doesn't exist."""
-        # Simple slug generation (not perfect but functional for auto-gen)
-        # In a real app, use a proper slugify library
-        slug = name.lower().replace(" ", "-").replace("/", "-")
-        
-        # 1. Try to find existing
-        res = self.client.table("categories").select("id").eq("name", name).execute()
-        if res.data:
-            return res.data[0]['id']
-            
-        # 1b. Try by slug just in case
-        res = self.client.table("categories").select("id").eq("slug", slug).execute()
-        if res.data:
-            return res.data[0]['id']
+    def invalidate_categories(self):
+        """Drops the category cache; the next read refetches it."""
+        self.categories.invalidate()
 
-        # 2. Create new
-        try:
-            new_cat = {"name": name, "slug": slug, "description": "Auto-generated by AI"}
-            res = self.client.table("categories").insert(new_cat).execute()
-            if res.data:
-                return res.data[0]['id']
-        except Exception as e:
-            print(f"Error creating category {name}: {e}")
-            # Fallback: maybe try again with a random suffix for slug if unique constraint failed
-            import uuid
-            slug = f"{slug}-{str(uuid.uuid4())[:8]}"
-            new_cat = {"name": name, "slug": slug, "description": "Auto-generated by AI (Retry)"}
-            res = self.client.table("categories").insert(new_cat).execute()
-            if res.data:
-                return res.data[0]['id']
-        
-        return None
+    def get_or_create_category(self, name):
+        """Category id for `name`, created if missing (get_or_create_category_plan)."""
+        return run_plan(get_or_create_category_plan(self.client, self.categories, name))
 
-    def upload_image(self, file_bytes, filename, bucket='images'):
-        """Uploads an image to Supabase Storage and returns the public URL."""
+    def upload_image(self, file_bytes, filename=None, bucket='images', content_type="image/png"):
+        """
+        Uploads an image to Supabase Storage and returns the public URL. Without a
+        filename the object is content-addressed (sha256 key, long-lived cache
+        headers) and the upload is skipped when that object already exists.
+        """
+        storage = self.client.storage.from_(bucket)
         try:
-            # Upload
-            self.client.storage.from_(bucket).upload(
-                path=filename,
-                file=file_bytes,
-                file_options={"content-type": "image/png"}
-            )
+            if filename is None:
+                filename = content_key(file_bytes, content_type.split("/")[-1])
+                if storage.exists(filename):
+                    return storage.get_public_url(filename)
+            try:
+                storage.upload(path=filename, file=file_bytes, file_options=upload_options(content_type))
+            except Exception as e:
+                if not is_duplicate_error(e):
+                    raise
             # Get Public URL
-            return self.client.storage.from_(bucket).get_public_url(filename)
+            return storage.get_public_url(filename)
         except Exception as e:
             print(f"Error uploading image to Supabase: {e}")
             return None
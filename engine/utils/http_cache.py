@@ -0,0 +1,188 @@
+import gzip
+import json
+import time
+import hashlib
+import logging
+
+from fastapi.encoders import jsonable_encoder
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import Response
+
+logger = logging.getLogger(__name__)
+
+try:
+    import brotli
+except ImportError:  # Optional: `pip install brotli` enables br encoding
+    brotli = None
+
+# Cache-Control per route for JSON GETs served through etag_json_response.
+CACHE_POLICIES = {
+    "/trends": "private, max-age=300",
+    "/media/recommendations": "private, no-cache",
+    "/debug/rag": "private, max-age=60",
+    "/jobs": "private, no-cache",
+    "/admission/stats": "no-store",
+}
+DEFAULT_CACHE_POLICY = "private, no-cache"
+
+COMPRESSIBLE_TYPES = ("application/json", "text/", "application/javascript", "image/svg+xml")
+_ENCODING_SUFFIXES = ("-br", "-gzip")
+
+
+def cache_policy(path):
+    for prefix, policy in CACHE_POLICIES.items():
+        if path == prefix or path.startswith(prefix + "/"):
+            return policy
+    return DEFAULT_CACHE_POLICY
+
+
+def _strip_etag(tag):
+    tag = tag.strip()
+    if tag.startswith("W/"):
+        tag = tag[2:]
+    tag = tag.strip('"')
+    for suffix in _ENCODING_SUFFIXES:
+        if tag.endswith(suffix):
+            return tag[:-len(suffix)]
+    return tag
+
+
+def etag_json_response(request, payload, cache_control=None):
+    """
+    Serializes `payload` once, tags it with a strong ETag (SHA-256 of the body) and
+    answers 304 Not Modified when the client's If-None-Match already has it.
+    """
+    body = json.dumps(jsonable_encoder(payload), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    digest = hashlib.sha256(body).hexdigest()[:32]
+    headers = {
+        "ETag": f'"{digest}"',
+        "Cache-Control": cache_control or cache_policy(request.url.path),
+        "Vary": "Accept-Encoding",
+    }
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        if if_none_match.strip() == "*" or digest in {_strip_etag(t) for t in if_none_match.split(",")}:
+            return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+class ResponseMemo:
+    """Keeps the last computed payload for `ttl` seconds so polling does not recompute it."""
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._value = None
+        self._stored_at = 0.0
+
+    def get(self):
+        if self._value is not None and time.monotonic() - self._stored_at < self.ttl:
+            return self._value
+        return None
+
+    def set(self, value):
+        self._value = value
+        self._stored_at = time.monotonic()
+
+
+class CompressionMiddleware:
+    """
+    ASGI middleware that compresses complete (non-streaming) responses with brotli
+    when the client accepts it and the `brotli` package is installed, else gzip.
+    Streaming responses and already-encoded or binary bodies pass through untouched.
+    Strong ETags of compressed bodies get an encoding suffix so each representation
+    has its own tag; a 304 keeps the tag of the representation the client revalidates.
+    """
+
+    def __init__(self, app, minimum_size=500, gzip_level=6, brotli_quality=5):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    def _choose_encoding(self, scope):
+        accept = Headers(scope=scope).get("accept-encoding", "")
+        offered = {part.split(";")[0].strip().lower() for part in accept.split(",")}
+        if brotli is not None and "br" in offered:
+            return "br"
+        if "gzip" in offered:
+            return "gzip"
+        return None
+
+    @staticmethod
+    def _tag_representation(headers, encoding):
+        etag = headers.get("etag")
+        if etag and not etag.startswith("W/"):
+            headers["ETag"] = f'"{etag.strip(chr(34))}-{encoding}"'
+        if "accept-encoding" not in headers.get("vary", "").lower():
+            headers.add_vary_header("Accept-Encoding")
+
+    @staticmethod
+    def _tag_revalidation(scope, headers):
+        """
+        A 304 has no body to tell whether the full response would have been compressed,
+        so its strong ETag takes the suffix of the If-None-Match tag that matched: the
+        one the client got with the representation it holds (no suffix if uncompressed).
+        """
+        etag = headers.get("etag")
+        if etag and not etag.startswith("W/"):
+            plain = etag.strip('"')
+            for tag in Headers(scope=scope).get("if-none-match", "").split(","):
+                if _strip_etag(tag) == plain:
+                    headers["ETag"] = f'"{tag.strip().removeprefix("W/").strip(chr(34))}"'
+                    break
+        if "accept-encoding" not in headers.get("vary", "").lower():
+            headers.add_vary_header("Accept-Encoding")
+
+    def _compress(self, encoding, body):
+        if encoding == "br":
+            return brotli.compress(body, quality=self.brotli_quality)
+        return gzip.compress(body, compresslevel=self.gzip_level)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = self._choose_encoding(scope)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start_message, passthrough
+            if passthrough:
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            headers = MutableHeaders(raw=start_message["headers"])
+            if start_message["status"] == 304:
+                self._tag_revalidation(scope, headers)
+            body = message.get("body", b"")
+            compressible = (
+                not message.get("more_body", False)
+                and "content-encoding" not in headers
+                and headers.get("content-type", "").startswith(COMPRESSIBLE_TYPES)
+                and len(body) >= self.minimum_size
+            )
+            if not compressible:
+                passthrough = True
+                await send(start_message)
+                await send(message)
+                return
+
+            compressed = self._compress(encoding, body)
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(compressed))
+            self._tag_representation(headers, encoding)
+            await send(start_message)
+            await send({"type": "http.response.body", "body": compressed})
+
+        await self.app(scope, receive, send_wrapper)
@@ -0,0 +1,160 @@
+import os
+import time
+import uuid
+import logging
+import threading
+import unicodedata
+
+logger = logging.getLogger(__name__)
+
+DEDUPE_WINDOW_ENV = "AURA_DEDUPE_WINDOW_HOURS"
+DEFAULT_DEDUPE_WINDOW_HOURS = 24
+
+
+def dedupe_window_seconds():
+    """Window in which a repeated keyword/idempotency key returns the earlier result."""
+    try:
+        hours = float(os.getenv(DEDUPE_WINDOW_ENV, DEFAULT_DEDUPE_WINDOW_HOURS))
+    except ValueError:
+        hours = DEFAULT_DEDUPE_WINDOW_HOURS
+    return max(hours, 0) * 3600
+
+
+def normalize_keyword(keyword):
+    """
+    Canonical form used for keyword dedupe.
+    NFKC folds full-width/half-width variants (ＡＧＡ -> AGA, ｶﾀｶﾅ -> カタカナ),
+    then case, whitespace and punctuation differences are dropped.
+    """
+    if not keyword:
+        return ""
+    text = unicodedata.normalize("NFKC", keyword).casefold()
+    return "".join(
+        ch for ch in text
+        if not ch.isspace() and not unicodedata.category(ch).startswith(("P", "S"))
+    )
+
+
+class GenerationJob:
+    def __init__(self, keyword, total=1, idempotency_key=None):
+        self.job_id = uuid.uuid4().hex
+        self.keyword = keyword
+        self.keyword_normalized = normalize_keyword(keyword)
+        self.idempotency_key = idempotency_key
+        self.total = total
+        self.completed = 0
+        self.failed = 0
+        self.article_ids = []
+        self.created_at = time.time()
+
+    @property
+    def status(self):
+        if self.completed + self.failed >= self.total:
+            return "failed" if self.completed == 0 else "done"
+        return "running"
+
+    @property
+    def in_flight(self):
+        return self.status == "running"
+
+    def to_dict(self):
+        return {
+            "job_id": self.job_id,
+            "keyword": self.keyword,
+            "status": self.status,
+            "total": self.total,
+            "completed": self.completed,
+            "failed": self.failed,
+            "article_ids": list(self.article_ids),
+        }
+
+
+class JobRegistry:
+    """
+    In-process index of generation jobs by id, idempotency key and normalized keyword.
+    Entries older than the dedupe window are dropped lazily.
+    """
+
+    def __init__(self, window_seconds=None):
+        self.window_seconds = dedupe_window_seconds() if window_seconds is None else window_seconds
+        self._jobs = {}
+        self._by_key = {}
+        self._lock = threading.Lock()
+
+    def _prune(self):
+        cutoff = time.time() - self.window_seconds
+        for job_id, job in list(self._jobs.items()):
+            if job.created_at < cutoff and not job.in_flight:
+                del self._jobs[job_id]
+                if job.idempotency_key and self._by_key.get(job.idempotency_key) == job_id:
+                    del self._by_key[job.idempotency_key]
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def find_by_idempotency_key(self, key):
+        if not key:
+            return None
+        with self._lock:
+            self._prune()
+            job_id = self._by_key.get(key)
+            return self._jobs.get(job_id) if job_id else None
+
+    def _find_keyword(self, normalized):
+        matches = [j for j in self._jobs.values() if j.keyword_normalized == normalized and j.status != "failed"]
+        return max(matches, key=lambda j: j.created_at) if matches else None
+
+    def find_in_flight(self, keyword):
+        """Returns a running job (or one finished inside the window) for the same keyword."""
+        with self._lock:
+            self._prune()
+            return self._find_keyword(normalize_keyword(keyword))
+
+    def create(self, keyword, total=1, idempotency_key=None):
+        job = GenerationJob(keyword, total=total, idempotency_key=idempotency_key)
+        with self._lock:
+            self._add(job)
+        return job
+
+    def _add(self, job):
+        self._jobs[job.job_id] = job
+        if job.idempotency_key:
+            self._by_key[job.idempotency_key] = job.job_id
+
+    def reserve(self, keyword, total=1, idempotency_key=None, force=False):
+        """
+        Check-and-create in one step: returns (None, earlier job) for a repeated
+        idempotency key or (unless `force`) keyword, else (new job, None). The new job
+        blocks duplicates right away, so concurrent requests cannot both pass; hand it
+        back with release() if it is not started after all.
+        """
+        with self._lock:
+            self._prune()
+            existing = self._jobs.get(self._by_key.get(idempotency_key)) if idempotency_key else None
+            if existing is None and not force:
+                existing = self._find_keyword(normalize_keyword(keyword))
+            if existing is not None:
+                return None, existing
+            job = GenerationJob(keyword, total=total, idempotency_key=idempotency_key)
+            self._add(job)
+            return job, None
+
+    def release(self, job):
+        """Drops a reserved job that was never started."""
+        with self._lock:
+            self._jobs.pop(job.job_id, None)
+            if job.idempotency_key and self._by_key.get(job.idempotency_key) == job.job_id:
+                del self._by_key[job.idempotency_key]
+
+    def record_result(self, job_id, article_id=None, success=True):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if not job:
+                return
+            if success:
+                job.completed += 1
+                if article_id:
+                    job.article_ids.append(article_id)
+            else:
+                job.failed += 1
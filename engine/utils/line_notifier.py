@@ -1,11 +1,53 @@
 import os
+import time
+import uuid
+import random
+import asyncio
 import logging
-from linebot import LineBotApi
-from linebot.models import TextSendMessage
 from textwrap import shorten
 
 logger = logging.getLogger(__name__)
 
+SITE_URL = "https://www.kireiaura.com"
+MAX_TEXT_LENGTH = 5000       # LINE text message limit
+MAX_MESSAGES_PER_REQUEST = 5
+MAX_MULTICAST_RECIPIENTS = 500
+
+
+def new_article_text(article):
+    title = article.get('title', 'No Title')
+    url = f"{SITE_URL}/articles/{article.get('id')}" # Placeholder URL
+    return f"✨新着記事のお知らせ✨\n\n{title}\n\n美咲が最新トレンドをチェックしました！\n詳細はこちら: {url}"
+
+
+def owner_review_text(article):
+    title = article.get('title', 'No Title')
+    admin_url = f"{SITE_URL}/admin/dashboard/articles/{article.get('id')}"
+    return f"🤖記事の生成が完了しました\n\nタイトル: {title}\n\n確認・承認はこちら: {admin_url}"
+
+
+def owner_review_digest(articles):
+    lines = [f"🤖{len(articles)}件の記事の生成が完了しました", ""]
+    for article in articles:
+        lines.append(f"・{shorten(article.get('title', 'No Title'), 60, placeholder='…')}")
+        lines.append(f"  {SITE_URL}/admin/dashboard/articles/{article.get('id')}")
+    return "\n".join(lines)
+
+
+def new_article_digest(articles):
+    lines = [f"✨新着記事が{len(articles)}件あります✨", ""]
+    for article in articles:
+        lines.append(f"・{shorten(article.get('title', 'No Title'), 60, placeholder='…')}")
+        lines.append(f"  {SITE_URL}/articles/{article.get('id')}")
+    return "\n".join(lines)
+
+
+# kind -> (single-article text, digest text)
+MESSAGE_FORMATS = {
+    "owner_review": (owner_review_text, owner_review_digest),
+    "new_article": (new_article_text, new_article_digest),
+}
+
 class LineNotifier:
     def __init__(self):
         self.access_token = os.environ.get("LINE_CHANNEL_ACCESS_TOKEN")
@@ -13,6 +55,7 @@ class LineNotifier:
             logger.warning("LINE_CHANNEL_ACCESS_TOKEN not found. Notifications will be skipped.")
             self.line_bot_api = None
         else:
+            from linebot import LineBotApi
             self.line_bot_api = LineBotApi(self.access_token)
         
         # In a real scenario, you'd target all users or specific channels.
@@ -26,10 +69,8 @@ class LineNotifier:
         if not self.line_bot_api:
             return
 
-        title = article.get('title', 'No Title')
-        url = f"https://www.kireiaura.com/articles/{article.get('id')}" # Placeholder URL
-        
-        message_text = f"✨新着記事のお知らせ✨\n\n{title}\n\n美咲が最新トレンドをチェックしました！\n詳細はこちら: {url}"
+        message_text = new_article_text(article)
+        from linebot.models import TextSendMessage
 
         try:
             if self.target_user_id:
@@ -48,13 +89,161 @@ class LineNotifier:
             logger.warning("Skipping owner notification (missing config).")
             return
 
-        title = article.get('title', 'No Title')
-        admin_url = f"https://www.kireiaura.com/admin/dashboard/articles/{article.get('id')}"
-
-        message_text = f"🤖記事の生成が完了しました\n\nタイトル: {title}\n\n確認・承認はこちら: {admin_url}"
+        message_text = owner_review_text(article)
+        from linebot.models import TextSendMessage
 
         try:
             self.line_bot_api.push_message(self.target_user_id, TextSendMessage(text=message_text))
             logger.info("Owner notification sent.")
         except Exception as e:
             logger.error(f"Failed to send owner notification: {e}")
+
+
+_FLUSH = object()
+
+
+class RetryableSendError(Exception):
+    def __init__(self, status, retry_after=None):
+        super().__init__(f"LINE API returned {status}")
+        self.status = status
+        self.retry_after = retry_after
+
+
+class NotificationDispatcher:
+    """
+    Async, batched LINE notifications for pipelines. `notify_*` only enqueue (never
+    block or raise); a background task collects notifications for `window` seconds,
+    sends one digest per kind (multicast when several recipients are configured in
+    LINE_TARGET_USER_ID, comma-separated) and retries 429/5xx with backoff, honouring
+    Retry-After. Call `await close()` to send what is queued before exiting.
+    """
+
+    def __init__(self, access_token=None, recipients=None, window=None, max_queue=1000, retries=5, backoff=1.0):
+        self.access_token = access_token or os.environ.get("LINE_CHANNEL_ACCESS_TOKEN")
+        if recipients is None:
+            recipients = [r.strip() for r in os.environ.get("LINE_TARGET_USER_ID", "").split(",") if r.strip()]
+        self.recipients = recipients
+        self.window = window if window is not None else float(os.getenv("AURA_LINE_DIGEST_WINDOW", 30))
+        self.retries = retries
+        self.backoff = backoff
+        self.enabled = bool(self.access_token and self.recipients)
+        if not self.enabled:
+            logger.warning("LINE token or target user not configured. Notifications will only be logged.")
+        self._queue = asyncio.Queue(maxsize=max_queue)
+        self._worker = None
+        self._api_client = None
+        self._api = None
+        self.sent = 0
+        self.dropped = 0
+
+    def notify_owner_review(self, article):
+        """Queues a 'draft ready for review' notification."""
+        self._enqueue("owner_review", article)
+
+    def notify_new_article(self, article):
+        """Queues a 'new article published' notification."""
+        self._enqueue("new_article", article)
+
+    def _enqueue(self, kind, article):
+        try:
+            self._queue.put_nowait((kind, {"id": article.get('id'), "title": article.get('title', 'No Title')}))
+        except asyncio.QueueFull:
+            self.dropped += 1
+            logger.warning(f"LINE notification queue full; dropped {kind} notification for {article.get('id')}")
+            return
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self):
+        while True:
+            batch = [await self._queue.get()]
+            deadline = time.monotonic() + self.window
+            while batch[-1] is not _FLUSH:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            items = [item for item in batch if item is not _FLUSH]
+            try:
+                if items:
+                    await self._dispatch(items)
+            except Exception as e:
+                logger.error(f"Failed to send LINE notifications ({len(items)} items): {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _messages(self, batch):
+        by_kind = {}
+        for kind, article in batch:
+            by_kind.setdefault(kind, []).append(article)
+        texts = []
+        for kind, articles in by_kind.items():
+            single, digest = MESSAGE_FORMATS[kind]
+            text = single(articles[0]) if len(articles) == 1 else digest(articles)
+            texts.append(text if len(text) <= MAX_TEXT_LENGTH else text[:MAX_TEXT_LENGTH - 1] + "…")
+        return texts
+
+    async def _dispatch(self, batch):
+        texts = self._messages(batch)
+        if not self.enabled:
+            for text in texts:
+                logger.info(f"LINE notification (not sent):\n{text}")
+            return
+        for start in range(0, len(texts), MAX_MESSAGES_PER_REQUEST):
+            messages = texts[start:start + MAX_MESSAGES_PER_REQUEST]
+            for offset in range(0, len(self.recipients), MAX_MULTICAST_RECIPIENTS):
+                await self._send_with_retry(self.recipients[offset:offset + MAX_MULTICAST_RECIPIENTS], messages)
+        logger.info(f"LINE notification sent: {len(batch)} items in {len(texts)} messages")
+
+    async def _send_with_retry(self, recipients, texts):
+        # Same retry key on every attempt: LINE drops duplicates of a request that did succeed
+        retry_key = str(uuid.uuid4())
+        for attempt in range(self.retries + 1):
+            try:
+                await self._send(recipients, texts, retry_key)
+                self.sent += 1
+                return
+            except RetryableSendError as e:
+                if attempt == self.retries:
+                    raise
+                delay = e.retry_after or self.backoff * 2 ** attempt * (1 + random.random())
+                logger.warning(f"LINE API {e.status}; retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+    async def _send(self, recipients, texts, retry_key):
+        from linebot.v3.messaging import (
+            AsyncApiClient, AsyncMessagingApi, Configuration, MulticastRequest, PushMessageRequest, TextMessage,
+        )
+        from linebot.v3.messaging.exceptions import ApiException
+
+        if self._api is None:
+            self._api_client = AsyncApiClient(Configuration(access_token=self.access_token))
+            self._api = AsyncMessagingApi(self._api_client)
+        messages = [TextMessage(text=text) for text in texts]
+        try:
+            if len(recipients) == 1:
+                await self._api.push_message(PushMessageRequest(to=recipients[0], messages=messages), x_line_retry_key=retry_key)
+            else:
+                await self._api.multicast(MulticastRequest(to=recipients, messages=messages), x_line_retry_key=retry_key)
+        except ApiException as e:
+            if e.status == 409:
+                return  # Retry key already accepted: the earlier attempt went through
+            if e.status == 429 or (e.status or 0) >= 500:
+                retry_after = (e.headers or {}).get("Retry-After")
+                raise RetryableSendError(e.status, float(retry_after) if retry_after and retry_after.isdigit() else None)
+            raise
+
+    async def close(self):
+        """Sends everything queued (without waiting out the window) and stops the worker."""
+        if self._worker is not None:
+            await self._queue.put(_FLUSH)
+            await self._queue.join()
+            self._worker.cancel()
+            self._worker = None
+        if self._api_client is not None:
+            await self._api_client.close()
+            self._api_client = self._api = None
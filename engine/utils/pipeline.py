@@ -0,0 +1,83 @@
+import time
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+
+
+class Stage:
+    """
+    One pipeline stage: `concurrency` workers run `handler(item)` on items from the
+    previous stage. A handler returns the item for the next stage, or None to drop it.
+    """
+
+    def __init__(self, name, handler, concurrency=1):
+        self.name = name
+        self.handler = handler
+        self.concurrency = max(1, concurrency)
+        self.processed = 0
+        self.dropped = 0
+        self.failed = 0
+        self.busy = 0.0
+
+    def stats(self):
+        return {
+            "processed": self.processed,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "busy_seconds": round(self.busy, 2),
+        }
+
+
+async def run_stages(items, stages, queue_size=None):
+    """
+    Runs `items` through `stages` connected by bounded queues (`queue_size`, default
+    2x the next stage's concurrency), so a slow stage applies backpressure upstream
+    instead of buffering the whole run. A failing item is logged and dropped; the
+    rest continue. Returns {stage name: stats}.
+    """
+    queues = [asyncio.Queue(maxsize=queue_size or 2 * stage.concurrency) for stage in stages]
+    queues.append(None)
+
+    async def feed():
+        for item in items:
+            await queues[0].put(item)
+        for _ in range(stages[0].concurrency):
+            await queues[0].put(_DONE)
+
+    async def work(stage, inbox, outbox):
+        while True:
+            item = await inbox.get()
+            if item is _DONE:
+                return
+            started = time.monotonic()
+            try:
+                result = await stage.handler(item)
+            except Exception as e:
+                stage.failed += 1
+                logger.error(f"Pipeline stage {stage.name} failed: {e}")
+                continue
+            finally:
+                stage.busy += time.monotonic() - started
+            if result is None:
+                stage.dropped += 1
+                continue
+            stage.processed += 1
+            if outbox is not None:
+                await outbox.put(result)
+
+    async def run_stage(index, stage):
+        outbox = queues[index + 1]
+        await asyncio.gather(*(work(stage, queues[index], outbox) for _ in range(stage.concurrency)))
+        if outbox is not None:
+            for _ in range(stages[index + 1].concurrency):
+                await outbox.put(_DONE)
+
+    started = time.monotonic()
+    await asyncio.gather(feed(), *(run_stage(i, stage) for i, stage in enumerate(stages)))
+    elapsed = time.monotonic() - started
+    stats = {stage.name: stage.stats() for stage in stages}
+    logger.info(f"Pipeline finished in {elapsed:.1f}s: {stats}")
+    return stats
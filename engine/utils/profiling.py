@@ -0,0 +1,101 @@
+import os
+import sys
+import time
+import logging
+import threading
+from collections import Counter
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# AURA_PROFILE_SLOW_MS turns profiling on for every request/job and keeps the
+# profile only when it ran longer than the threshold. Individual requests can
+# also opt in with the `x-aura-profile` header (see api.py).
+PROFILE_SLOW_MS_ENV = "AURA_PROFILE_SLOW_MS"
+PROFILE_DIR_ENV = "AURA_PROFILE_DIR"
+
+
+class SamplingProfiler:
+    """
+    Statistical profiler that samples the stack of one thread from a helper thread.
+    Output is in "folded" format (`frame;frame;frame count`), which flamegraph.pl,
+    speedscope and inferno read directly.
+
+    Note: the engine runs everything on the event loop thread, so a profile taken
+    during a request also contains whatever other tasks were running at the time.
+    """
+
+    def __init__(self, interval=0.005, thread_id=None):
+        self.interval = interval
+        self.thread_id = thread_id or threading.get_ident()
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="aura-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            self.samples[";".join(reversed(stack))] += 1
+
+    def write_folded(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+def _slow_threshold_ms():
+    value = os.getenv(PROFILE_SLOW_MS_ENV)
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        logger.warning(f"Ignoring invalid {PROFILE_SLOW_MS_ENV}={value!r}")
+        return None
+
+
+@contextmanager
+def profile_if_slow(name, force=False):
+    """
+    Profiles the enclosed block when AURA_PROFILE_SLOW_MS is set or `force` is true,
+    and writes `<AURA_PROFILE_DIR>/<name>-<timestamp>.folded` if it was slow.
+    A forced profile is always written.
+    """
+    threshold = 0.0 if force else _slow_threshold_ms()
+    if threshold is None:
+        yield
+        return
+
+    profiler = SamplingProfiler()
+    profiler.start()
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        profiler.stop()
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        if elapsed_ms >= threshold and profiler.samples:
+            out_dir = os.getenv(PROFILE_DIR_ENV, "profiles")
+            os.makedirs(out_dir, exist_ok=True)
+            safe_name = "".join(c if c.isalnum() or c in "-_" else "_" for c in name)[:80]
+            path = os.path.join(out_dir, f"{safe_name}-{int(time.time() * 1000)}.folded")
+            profiler.write_folded(path)
+            logger.info(f"Profile: {name} took {elapsed_ms:.0f} ms, wrote {path}")
@@ -0,0 +1,90 @@
+import os
+import asyncio
+import hashlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Content-addressed objects never change, so CDNs and browsers may keep them for a year.
+IMMUTABLE_MAX_AGE = "31536000"
+DEFAULT_PREFIX = "generated"
+
+
+def content_key(data, extension="png", prefix=DEFAULT_PREFIX):
+    """Object key derived from the bytes: identical images map to the same object."""
+    digest = hashlib.sha256(data).hexdigest()
+    return f"{prefix}/{digest}.{extension}"
+
+
+def upload_options(content_type):
+    return {"content-type": content_type, "cache-control": IMMUTABLE_MAX_AGE, "upsert": "false"}
+
+
+def is_duplicate_error(error):
+    """Storage reports an existing object on create as 409 / 'Duplicate'."""
+    text = str(error)
+    return "409" in text or "Duplicate" in text or "already exists" in text
+
+
+class ImageUploader:
+    """
+    Bounded, retrying async uploader for content-addressed images.
+
+    - At most `concurrency` uploads talk to Storage at once.
+    - Identical bytes uploaded concurrently share one request; keys known to
+      exist (uploaded or checked earlier in this process) skip Storage entirely.
+    - Transient failures are retried with exponential backoff.
+    """
+
+    def __init__(self, storage, bucket="images", concurrency=None, retries=3, backoff=0.5):
+        self.storage = storage  # supabase AsyncClient.storage
+        self.bucket = bucket
+        self.retries = retries
+        self.backoff = backoff
+        self._semaphore = asyncio.Semaphore(concurrency or int(os.getenv("AURA_UPLOAD_CONCURRENCY", 4)))
+        self._known = set()
+        self._in_flight = {}
+        self.uploaded = 0
+        self.deduped = 0
+
+    async def upload(self, data, content_type="image/png", extension="png", prefix=DEFAULT_PREFIX):
+        """Stores `data` under its content hash and returns the public URL."""
+        key = content_key(data, extension, prefix)
+        if key in self._known:
+            self.deduped += 1
+            return await self._public_url(key)
+        pending = self._in_flight.get(key)
+        if pending is None:
+            pending = asyncio.ensure_future(self._store(key, data, content_type))
+            self._in_flight[key] = pending
+            pending.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        else:
+            self.deduped += 1
+        await asyncio.shield(pending)
+        return await self._public_url(key)
+
+    async def _public_url(self, key):
+        return await self.storage.from_(self.bucket).get_public_url(key)
+
+    async def _store(self, key, data, content_type):
+        bucket = self.storage.from_(self.bucket)
+        async with self._semaphore:
+            for attempt in range(self.retries + 1):
+                try:
+                    if await bucket.exists(key):
+                        self.deduped += 1
+                    else:
+                        await bucket.upload(path=key, file=data, file_options=upload_options(content_type))
+                        self.uploaded += 1
+                    self._known.add(key)
+                    return
+                except Exception as e:
+                    if is_duplicate_error(e):
+                        # Another process stored the same bytes first
+                        self._known.add(key)
+                        return
+                    if attempt == self.retries:
+                        raise
+                    delay = self.backoff * 2 ** attempt
+                    logger.warning(f"Upload of {key} failed ({e}); retrying in {delay:.1f}s")
+                    await asyncio.sleep(delay)
@@ -0,0 +1,153 @@
+import os
+import json
+import time
+import logging
+import secrets
+import threading
+import contextvars
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Spans are exported as OTLP/JSON records (one "resourceSpans" object per line),
+# the same layout the OpenTelemetry Collector's file exporter writes, so the
+# output can be replayed into any OTLP-compatible backend or read with jq.
+TRACE_FILE_ENV = "AURA_TRACE_FILE"
+
+_current_span = contextvars.ContextVar("aura_current_span", default=None)
+
+STATUS_UNSET = 0
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+
+def _otlp_value(value):
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class Span:
+    """A single timed operation. Created through `Tracer.span`."""
+
+    def __init__(self, name, trace_id, parent_id=None, attributes=None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.attributes = dict(attributes or {})
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.status = STATUS_UNSET
+        self.status_message = ""
+
+    def set_attribute(self, key, value):
+        if value is not None:
+            self.attributes[key] = value
+
+    def record_error(self, exc):
+        self.status = STATUS_ERROR
+        self.status_message = f"{type(exc).__name__}: {exc}"
+
+    @property
+    def duration_ms(self):
+        end = self.end_ns or time.time_ns()
+        return (end - self.start_ns) / 1e6
+
+    def to_otlp(self):
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": 1,  # SPAN_KIND_INTERNAL
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in self.attributes.items()],
+            "status": {"code": self.status, "message": self.status_message},
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        return span
+
+
+class Tracer:
+    """
+    Minimal span tracer. Disabled (and nearly free) unless an export path is set.
+    Parent/child links follow the asyncio task through contextvars.
+    """
+
+    def __init__(self, path=None, service_name="aura-engine"):
+        self.path = path
+        self.service_name = service_name
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return bool(self.path)
+
+    @contextmanager
+    def span(self, name, **attributes):
+        if not self.enabled:
+            yield _NOOP_SPAN
+            return
+
+        parent = _current_span.get()
+        trace_id = parent.trace_id if parent else secrets.token_hex(16)
+        span = Span(name, trace_id, parent.span_id if parent else None, attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+            if span.status == STATUS_UNSET:
+                span.status = STATUS_OK
+        except BaseException as e:
+            span.record_error(e)
+            raise
+        finally:
+            _current_span.reset(token)
+            span.end_ns = time.time_ns()
+            self._export(span)
+
+    def _export(self, span):
+        record = {
+            "resourceSpans": [{
+                "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": self.service_name}}]},
+                "scopeSpans": [{"scope": {"name": "aura.engine"}, "spans": [span.to_otlp()]}],
+            }]
+        }
+        line = json.dumps(record, ensure_ascii=False)
+        try:
+            with self._lock:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(line + "\n")
+        except OSError as e:
+            logger.warning(f"Tracing: failed to export span {span.name}: {e}")
+
+
+class _NoopSpan:
+    trace_id = None
+    span_id = None
+    duration_ms = 0.0
+
+    def set_attribute(self, key, value):
+        pass
+
+    def record_error(self, exc):
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+tracer = Tracer(os.getenv(TRACE_FILE_ENV))
+
+
+def span(name, **attributes):
+    """Shortcut for `tracer.span(...)` on the process-wide tracer."""
+    return tracer.span(name, **attributes)
+
+
+def current_span():
+    return _current_span.get() or _NOOP_SPAN
@@ -0,0 +1,85 @@
+-- Benchmark: legacy ILIKE OR-scan vs. search_crawled_articles RPC (bigram GIN index).
+-- Run against a scratch database that already has the migrations applied:
+--
+--   psql "$DATABASE_URL" -v rows=10000  -f supabase/benchmarks/search_crawled_articles.sql
+--   psql "$DATABASE_URL" -v rows=100000 -f supabase/benchmarks/search_crawled_articles.sql
+--
+-- Synthetic JP/KR rows are generated into the aura_bench schema (dropped and
+-- recreated on every run), so production tables are never touched. Generating
+-- rows dominates the runtime (about 2 minutes per 10k rows on a laptop).
+\if :{?rows}
+\else
+  \set rows 10000
+\endif
+\set ON_ERROR_STOP on
+
+DROP SCHEMA IF EXISTS aura_bench CASCADE;
+CREATE SCHEMA aura_bench;
+SET search_path = aura_bench, public;
+
+CREATE TABLE aura_bench.sources (id uuid DEFAULT gen_random_uuid() PRIMARY KEY, name text NOT NULL);
+CREATE TABLE aura_bench.crawled_articles (
+  id uuid DEFAULT gen_random_uuid() PRIMARY KEY,
+  source_id uuid REFERENCES aura_bench.sources(id),
+  title text,
+  content text,
+  url text UNIQUE NOT NULL,
+  crawled_at timestamptz DEFAULT now() NOT NULL,
+  search_vector tsvector GENERATED ALWAYS AS (
+    array_to_tsvector(public.aura_bigrams(coalesce(title, '') || ' ' || coalesce(content, '')))
+  ) STORED
+);
+INSERT INTO aura_bench.sources (name) VALUES ('Bench JP'), ('Bench KR');
+
+\echo Generating :rows rows...
+\timing on
+-- Body: ~4,000 random katakana/hangul characters (a realistic spread of bigrams),
+-- with the benchmark keywords planted in 2% (ポテンツァ) and 1% (포텐자) of rows.
+-- "+ 0 * t" ties random() to the inner row so it is re-evaluated per character.
+INSERT INTO aura_bench.crawled_articles (source_id, title, content, url, crawled_at)
+SELECT
+  src.ids[1 + g % 2],
+  'Bench article ' || g,
+  (SELECT string_agg(chr(CASE WHEN random() < 0.6
+                              THEN 12449 + floor(random() * 86)::int
+                              ELSE 44032 + floor(random() * 400)::int END + 0 * t), '')
+   FROM generate_series(1, 4000) t WHERE g > 0)
+    || CASE WHEN g % 50 = 0 THEN ' ポテンツァの施術とダウンタイム' ELSE '' END
+    || CASE WHEN g % 100 = 7 THEN ' 포텐자 시술 후기' ELSE '' END,
+  'https://bench.example/' || g,
+  now() - (g || ' minutes')::interval
+FROM (SELECT array_agg(id) AS ids FROM aura_bench.sources) src, generate_series(1, :rows) AS g;
+
+CREATE INDEX ON aura_bench.crawled_articles USING gin (search_vector);
+CREATE INDEX ON aura_bench.crawled_articles USING gin (title gin_trgm_ops);
+ANALYZE aura_bench.crawled_articles;
+
+\echo
+\echo == Legacy ILIKE OR-scan (JP + KR keyword, limit 3)
+EXPLAIN (ANALYZE, BUFFERS, COSTS OFF)
+SELECT title, content, url
+FROM aura_bench.crawled_articles
+WHERE title ILIKE '%ポテンツァ%' OR content ILIKE '%ポテンツァ%'
+   OR title ILIKE '%포텐자%' OR content ILIKE '%포텐자%'
+LIMIT 3;
+
+\echo == Legacy ILIKE OR-scan, rare keyword (worst case: full scan)
+EXPLAIN (ANALYZE, BUFFERS, COSTS OFF)
+SELECT title, content, url
+FROM aura_bench.crawled_articles
+WHERE title ILIKE '%ヒアルロン酸%' OR content ILIKE '%ヒアルロン酸%'
+LIMIT 3;
+
+\echo == search_crawled_articles RPC (ranked, excerpt only)
+SELECT count(*) AS hits FROM public.search_crawled_articles(ARRAY['ポテンツァ', '포텐자'], 3);
+SELECT count(*) AS hits FROM public.search_crawled_articles(ARRAY['ヒアルロン酸'], 3);
+
+\echo == Index scan inside the RPC
+EXPLAIN (ANALYZE, BUFFERS, COSTS OFF)
+SELECT a.id
+FROM aura_bench.crawled_articles a
+WHERE a.search_vector @@ public.aura_bigram_query(ARRAY['ポテンツァ', '포텐자']);
+
+\timing off
+SELECT pg_size_pretty(pg_total_relation_size('aura_bench.crawled_articles')) AS table_size_with_indexes;
+RESET search_path;
@@ -0,0 +1,8 @@
+-- Migration: keyword dedupe for generated articles
+-- keyword_normalized is written by the engine (utils/jobs.py normalize_keyword)
+ALTER TABLE articles ADD COLUMN IF NOT EXISTS keyword text;
+ALTER TABLE articles ADD COLUMN IF NOT EXISTS keyword_normalized text;
+
+CREATE INDEX IF NOT EXISTS articles_keyword_normalized_created_at_idx
+  ON articles (keyword_normalized, created_at DESC)
+  WHERE keyword_normalized IS NOT NULL;
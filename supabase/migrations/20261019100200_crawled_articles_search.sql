@@ -0,0 +1,96 @@
+-- Migration: ranked full-text search over crawled_articles
+-- Replaces the engine's `title.ilike.%kw%,content.ilike.%kw%` scans.
+-- Japanese/Korean text has no word boundaries, so documents and queries are
+-- indexed as character bigrams (the CJK bigram approach used by pg_bigm/Lucene).
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- Distinct character bigrams of a text, lowercased, never spanning whitespace.
+-- Splits into characters once and pairs neighbours with lead(); substr() per
+-- position is quadratic on multibyte text (seconds for a 10k-char article).
+CREATE OR REPLACE FUNCTION public.aura_bigrams(input text)
+RETURNS text[]
+LANGUAGE sql IMMUTABLE PARALLEL SAFE
+AS $$
+  SELECT coalesce(array_agg(DISTINCT g.gram), '{}')
+  FROM (
+    SELECT t.c || lead(t.c) OVER (ORDER BY t.n) AS gram
+    FROM regexp_split_to_table(lower(coalesce(input, '')), '') WITH ORDINALITY AS t(c, n)
+  ) g
+  WHERE g.gram IS NOT NULL AND g.gram !~ '\s'
+$$;
+
+-- tsquery matching any keyword; each keyword must contain all of its bigrams.
+-- Returns NULL when no keyword is at least two characters long.
+CREATE OR REPLACE FUNCTION public.aura_bigram_query(keywords text[])
+RETURNS tsquery
+LANGUAGE sql IMMUTABLE PARALLEL SAFE
+AS $$
+  SELECT string_agg(per_keyword, ' | ')::tsquery
+  FROM (
+    SELECT '(' || string_agg('''' || replace(replace(gram, '\', '\\'), '''', '''''') || '''', ' & ') || ')' AS per_keyword
+    FROM unnest(keywords) WITH ORDINALITY AS k(keyword, n),
+         unnest(public.aura_bigrams(k.keyword)) AS gram
+    GROUP BY k.n
+  ) q
+$$;
+
+ALTER TABLE crawled_articles
+  ADD COLUMN IF NOT EXISTS search_vector tsvector
+  GENERATED ALWAYS AS (
+    array_to_tsvector(public.aura_bigrams(coalesce(title, '') || ' ' || coalesce(content, '')))
+  ) STORED;
+
+CREATE INDEX IF NOT EXISTS crawled_articles_search_vector_idx
+  ON crawled_articles USING gin (search_vector);
+
+-- Title trigrams: relevance boost and short-keyword (1 char) fallback
+CREATE INDEX IF NOT EXISTS crawled_articles_title_trgm_idx
+  ON crawled_articles USING gin (title gin_trgm_ops);
+
+-- RPC used by SupabaseManager.search_crawled_articles.
+-- Only an excerpt of the content is returned so RAG does not pull whole pages.
+CREATE OR REPLACE FUNCTION public.search_crawled_articles(
+  keywords text[],
+  match_limit int DEFAULT 5,
+  excerpt_chars int DEFAULT 2000
+)
+RETURNS TABLE (
+  id uuid,
+  title text,
+  url text,
+  excerpt text,
+  source_name text,
+  crawled_at timestamptz,
+  rank real
+)
+LANGUAGE plpgsql STABLE
+AS $$
+#variable_conflict use_column
+DECLARE
+  q tsquery := public.aura_bigram_query(keywords);
+BEGIN
+  IF q IS NULL THEN
+    RETURN QUERY
+      SELECT a.id, a.title, a.url, left(a.content, excerpt_chars), s.name, a.crawled_at, 0::real
+      FROM crawled_articles a
+      LEFT JOIN sources s ON s.id = a.source_id
+      WHERE EXISTS (
+        SELECT 1 FROM unnest(keywords) AS k(keyword)
+        WHERE k.keyword <> '' AND (a.title ILIKE '%' || k.keyword || '%' OR a.content ILIKE '%' || k.keyword || '%')
+      )
+      ORDER BY a.crawled_at DESC
+      LIMIT match_limit;
+    RETURN;
+  END IF;
+
+  RETURN QUERY
+    SELECT a.id, a.title, a.url, left(a.content, excerpt_chars), s.name, a.crawled_at,
+           (ts_rank(a.search_vector, q)
+             + coalesce((SELECT max(similarity(a.title, k.keyword)) FROM unnest(keywords) AS k(keyword)), 0))::real AS rank
+    FROM crawled_articles a
+    LEFT JOIN sources s ON s.id = a.source_id
+    WHERE a.search_vector @@ q
+    ORDER BY rank DESC, a.crawled_at DESC
+    LIMIT match_limit;
+END;
+$$;
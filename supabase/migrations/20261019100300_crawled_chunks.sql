@@ -0,0 +1,59 @@
+-- Migration: heading/paragraph-aware passages of crawled articles
+-- The crawler splits extracted text into chunks (engine/crawler/chunker.py) so RAG
+-- can pull the few relevant passages instead of the first 2000 chars of each page.
+-- Offsets are character positions in the extracted page text.
+CREATE TABLE IF NOT EXISTS crawled_chunks (
+  id uuid DEFAULT gen_random_uuid() PRIMARY KEY,
+  article_id uuid NOT NULL REFERENCES crawled_articles(id) ON DELETE CASCADE,
+  chunk_index int NOT NULL,
+  heading text,
+  content text NOT NULL,
+  start_offset int NOT NULL,
+  end_offset int NOT NULL,
+  created_at timestamptz DEFAULT now(),
+  search_vector tsvector GENERATED ALWAYS AS (
+    array_to_tsvector(public.aura_bigrams(coalesce(heading, '') || ' ' || content))
+  ) STORED,
+  UNIQUE (article_id, chunk_index)
+);
+
+CREATE INDEX IF NOT EXISTS crawled_chunks_search_vector_idx
+  ON crawled_chunks USING gin (search_vector);
+
+ALTER TABLE crawled_chunks ENABLE ROW LEVEL SECURITY;
+CREATE POLICY "Authenticated users can do everything" ON crawled_chunks FOR ALL USING (auth.role() = 'authenticated');
+
+-- Best passages for any of the keywords (same bigram query as search_crawled_articles),
+-- at most `per_article` per page so one long article cannot fill every slot.
+CREATE OR REPLACE FUNCTION public.search_crawled_chunks(
+  keywords text[],
+  match_limit int DEFAULT 5,
+  per_article int DEFAULT 2
+)
+RETURNS TABLE (
+  id uuid,
+  article_id uuid,
+  title text,
+  url text,
+  heading text,
+  excerpt text,
+  source_name text,
+  start_offset int,
+  rank real
+)
+LANGUAGE sql STABLE
+AS $$
+  SELECT r.id, r.article_id, r.title, r.url, r.heading, r.content, r.source_name, r.start_offset, r.rank
+  FROM (
+    SELECT c.id, c.article_id, a.title, a.url, c.heading, c.content, s.name AS source_name, c.start_offset,
+           ts_rank(c.search_vector, q.q)::real AS rank,
+           row_number() OVER (PARTITION BY c.article_id ORDER BY ts_rank(c.search_vector, q.q) DESC) AS nth
+    FROM (SELECT public.aura_bigram_query(keywords) AS q) q
+    JOIN crawled_chunks c ON c.search_vector @@ q.q
+    JOIN crawled_articles a ON a.id = c.article_id
+    LEFT JOIN sources s ON s.id = a.source_id
+  ) r
+  WHERE r.nth <= per_article
+  ORDER BY r.rank DESC
+  LIMIT match_limit;
+$$;
@@ -0,0 +1,27 @@
+-- Migration: single round-trip category resolution
+-- Replaces the engine's select-by-name / select-by-slug / insert / retry-insert
+-- sequence. Returns the category named `category_name`, else the one owning
+-- `category_slug`, else a newly created one. ON CONFLICT makes concurrent
+-- callers with the same slug converge on one row instead of failing.
+CREATE OR REPLACE FUNCTION public.get_or_create_category(category_name text, category_slug text)
+RETURNS TABLE (id uuid, name text, slug text)
+LANGUAGE sql VOLATILE
+AS $$
+  WITH existing AS (
+    SELECT c.id, c.name, c.slug
+    FROM categories c
+    WHERE c.name = category_name
+    ORDER BY c.created_at
+    LIMIT 1
+  ),
+  upserted AS (
+    INSERT INTO categories (name, slug, description)
+    SELECT category_name, category_slug, 'Auto-generated by AI'
+    WHERE NOT EXISTS (SELECT 1 FROM existing)
+    ON CONFLICT (slug) DO UPDATE SET slug = EXCLUDED.slug
+    RETURNING categories.id, categories.name, categories.slug
+  )
+  SELECT * FROM existing
+  UNION ALL
+  SELECT * FROM upserted;
+$$;
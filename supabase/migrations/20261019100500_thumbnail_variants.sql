@@ -0,0 +1,4 @@
+-- Migration: responsive thumbnail variants
+-- Written by the engine (generator/images.py): {"webp": {"1200": url, "800": url, "400": url}, "avif": {...}}
+-- thumbnail_url keeps pointing at the largest WebP for existing readers.
+ALTER TABLE articles ADD COLUMN IF NOT EXISTS thumbnail_variants jsonb;
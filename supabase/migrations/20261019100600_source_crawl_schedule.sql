@@ -0,0 +1,19 @@
+-- Migration: freshness-aware crawl scheduling (engine/crawler/scheduler.py)
+-- Each crawl stores the content hash of the extracted text and a decayed count of
+-- checks / changes / seconds between checks; the engine derives an adaptive revisit
+-- interval from them and only crawls sources whose next_crawl_at has passed.
+-- crawl_failures counts consecutive failed fetches (exponential retry backoff).
+ALTER TABLE sources ADD COLUMN IF NOT EXISTS content_hash text;
+ALTER TABLE sources ADD COLUMN IF NOT EXISTS crawl_checks real NOT NULL DEFAULT 0;
+ALTER TABLE sources ADD COLUMN IF NOT EXISTS crawl_changes real NOT NULL DEFAULT 0;
+ALTER TABLE sources ADD COLUMN IF NOT EXISTS crawl_seconds real NOT NULL DEFAULT 0;
+ALTER TABLE sources ADD COLUMN IF NOT EXISTS crawl_failures int NOT NULL DEFAULT 0;
+ALTER TABLE sources ADD COLUMN IF NOT EXISTS revisit_interval_seconds int;
+ALTER TABLE sources ADD COLUMN IF NOT EXISTS next_crawl_at timestamptz;
+ALTER TABLE sources ADD COLUMN IF NOT EXISTS last_changed_at timestamptz;
+
+CREATE INDEX IF NOT EXISTS sources_next_crawl_at_idx
+  ON sources (next_crawl_at NULLS FIRST)
+  WHERE is_active;
+
+-- Written by public.record_source_crawls (20261019100800_record_source_crawls.sql).
@@ -0,0 +1,6 @@
+-- Migration: learned main-content selectors (engine/crawler/extraction.py)
+-- The density extractor returns the selector list of the elements it picked
+-- ("div#kiji-body", "div.news-head, div.news-body"); it is stored per source and
+-- tried first on the next crawl, falling back to full scoring when it stops matching.
+-- Written by public.record_source_crawls (20261019100800_record_source_crawls.sql).
+ALTER TABLE sources ADD COLUMN IF NOT EXISTS content_selector text;
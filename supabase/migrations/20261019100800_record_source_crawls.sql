@@ -0,0 +1,32 @@
+-- Migration: batched crawl bookkeeping for sources (engine/utils/db.py bulk_record_source_crawls)
+-- Applies a batch of crawl observations in one statement: the schedule columns from
+-- 20261019100600_source_crawl_schedule.sql (engine/crawler/scheduler.py) and the
+-- learned selector from 20261019100700_source_content_selector.sql.
+-- [{"id", "crawled_at", "content_hash", "crawl_checks", "crawl_changes", "crawl_seconds",
+--   "crawl_failures", "revisit_interval_seconds", "next_crawl_at", "last_changed_at",
+--   "content_selector"}]
+-- crawled_at, content_hash, revisit_interval_seconds, last_changed_at and
+-- content_selector are kept when null (a failed fetch only moves next_crawl_at).
+CREATE OR REPLACE FUNCTION public.record_source_crawls(crawls jsonb)
+RETURNS TABLE (id uuid)
+LANGUAGE sql VOLATILE
+AS $$
+  UPDATE sources s SET
+    last_crawled_at = coalesce(c.crawled_at, s.last_crawled_at),
+    content_hash = coalesce(c.content_hash, s.content_hash),
+    crawl_checks = c.crawl_checks,
+    crawl_changes = c.crawl_changes,
+    crawl_seconds = c.crawl_seconds,
+    crawl_failures = c.crawl_failures,
+    revisit_interval_seconds = coalesce(c.revisit_interval_seconds, s.revisit_interval_seconds),
+    next_crawl_at = c.next_crawl_at,
+    last_changed_at = coalesce(c.last_changed_at, s.last_changed_at),
+    content_selector = coalesce(c.content_selector, s.content_selector)
+  FROM jsonb_to_recordset(crawls) AS c(
+    id uuid, crawled_at timestamptz, content_hash text, crawl_checks real, crawl_changes real,
+    crawl_seconds real, crawl_failures int, revisit_interval_seconds int, next_crawl_at timestamptz, last_changed_at timestamptz,
+    content_selector text
+  )
+  WHERE s.id = c.id
+  RETURNING s.id;
+$$;
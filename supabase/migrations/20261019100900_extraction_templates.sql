@@ -0,0 +1,18 @@
+-- Migration: per-domain extraction templates (engine/crawler/templates.py)
+-- Learned from previous crawls of a site: the main-content selector list, the
+-- selectors of noise blocks to drop inside it, and whether the content is already
+-- in the static HTML (needs_js = false lets the crawler skip the browser).
+-- hits / misses count crawls where the template still matched / had to be relearned.
+CREATE TABLE IF NOT EXISTS extraction_templates (
+  domain text PRIMARY KEY,
+  content_selector text,
+  noise_selectors text[] NOT NULL DEFAULT '{}',
+  needs_js boolean,
+  hits int NOT NULL DEFAULT 0,
+  misses int NOT NULL DEFAULT 0,
+  learned_at timestamptz,
+  updated_at timestamptz DEFAULT now()
+);
+
+ALTER TABLE extraction_templates ENABLE ROW LEVEL SECURITY;
+CREATE POLICY "Authenticated users can do everything" ON extraction_templates FOR ALL USING (auth.role() = 'authenticated');
@@ -1,16 +1,32 @@
 import { NextResponse } from 'next/server';
 
 const engineUrl = process.env.ENGINE_API_URL || 'http://localhost:8000';
+// Validators and caching policy the engine sets, passed through to the browser
+const PASSTHROUGH_HEADERS = ['etag', 'cache-control'];
 
-export async function GET() {
+export async function GET(request: Request) {
     try {
-        const res = await fetch(`${engineUrl}/media/recommendations`, {
+        // ?next=true moves on to the next recommendations
+        const { search } = new URL(request.url);
+        const ifNoneMatch = request.headers.get('if-none-match');
+        const res = await fetch(`${engineUrl}/media/recommendations${search}`, {
             headers: {
                 'x-api-key': process.env.ENGINE_API_KEY || '',
+                ...(ifNoneMatch ? { 'if-none-match': ifNoneMatch } : {}),
             },
-            cache: 'no-store'
+            cache: 'no-store' // The engine revalidates with If-None-Match instead
         });
 
+        const headers = new Headers();
+        for (const name of PASSTHROUGH_HEADERS) {
+            const value = res.headers.get(name);
+            if (value) headers.set(name, value);
+        }
+
+        if (res.status === 304) {
+            return new NextResponse(null, { status: 304, headers });
+        }
+
         if (!res.ok) {
             const errorText = await res.text();
             console.error(`Engine API Error (Media Recs): ${res.status} ${errorText}`);
@@ -21,7 +37,7 @@ export async function GET() {
         }
 
         const data = await res.json();
-        return NextResponse.json(data);
+        return NextResponse.json(data, { headers });
     } catch (error) {
         console.error("API Proxy Error [Media Recs]:", error);
         return NextResponse.json({ error: "Failed to connect to engine", details: String(error) }, { status: 500 });
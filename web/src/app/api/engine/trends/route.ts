@@ -1,21 +1,36 @@
 import { NextResponse } from 'next/server';
 
-export async function GET() {
+// Validators and caching policy the engine sets, passed through to the browser
+const PASSTHROUGH_HEADERS = ['etag', 'cache-control'];
+
+export async function GET(request: Request) {
     try {
         const engineUrl = process.env.ENGINE_API_URL || 'http://127.0.0.1:8000';
+        const ifNoneMatch = request.headers.get('if-none-match');
         const res = await fetch(`${engineUrl}/trends`, {
             headers: {
                 'x-api-key': process.env.ENGINE_API_KEY || '',
+                ...(ifNoneMatch ? { 'if-none-match': ifNoneMatch } : {}),
             },
-            cache: 'no-store' // Always fetch fresh data
+            cache: 'no-store' // Always ask the engine; it answers 304 when the browser's copy is current
         });
 
+        const headers = new Headers();
+        for (const name of PASSTHROUGH_HEADERS) {
+            const value = res.headers.get(name);
+            if (value) headers.set(name, value);
+        }
+
+        if (res.status === 304) {
+            return new NextResponse(null, { status: 304, headers });
+        }
+
         if (!res.ok) {
             throw new Error('Failed to fetch trends');
         }
 
         const data = await res.json();
-        return NextResponse.json(data);
+        return NextResponse.json(data, { headers });
     } catch (error) {
         console.error("API Proxy Error [Trends]:", error);
         // Fallback for demo if Engine is offline